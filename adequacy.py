@@ -0,0 +1,301 @@
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from geocache import GeocodeCache, Gazetteer, GEOCACHE_PATH, GAZETTEER_PATH, normalize_address
+from geodistance import ELLIPSOIDAL
+from provider_store import DATA_PATH, load_provider_store
+from road_network import ROADS_PATH, load_road_network
+
+# Default adequacy bands in miles, matching the Geo-Access tab's Radius 1 and Radius 2
+DEFAULT_RADII = (5, 10)
+# Specialties whose per-node drive minutes a process keeps, at 4 bytes per road node each
+SPECIALTY_MINUTES_CACHE = 32
+# Members per chunk handed to a worker process
+CHUNK_SIZE = 20000
+# Member address columns, joined in this order to build a geocodable address
+ADDRESS_COLUMNS = ("Address", "City", "State", "Zip")
+
+
+def member_addresses(members):
+    """
+    Full address strings for a member frame, from whichever ADDRESS_COLUMNS it has.
+    """
+    columns = [members[c].fillna("").astype(str) for c in ADDRESS_COLUMNS if c in members]
+    return [", ".join(p.strip() for p in parts if p.strip()) for parts in zip(*columns)]
+
+
+def geocode_members(members, geocache, gazetteer):
+    """
+    Member coordinates as (lats, lons, sources). Uses Latitude/Longitude
+    columns where present, then the geocode store, then gazetteer centroids.
+    Members that cannot be resolved get NaN coordinates.
+    """
+    n = len(members)
+    lats = np.full(n, np.nan)
+    lons = np.full(n, np.nan)
+    sources = np.full(n, "unresolved", dtype=object)
+    if "Latitude" in members and "Longitude" in members:
+        lats = pd.to_numeric(members["Latitude"], errors="coerce").to_numpy(dtype=np.float64, copy=True)
+        lons = pd.to_numeric(members["Longitude"], errors="coerce").to_numpy(dtype=np.float64, copy=True)
+        sources[~np.isnan(lats) & ~np.isnan(lons)] = "input"
+
+    missing = np.flatnonzero(np.isnan(lats) | np.isnan(lons))
+    if len(missing) and any(c in members for c in ADDRESS_COLUMNS):
+        addresses = member_addresses(members.iloc[missing])
+        cached = geocache.get_many(addresses)
+        for i, address in zip(missing, addresses):
+            coords, source = cached.get(normalize_address(address)), "geocache"
+            if coords is None:
+                coords, source = gazetteer.lookup(address), "gazetteer"
+            if coords is not None:
+                lats[i], lons[i] = coords
+                sources[i] = source
+    return lats, lons, sources
+
+
+def nearest_distances(store, lats, lons, specialties, method=ELLIPSOIDAL):
+    """
+    Miles from every member to the nearest provider of each specialty, shape (members, specialties).
+    """
+    distances = np.full((len(lats), len(specialties)), np.nan)
+    resolved = np.flatnonzero(~np.isnan(lats) & ~np.isnan(lons))
+    for j, specialty in enumerate(specialties):
+        _, nearest = store.nearest_many(lats[resolved], lons[resolved], 1, specialty=specialty, method=method)
+        distances[resolved, j] = np.where(np.isinf(nearest[:, 0]), np.nan, nearest[:, 0])
+    return distances
+
+
+@lru_cache(maxsize=SPECIALTY_MINUTES_CACHE)
+def specialty_node_minutes(store, network, specialty, limit):
+    """
+    Drive minutes from every road node to the nearest provider of a specialty, up to limit.
+    One search serves every member chunk a process assesses.
+    """
+    positions = store.filters.rows("Specialty", [specialty])
+    nodes, access = store.road_nodes(network)
+    return network.minutes_to(nodes[positions], access[positions], limit).astype(np.float32)
+
+
+def nearest_drive_minutes(store, network, lats, lons, specialties, limit):
+    """
+    Drive minutes from every member to the nearest provider of each specialty, shape (members, specialties).
+    NaN where no provider is within limit minutes, or the member is off the road network.
+    """
+    nodes, access = network.snap(lats, lons)
+    minutes = np.full((len(lats), len(specialties)), np.nan)
+    on_network = np.flatnonzero(nodes >= 0)
+    for j, specialty in enumerate(specialties):
+        found = specialty_node_minutes(store, network, specialty, limit)[nodes[on_network]] + access[on_network]
+        minutes[on_network, j] = np.where(found <= limit, found, np.nan)
+    return minutes
+
+
+class AdequacySummary:
+    """
+    Running per-specialty adequacy totals, merged chunk by chunk in bounded memory.
+    - specialties: Specialty names, in column order
+    - radii: Band limits in miles, or in minutes for drive times
+    - drive: Whether distances are drive minutes rather than miles
+    """
+
+    def __init__(self, specialties, radii, drive=False):
+        self.specialties = list(specialties)
+        self.radii = sorted(radii)
+        self.drive = drive
+        self.members = 0
+        self.unresolved = 0
+        self.covered = np.zeros(len(self.specialties), dtype=np.int64)
+        self.within = np.zeros((len(self.radii), len(self.specialties)), dtype=np.int64)
+        self.total_miles = np.zeros(len(self.specialties))
+        self.max_miles = np.zeros(len(self.specialties))
+
+    def add(self, distances, resolved):
+        """
+        - distances: Nearest-provider miles, shape (members, specialties)
+        - resolved: Boolean array marking members with coordinates
+        """
+        self.members += len(distances)
+        self.unresolved += int((~resolved).sum())
+        found = ~np.isnan(distances)
+        self.covered += found.sum(axis=0)
+        for r, radius in enumerate(self.radii):
+            self.within[r] += (found & (np.nan_to_num(distances, nan=np.inf) <= radius)).sum(axis=0)
+        self.total_miles += np.nansum(distances, axis=0)
+        if len(distances):
+            self.max_miles = np.fmax(self.max_miles, np.where(found, distances, 0).max(axis=0))
+
+    def merge(self, other):
+        self.members += other.members
+        self.unresolved += other.unresolved
+        self.covered += other.covered
+        self.within += other.within
+        self.total_miles += other.total_miles
+        self.max_miles = np.fmax(self.max_miles, other.max_miles)
+
+    def to_frame(self):
+        resolved = max(self.members - self.unresolved, 1)
+        unit, measure = ("min", "Minutes") if self.drive else ("mi", "Miles")
+        frame = pd.DataFrame({"Specialty": self.specialties, "Members": self.members - self.unresolved})
+        for r, radius in enumerate(self.radii):
+            frame[f"Within {radius:g} {unit}"] = self.within[r]
+            frame[f"% Within {radius:g} {unit}"] = (100 * self.within[r] / resolved).round(1)
+        frame[f"Mean Nearest {measure}"] = np.round(self.total_miles / np.maximum(self.covered, 1), 2)
+        frame[f"Max Nearest {measure}"] = self.max_miles.round(2)
+        frame["Unresolved Members"] = self.unresolved
+        return frame
+
+
+def assess_members(store, members, radii, specialties, geocache, gazetteer, method=ELLIPSOIDAL, network=None):
+    """
+    Adequacy detail for one chunk of members, plus its summary.
+    Returns (detail frame, AdequacySummary).
+    - network: Optional RoadNetwork; when given, bands are drive minutes, and members
+      with no provider within the largest band count as uncovered
+    """
+    lats, lons, sources = geocode_members(members, geocache, gazetteer)
+    if network is not None:
+        distances = nearest_drive_minutes(store, network, lats, lons, specialties, max(radii))
+    else:
+        distances = nearest_distances(store, lats, lons, specialties, method=method)
+
+    detail = pd.DataFrame({
+        "MemberID": members["MemberID"].to_numpy() if "MemberID" in members else members.index.to_numpy(),
+        "Latitude": lats,
+        "Longitude": lons,
+        "Geocode Source": sources,
+    })
+    for j, specialty in enumerate(specialties):
+        detail[f"{specialty} {'Minutes' if network is not None else 'Miles'}"] = distances[:, j].round(2)
+
+    summary = AdequacySummary(specialties, radii, drive=network is not None)
+    summary.add(distances, ~np.isnan(lats) & ~np.isnan(lons))
+    return detail, summary
+
+
+class ReportWriter:
+    """
+    Appends detail chunks to a CSV or Parquet file as they finish.
+    - path: Output file; a .parquet suffix writes Parquet (requires pyarrow)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self._writer = None
+        self._header = True
+
+    def write(self, frame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="w" if self._header else "a", header=self._header, index=False)
+            self._header = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+# Per-process state for pool workers, loaded once by _init_worker
+_worker = {}
+
+
+def _init_worker(data_path, geocache_path, gazetteer_path, roads_path):
+    _worker["store"] = load_provider_store(data_path)
+    _worker["geocache"] = GeocodeCache(geocache_path)
+    _worker["gazetteer"] = Gazetteer(gazetteer_path)
+    _worker["network"] = load_road_network(roads_path) if roads_path else None
+
+
+def _assess_chunk(members, radii, specialties, method):
+    return assess_members(_worker["store"], members, radii, specialties,
+                          _worker["geocache"], _worker["gazetteer"], method=method, network=_worker["network"])
+
+
+def run_adequacy(members_path, out_path, summary_path, radii=DEFAULT_RADII, specialties=None,
+                 workers=None, chunk_size=CHUNK_SIZE, data_path=DATA_PATH, method=ELLIPSOIDAL,
+                 progress=None, roads_path=None, context=None):
+    """
+    Stream an adequacy report for a member file through a process pool.
+
+    Members are read in chunks and at most two chunks per worker are in flight,
+    so memory stays bounded however large the roster is. Detail rows are
+    written in input order as chunks complete; the summary is written at the end.
+    With roads_path, bands are drive minutes over that road graph.
+    Returns the summary frame.
+    - progress: Called as progress(members assessed, elapsed seconds) after each chunk
+    - context: Optional multiprocessing context for the pool, e.g. forkserver from a threaded server
+    """
+    if roads_path and not os.path.exists(roads_path):
+        raise FileNotFoundError(f"No road graph at {roads_path}; build one with road_network.py")
+    workers = workers or os.cpu_count() or 1
+    if specialties is None:
+        specialties = load_provider_store(data_path).filters.options("Specialty")
+    summary = AdequacySummary(specialties, radii, drive=bool(roads_path))
+    writer = ReportWriter(out_path)
+    pending = deque()
+    started = time.time()
+
+    def finish(future):
+        detail, partial = future.result()
+        writer.write(detail)
+        summary.merge(partial)
+        if progress:
+            progress(summary.members, time.time() - started)
+
+    initargs = (data_path, GEOCACHE_PATH, GAZETTEER_PATH, roads_path)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=initargs) as pool:
+        for members in pd.read_csv(members_path, chunksize=chunk_size, dtype={"Zip": str}):
+            pending.append(pool.submit(_assess_chunk, members, radii, specialties, method))
+            if len(pending) >= 2 * workers:
+                finish(pending.popleft())
+        while pending:
+            finish(pending.popleft())
+    writer.close()
+
+    frame = summary.to_frame()
+    frame.to_csv(summary_path, index=False)
+    return frame
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Network adequacy report for a member roster.")
+    parser.add_argument("members", help="Member CSV with MemberID and Address/City/State/Zip or Latitude/Longitude")
+    parser.add_argument("--out", default="adequacy_detail.csv", help="Detail output (.csv or .parquet)")
+    parser.add_argument("--summary", default="adequacy_summary.csv", help="Per-specialty summary CSV")
+    parser.add_argument("--radii", type=float, nargs="+", default=list(DEFAULT_RADII),
+                        help="Band limits in miles, or minutes with --drive")
+    parser.add_argument("--drive", action="store_true", help="Measure drive minutes over the road graph")
+    parser.add_argument("--roads", default=ROADS_PATH, help="Road graph file for --drive")
+    parser.add_argument("--specialty", action="append", dest="specialties", help="Limit to a specialty (repeatable)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Members per chunk")
+    parser.add_argument("--data", default=DATA_PATH, help="Provider file")
+    args = parser.parse_args(argv)
+
+    def progress(done, elapsed):
+        print(f"\r{done:,} members assessed in {elapsed:.0f}s", end="", file=sys.stderr)
+
+    frame = run_adequacy(args.members, args.out, args.summary, radii=args.radii, specialties=args.specialties,
+                         workers=args.workers, chunk_size=args.chunk_size, data_path=args.data, progress=progress,
+                         roads_path=args.roads if args.drive else None)
+    print(file=sys.stderr)
+    print(frame.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,161 @@
+import base64
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from functools import lru_cache, wraps
+from urllib.parse import urlencode
+
 import dash
-from dash import dcc, html, Input, Output, State, dash_table
+from dash import dcc, html, Input, Output, State, ALL, dash_table
 import dash_bootstrap_components as dbc
 import dash_leaflet as dl
+import numpy as np
 import pandas as pd
-from geopy.distance import geodesic
-from geopy.geocoders import Nominatim
 from dash.exceptions import PreventUpdate
-from flask_caching import Cache
+from flask import Response, abort, g, has_request_context, request
+from batch_geocode import NominatimBackend, RateLimitedGeocoder
+from geocache import GeocodeCache, Gazetteer
+from geodistance import ELLIPSOIDAL, HAVERSINE, band_labels, distance_bands
+from metrics import REGISTRY, captured, install_request_hooks, instrumented, record_rows, replay, stage
+from provider_store import ReloadingStore, dataset_version
+from result_cache import ResultCache, query_key
+from road_network import ROADS_PATH, load_road_network
+from vector_tiles import TILE_BUFFER, TILE_EXTENT, encode_point_geojson, encode_point_tile, tile_bounds, tile_points
+
+# Distance mode for geo-access queries: ELLIPSOIDAL matches geopy's geodesic, HAVERSINE is faster
+DISTANCE_METHOD = ELLIPSOIDAL
+
+# Geo-access measure for drive minutes over the road graph; straight-line miles otherwise
+DRIVE = "drive"
+# Table and export header of the distance column, per band unit
+DISTANCE_HEADERS = {"mi": "Distance (Miles)", "min": "Drive Time (Minutes)"}
+
+# Circle colors for the distance bands, innermost first
+BAND_COLORS = ["#dc3545", "#0d6efd", "#fd7e14", "#6f42c1", "#20c997", "#6c757d"]
+
+# Viewport mode: extra margin around the visible map, as a fraction of its size, and marker cap
+VIEWPORT_MARGIN = 0.25
+MAX_VIEWPORT_MARKERS = 2000
+
+# Map center when no provider has coordinates: the geographic center of the contiguous US
+DEFAULT_CENTER = (39.8283, -98.5795)
+
+# Rows per chunk when streaming CSV exports
+EXPORT_CHUNK_ROWS = 10000
+
+# Browser cache lifetime for the GeoJSON layer and vector tiles, in seconds
+LAYER_MAX_AGE = 3600
 
-# Initialize caching to store geocoding results
-cache = Cache()
-CACHE_TIMEOUT = 60 * 60  # 1 hour
+# Background job results and progress; override with the PROVLOCATOR_JOBS environment variable
+JOBS_PATH = os.environ.get("PROVLOCATOR_JOBS", "data/jobs")
+# How often the browser polls a running background job, in milliseconds
+JOB_POLL_INTERVAL = 500
+# Seconds a job's stage timings wait to be collected with its result, e.g. when it is cancelled
+JOB_METRICS_TTL = 3600
+# Geo-access searches measuring more provider sites than this run as background jobs; smaller ones
+# answer inline, since a job costs a process start and at least one poll
+GEO_JOB_MIN_SITES = 200000
+# Worker processes per adequacy upload; override with the PROVLOCATOR_ADEQUACY_WORKERS environment variable
+ADEQUACY_WORKERS = int(os.environ.get("PROVLOCATOR_ADEQUACY_WORKERS", "0")) or None
+# Bytes of base64 decoded at a time when saving an upload to disk (a multiple of 4)
+UPLOAD_PIECE = 4 * 1024 * 1024
 
-# Load sample data
-df = pd.read_csv("data/providers.csv")
+# Base map tile URLs for the map style dropdowns, applied in the browser
+TILE_URLS = {
+    "osm": "https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png",
+    "world_imagery": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
+    "positron": "https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png",
+    "terrain": "https://stamen-tiles.a.ssl.fastly.net/terrain/{z}/{x}/{y}.png"
+}
 
-# Geocoder with caching
-geolocator = Nominatim(user_agent="geoaccess_tool")
+# Provider data and its indexes, reloaded in the background when the data file is replaced
+providers = ReloadingStore()
 
-@cache.memoize(timeout=CACHE_TIMEOUT)
-def geocode_address(address):
+# Function to get the provider store for the current request; a reload mid-request does not change it
+def current_store():
+    if not has_request_context():
+        return providers.current()
+    if "provider_store" not in g:
+        g.provider_store = providers.current()
+    return g.provider_store
+
+# Geocoder backed by a durable geocode store shared across workers, with local ZIP/city centroids
+geocache = GeocodeCache()
+gazetteer = Gazetteer()
+
+# Query results shared across workers, keyed on the query and the dataset version
+results = ResultCache()
+
+# Road graph for drive-time access, with the version of the road file it was loaded from
+roads = {"version": None, "network": None}
+roads_lock = threading.Lock()
+
+# Function to get the road graph for drive-time access, loaded on first use and again whenever the
+# road file is replaced; None without a road file
+def road_network():
     try:
-        location = geolocator.geocode(address)
-        if location:
-            return (location.latitude, location.longitude)
-    except Exception:
-        pass
+        version = dataset_version(ROADS_PATH)
+    except OSError:
+        version = None
+    if version != roads["version"]:
+        with roads_lock:
+            if version != roads["version"]:
+                try:
+                    network = load_road_network(ROADS_PATH) if version else None
+                except Exception:
+                    # A road file still being written keeps the graph already loaded until it changes again
+                    network = roads["network"]
+                roads.update(version=version, network=network)
+    return roads["network"]
+
+# Set PROVLOCATOR_OFFLINE=1 to resolve addresses from the cache and gazetteer only
+OFFLINE_GEOCODING = os.environ.get("PROVLOCATOR_OFFLINE") == "1"
+
+# Remote geocoder shared by this worker's threads: rate limited, with a quick retry
+geocoder = RateLimitedGeocoder(NominatimBackend(), retries=2, backoff=0.5)
+# Seconds a search waits on the remote geocoder before falling back to centroids
+GEOCODE_TIMEOUT = 10
+
+def geocode_local(address, street=True):
+    """
+    Geocode an address without asking Nominatim: from the geocode store, then the
+    gazetteer for addresses without a street line. Offline, a street address gets
+    its ZIP or city centroid (not stored, so the address is geocoded properly later).
+    Returns None when only geocode_remote can place the address, or offline when
+    nothing can.
+    - address: Full address string
+    - street: Whether the address includes a street line
+    """
+    coords = geocache.get(address)
+    if coords:
+        return coords
+
+    if not street or OFFLINE_GEOCODING:
+        coords = gazetteer.lookup(address)
+        if coords and not street:
+            geocache.put(address, coords, "gazetteer")
+        return coords
     return None
 
+def geocode_remote(address):
+    """
+    Geocode an address through Nominatim, for addresses geocode_local could not
+    place. If Nominatim fails, fall back to the ZIP or city centroid (not stored,
+    so the address is retried later).
+    """
+    status, coords, _, _ = geocoder.lookup(address, deadline=time.monotonic() + GEOCODE_TIMEOUT)
+    if coords:
+        geocache.put(address, coords, geocoder.name)
+        return coords
+    if status == "failed":
+        geocache.count("remote_errors")
+    return gazetteer.lookup(address)
+
 # Create Dash app with a modern Bootstrap theme and Font Awesome for icons
 app = dash.Dash(__name__, external_stylesheets=[
     dbc.themes.BOOTSTRAP,
@@ -35,9 +163,116 @@ app = dash.Dash(__name__, external_stylesheets=[
     "https://fonts.googleapis.com/css2?family=Roboto:wght@400;500;700&display=swap"
 ], suppress_callback_exceptions=True)
 app.title = "HMO Provider Search Tool"
+# WSGI entry point for production servers, e.g. `gunicorn app1:server`
+server = app.server
+
+# Long geo-access runs and adequacy reports run as background jobs in their own processes when
+# diskcache is installed, so web workers stay free to answer other analysts; otherwise inline
+try:
+    import diskcache
+    import multiprocess
+    import multiprocess.forkserver
+    import multiprocess.util
+
+    class JobManager(dash.DiskcacheManager):
+        """
+        DiskcacheManager that starts jobs from a fork server with this module preloaded,
+        instead of forking the web worker. A fork of a threaded worker can inherit locks
+        (SQLite's among them) held by other request threads and hang on first use.
+        """
+
+        def call_job_fn(self, key, job_fn, args, context):
+            jobs = multiprocess.get_context("forkserver")
+            jobs.set_forkserver_preload([__name__])
+            with job_server_lock:
+                # A fork server preloaded before the last reload would have every job load the dataset again
+                version = providers.current().version
+                if version != job_server["version"]:
+                    retire_job_server()
+                    job_server["version"] = version
+                process = jobs.Process(target=job_fn, args=(key, self._make_progress_key(key), args, context))
+                process.start()
+            return process.pid
+
+        def get_result(self, key, job):
+            result = super().get_result(key, job)
+            if result is not self.UNDEFINED and job:
+                # Record the finished job's stage timings here, since its own process has exited
+                replay(self.handle.pop(job_metrics_key(job), None) or [])
+            return result
+
+    # Function to name where a job process leaves its stage timings for the worker that collects its result
+    def job_metrics_key(pid):
+        return f"job-metrics-{pid}"
+
+    # Dataset version this worker's fork server preloaded; jobs start from its snapshot
+    job_server = {"version": None}
+    job_server_lock = threading.Lock()
+
+    # Function to let go of the running fork server, so the next job starts one that preloads the current
+    # dataset. Running jobs hold the old server open; it exits once they finish, and is reaped then.
+    def retire_job_server():
+        server = multiprocess.forkserver._forkserver
+        with server._lock:
+            pid, alive, address = server._forkserver_pid, server._forkserver_alive_fd, server._forkserver_address
+            if pid is None:
+                return
+            server._forkserver_pid = server._forkserver_alive_fd = server._forkserver_address = None
+        os.close(alive)
+        threading.Thread(target=reap_job_server, args=(pid, address), daemon=True).start()
+
+    def reap_job_server(pid, address):
+        os.waitpid(pid, 0)
+        if not multiprocess.util.is_abstract_socket_namespace(address):
+            os.unlink(address)
+
+    job_manager = JobManager(diskcache.Cache(JOBS_PATH))
+except ImportError:
+    job_manager = None
+
+# Function to register a callback as a background job with progress and cancellation.
+# Without a job manager it runs inline, and its progress reports go nowhere.
+def job_callback(*dependencies, progress, cancel, **kwargs):
+    def decorate(func):
+        if job_manager is not None:
+            # Jobs start from the fork server's snapshot, so pick up a dataset reloaded since it started
+            @wraps(func)
+            def job(*args):
+                with captured() as observations:
+                    try:
+                        providers.refresh()
+                        return func(*args)
+                    finally:
+                        # Left before the result, so whichever worker collects the result finds them
+                        job_manager.handle.set(job_metrics_key(os.getpid()), observations, expire=JOB_METRICS_TTL)
+            return app.callback(*dependencies, background=True, manager=job_manager, interval=JOB_POLL_INTERVAL,
+                                progress=progress, cancel=cancel, **kwargs)(job)
+
+        @wraps(func)
+        def inline(*args):
+            return func(lambda value: None, *args)
+        return app.callback(*dependencies, **kwargs)(inline)
+    return decorate
 
-# Initialize caching
-cache.init_app(app.server)
+# Per-stage callback timings, payload sizes and row counts, served on /metrics
+install_request_hooks(app.server)
+REGISTRY.gauge("provlocator_geocode_cache_hit_ratio", "Geocode store hit rate across all workers.",
+               lambda: geocache.stats()["hit_rate"])
+REGISTRY.gauge("provlocator_geocode_cache_entries", "Addresses in the geocode store.",
+               lambda: geocache.stats()["entries"])
+REGISTRY.gauge("provlocator_result_cache_hit_ratio", "Query result store hit rate across all workers.",
+               lambda: results.stats()["hit_rate"])
+REGISTRY.gauge("provlocator_result_cache_bytes", "Size of the stored query results.",
+               lambda: results.stats()["bytes"])
+REGISTRY.gauge("provlocator_provider_rows", "Providers in this worker's current dataset.",
+               lambda: len(providers.current()))
+REGISTRY.gauge("provlocator_provider_loaded_timestamp", "When this worker loaded its current dataset.",
+               lambda: providers.loaded)
+
+# Watch the provider file from each worker process, starting with its first request
+@app.server.before_request
+def start_reload_watcher():
+    providers.start()
 
 # Custom CSS for additional styling
 app.index_string = """
@@ -146,6 +381,22 @@ app.index_string = """
                 }
             }
         </style>
+        <script>
+            // Point style for the GeoJSON provider layer, matching create_dot_markers
+            window.provlocator = {
+                providerPoint: function(feature, latlng, context) {
+                    const hideout = context.hideout || {};
+                    const zoom = hideout.zoom == null ? 6 : hideout.zoom;
+                    return L.circleMarker(latlng, {
+                        radius: Math.max(2, (hideout.dotSize || 2) + (zoom - 10) * 0.3),
+                        color: "#343a40",
+                        weight: feature.properties.count > 1 ? 2 : 1,
+                        fillColor: feature.properties.pcp ? "#dc3545" : "#0d6efd",
+                        fillOpacity: 0.9
+                    });
+                }
+            };
+        </script>
     </head>
     <body>
         {%app_entry%}
@@ -159,7 +410,7 @@ app.index_string = """
 """
 
 # Function to create filters for Tab 1 with Enhanced Design
-def create_filters_tab1():
+def create_filters_tab1(store):
     return dbc.Card(
         [
             dbc.CardHeader(
@@ -182,7 +433,7 @@ def create_filters_tab1():
                                     dbc.InputGroup([
                                         dbc.InputGroupText(html.I(className="fa fa-map-marker-alt")),
                                         dcc.Dropdown(
-                                            options=[{"label": c, "value": c} for c in sorted(df["County"].unique())],
+                                            options=[{"label": c, "value": c} for c in store.filters.options("County")],
                                             id="filter-county",
                                             multi=True,
                                             placeholder="Select County",
@@ -199,7 +450,7 @@ def create_filters_tab1():
                                     dbc.InputGroup([
                                         dbc.InputGroupText(html.I(className="fa fa-industry")),
                                         dcc.Dropdown(
-                                            options=[{"label": m, "value": m} for m in sorted(df["Market"].unique())],
+                                            options=[{"label": m, "value": m} for m in store.filters.options("Market")],
                                             id="filter-market",
                                             multi=True,
                                             placeholder="Select Market",
@@ -216,7 +467,7 @@ def create_filters_tab1():
                                     dbc.InputGroup([
                                         dbc.InputGroupText(html.I(className="fa fa-user-md")),
                                         dcc.Dropdown(
-                                            options=[{"label": s, "value": s} for s in sorted(df["Specialty"].unique())],
+                                            options=[{"label": s, "value": s} for s in store.filters.options("Specialty")],
                                             id="filter-specialty",
                                             multi=True,
                                             placeholder="Select Specialty",
@@ -233,7 +484,7 @@ def create_filters_tab1():
                                     dbc.InputGroup([
                                         dbc.InputGroupText(html.I(className="fa fa-city")),
                                         dcc.Dropdown(
-                                            options=[{"label": c, "value": c} for c in sorted(df["City"].unique())],
+                                            options=[{"label": c, "value": c} for c in store.filters.options("City")],
                                             id="filter-city",
                                             multi=True,
                                             placeholder="Select City",
@@ -250,7 +501,7 @@ def create_filters_tab1():
                                     dbc.InputGroup([
                                         dbc.InputGroupText(html.I(className="fa fa-language")),
                                         dcc.Dropdown(
-                                            options=[{"label": l, "value": l} for l in sorted(df["Language"].unique())],
+                                            options=[{"label": l, "value": l} for l in store.filters.options("Language")],
                                             id="filter-language",
                                             multi=True,
                                             placeholder="Select Language",
@@ -279,7 +530,7 @@ def create_filters_tab1():
     )
 
 # Function to create filters for Tab 2 with Enhanced Design and "Calculate Radius" Button
-def create_filters_tab2():
+def create_filters_tab2(store):
     return dbc.Card(
         [
             dbc.CardHeader(
@@ -359,10 +610,27 @@ def create_filters_tab2():
                                 ])
                             ], className="mb-4"),
                             
+                            # Measure the bands in straight-line miles, or in drive minutes when a road graph is installed
+                            dbc.Row([
+                                dbc.Col([
+                                    dbc.Label("Measure"),
+                                    dbc.RadioItems(
+                                        id="distance-measure",
+                                        options=[
+                                            {"label": "Straight-line miles", "value": "miles"},
+                                            {"label": "Drive minutes", "value": DRIVE,
+                                             "disabled": not os.path.exists(ROADS_PATH)}
+                                        ],
+                                        value="miles",
+                                        inline=True
+                                    )
+                                ], width=12),
+                            ], className="mb-2"),
+
                             # Radius 1 and Radius 2
                             dbc.Row([
                                 dbc.Col([
-                                    dbc.Label("Radius 1 (miles)"),
+                                    dbc.Label("Radius 1 (miles)", id="radius1-label"),
                                     dbc.InputGroup([
                                         dbc.InputGroupText(html.I(className="fa fa-ruler")),
                                         dbc.Input(
@@ -376,7 +644,7 @@ def create_filters_tab2():
                                     ])
                                 ], width=6),
                                 dbc.Col([
-                                    dbc.Label("Radius 2 (miles)"),
+                                    dbc.Label("Radius 2 (miles)", id="radius2-label"),
                                     dbc.InputGroup([
                                         dbc.InputGroupText(html.I(className="fa fa-ruler")),
                                         dbc.Input(
@@ -389,6 +657,22 @@ def create_filters_tab2():
                                         )
                                     ])
                                 ], width=6),
+                            ], className="mb-2"),
+
+                            # Further distance bands beyond Radius 1 and Radius 2
+                            dbc.Row([
+                                dbc.Col([
+                                    dbc.Label("More Bands (miles)", id="radius-bands-label"),
+                                    dbc.InputGroup([
+                                        dbc.InputGroupText(html.I(className="fa fa-ruler-combined")),
+                                        dbc.Input(
+                                            id="radius-bands",
+                                            type="text",
+                                            placeholder="e.g. 15, 30",
+                                            style={"flex": "1"}
+                                        )
+                                    ])
+                                ], width=12),
                             ], className="mb-4"),
                             
                             html.Hr(),
@@ -400,7 +684,7 @@ def create_filters_tab2():
                                     dbc.InputGroup([
                                         dbc.InputGroupText(html.I(className="fa fa-map-marker-alt")),
                                         dcc.Dropdown(
-                                            options=[{"label": c, "value": c} for c in sorted(df["County"].unique())],
+                                            options=[{"label": c, "value": c} for c in store.filters.options("County")],
                                             id="filter2-county",
                                             multi=True,
                                             placeholder="Select County",
@@ -417,7 +701,7 @@ def create_filters_tab2():
                                     dbc.InputGroup([
                                         dbc.InputGroupText(html.I(className="fa fa-industry")),
                                         dcc.Dropdown(
-                                            options=[{"label": m, "value": m} for m in sorted(df["Market"].unique())],
+                                            options=[{"label": m, "value": m} for m in store.filters.options("Market")],
                                             id="filter2-market",
                                             multi=True,
                                             placeholder="Select Market",
@@ -434,7 +718,7 @@ def create_filters_tab2():
                                     dbc.InputGroup([
                                         dbc.InputGroupText(html.I(className="fa fa-user-md")),
                                         dcc.Dropdown(
-                                            options=[{"label": s, "value": s} for s in sorted(df["Specialty"].unique())],
+                                            options=[{"label": s, "value": s} for s in store.filters.options("Specialty")],
                                             id="filter2-specialty",
                                             multi=True,
                                             placeholder="Select Specialty",
@@ -451,7 +735,7 @@ def create_filters_tab2():
                                     dbc.InputGroup([
                                         dbc.InputGroupText(html.I(className="fa fa-city")),
                                         dcc.Dropdown(
-                                            options=[{"label": c, "value": c} for c in sorted(df["City"].unique())],
+                                            options=[{"label": c, "value": c} for c in store.filters.options("City")],
                                             id="filter2-city",
                                             multi=True,
                                             placeholder="Select City",
@@ -468,7 +752,7 @@ def create_filters_tab2():
                                     dbc.InputGroup([
                                         dbc.InputGroupText(html.I(className="fa fa-language")),
                                         dcc.Dropdown(
-                                            options=[{"label": l, "value": l} for l in sorted(df["Language"].unique())],
+                                            options=[{"label": l, "value": l} for l in store.filters.options("Language")],
                                             id="filter2-language",
                                             multi=True,
                                             placeholder="Select Language",
@@ -486,6 +770,19 @@ def create_filters_tab2():
                                 className="mt-3 w-100",
                                 size="md"
                             ),
+
+                            # Progress and cancellation of a running geo-access search
+                            html.Div([
+                                dbc.Progress(id="geo-progress", value=0, striped=True, animated=True,
+                                             className="mt-3"),
+                                dbc.Button(
+                                    "Cancel",
+                                    id="cancel-radius-button",
+                                    color="outline-danger",
+                                    className="mt-2 w-100",
+                                    size="sm"
+                                )
+                            ], id="geo-progress-panel", style={"display": "none"}),
                             
                             # Clear All Filters Button
                             dbc.Button(
@@ -506,280 +803,648 @@ def create_filters_tab2():
         className="mb-4 sidebar"
     )
 
-# Function to create CircleMarkers with popups and custom icons
-def create_dot_markers(data, zoom, dot_size):
+# Function to group selected providers by site, one representative provider per site
+def group_sites(store, positions):
+    """
+    Returns (representative positions, provider counts, PCP counts), one entry per
+    site with selected providers, in order of each site's first selected provider.
+    - store: Provider store snapshot
+    - positions: Row positions in the provider store
+    """
+    labels = store.sites.labels[positions]
+    _, first, inverse, counts = np.unique(labels, return_index=True, return_inverse=True, return_counts=True)
+    pcp = np.bincount(inverse, weights=store.clusters.is_pcp[positions], minlength=len(first)).astype(np.int64)
+    order = np.argsort(first)
+    return positions[first[order]], counts[order], pcp[order]
+
+# Function to create CircleMarkers keyed by provider; their popups are fetched when clicked
+def create_dot_markers(data, zoom, dot_size, kind, counts=None, pcp=None):
     """
     Create CircleMarkers with conditional coloring and dynamic sizing.
-    - data: Filtered DataFrame
+    - data: Filtered DataFrame, indexed by provider store position
     - zoom: Current zoom level of the map
     - dot_size: User-controlled size multiplier from the slider
+    - kind: Map the markers belong to ("provider" or "geo"), used in their ids
+    - counts, pcp: Optional providers and PCPs at each row's site, from group_sites; a
+      site with several providers is colored by its majority and gets a count tooltip
     """
     base_size = dot_size  # From slider
     radius = max(2, base_size + (zoom - 10)*0.3)
+    if counts is None:
+        counts = np.ones(len(data), dtype=np.int64)
+        pcp = data["Specialty"].astype(str).str.strip().str.upper().eq("PCP").to_numpy().astype(np.int64)
     markers = []
-    for _, row in data.iterrows():
-        specialty = str(row.get("Specialty", "")).strip().upper()
-        color = "#dc3545" if specialty == "PCP" else "#0d6efd"
-        # Popup content
+    for position, lat, lon, count, pcp_count in zip(data.index, data["Latitude"], data["Longitude"],
+                                                    counts.tolist(), pcp.tolist()):
+        color = "#dc3545" if pcp_count * 2 >= count else "#0d6efd"
+        markers.append(
+            dl.CircleMarker(
+                id={"type": f"{kind}-dot", "index": int(position)},
+                # Six decimals is ~10 cm; stroke, fill and interactive are Leaflet's defaults
+                center=(round(lat, 6), round(lon, 6)),
+                radius=radius,
+                color="#343a40",
+                weight=2 if count > 1 else 1,
+                fillColor=color,
+                fillOpacity=0.9,
+                children=[dl.Tooltip(f"{count:,} providers at this site")] if count > 1 else None
+            )
+        )
+    return markers
+
+# Function to create the popup for one provider, or for every selected provider at its site
+def create_provider_popup(store, position, kind, clicks, selected=None):
+    """
+    - store: Provider store snapshot the position refers to
+    - position: Provider store position carried in the clicked marker's id
+    - kind: Map the popup belongs to ("provider" or "geo")
+    - clicks: Click count, so a popup closed by the user reopens on the next click
+    - selected: Optional store positions the map shows; when several of them share the
+      clicked provider's site, the popup summarizes the site instead
+    """
+    if not 0 <= position < len(store):
+        return []
+    row = store.df.iloc[position]
+    members = np.empty(0, dtype=np.int64)
+    if selected is not None:
+        members, _ = store.sites.members([store.sites.labels[position]])
+        members = members[np.isin(members, selected)]
+    if len(members) > 1:
+        specialties = store.df["Specialty"].iloc[members].astype(str).value_counts()
+        pcp = int(store.clusters.is_pcp[members].sum())
         popup_content = [
-            html.H5(row.get('ProviderName', 'N/A'), style={"margin-bottom": "5px"}),
-            html.P(f"Provider ID: {row.get('ProviderID', 'N/A')}", style={"margin": "0"}),
-            html.P(f"Vendor ID: {row.get('VendorID', 'N/A')}", style={"margin": "0"}),
-            html.P(f"PCN ID: {row.get('PCNID', 'N/A')}", style={"margin": "0"}),
-            html.P(f"Address: {row.get('Address', 'N/A')}", style={"margin": "0"})
+            html.H5(row.get('Address', 'N/A'), style={"margin-bottom": "5px"}),
+            html.P(f"{len(members):,} providers: {pcp:,} PCP / {len(members) - pcp:,} specialist",
+                   style={"margin": "0"}),
+            html.Ul([html.Li(f"{specialty}: {count:,}") for specialty, count in specialties.items()],
+                    style={"margin": "5px 0 0 0", "padding-left": "20px", "max-height": "200px",
+                           "overflow-y": "auto"})
         ]
+        return [dl.Popup(popup_content, id=f"{kind}-popup-{position}-{clicks}",
+                         position=(store.lats[position], store.lons[position]))]
+    popup_content = [
+        html.H5(row.get('ProviderName', 'N/A'), style={"margin-bottom": "5px"}),
+        html.P(f"Provider ID: {row.get('ProviderID', 'N/A')}", style={"margin": "0"}),
+        html.P(f"Vendor ID: {row.get('VendorID', 'N/A')}", style={"margin": "0"}),
+        html.P(f"PCN ID: {row.get('PCNID', 'N/A')}", style={"margin": "0"}),
+        html.P(f"Address: {row.get('Address', 'N/A')}", style={"margin": "0"})
+    ]
+    # A new id per click remounts the popup, which opens it
+    return [dl.Popup(popup_content, id=f"{kind}-popup-{position}-{clicks}",
+                     position=(store.lats[position], store.lons[position]))]
+
+# Function to create cluster markers from precomputed cluster aggregates
+def create_cluster_markers(groups, dot_size, kind):
+    """
+    Create one CircleMarker per cluster, sized by its provider count.
+    - groups: Cluster arrays from ClusterIndex.clusters
+    - dot_size: User-controlled size multiplier from the slider
+    - kind: Map the markers belong to ("provider" or "geo"), used in their ids
+    """
+    markers = []
+    for i, (lat, lon, count, pcp) in enumerate(zip(groups["lat"], groups["lon"], groups["count"], groups["pcp"])):
+        count, pcp = int(count), int(pcp)
+        color = "#dc3545" if pcp * 2 >= count else "#0d6efd"
         markers.append(
             dl.CircleMarker(
-                center=(row['Latitude'], row['Longitude']),
-                radius=radius,
+                id={"type": f"{kind}-cluster", "index": i, "count": count},
+                center=(lat, lon),
+                radius=dot_size * 3 + min(25, 2 * count ** 0.5),
                 stroke=True,
-                color="#343a40",
-                weight=1,
+                color="#ffffff",
+                weight=2,
                 fill=True,
                 fillColor=color,
-                fillOpacity=0.9,
-                children=[dl.Popup(popup_content)],
+                fillOpacity=0.75,
+                children=[dl.Tooltip(f"{count:,} providers: {pcp:,} PCP / {count - pcp:,} specialist")],
                 interactive=True
             )
         )
     return markers
 
-# Tab 1 layout with Enhanced Filters
-tab1_layout = dbc.Container([
-    dbc.Row([
-        # Sidebar for Filters
-        dbc.Col(
-            create_filters_tab1(),
-            width=3,
-            id="sidebar-tab1",
-            style={"position": "sticky", "top": "20px", "height": "fit-content"}
-        ),
-        # Main Content
-        dbc.Col(
-            html.Div([
-                # Map Controls with Tooltips
-                dbc.Row([
-                    dbc.Col([
-                        dbc.Label("Map Style", className="slider-label"),
-                        dcc.Dropdown(
-                            id="map-style-dropdown",
-                            options=[
-                                {"label": "OpenStreetMap Standard", "value": "osm"},
-                                {"label": "Esri World Imagery", "value": "world_imagery"},
-                                {"label": "CartoDB Positron", "value": "positron"},
-                                {"label": "Stamen Terrain", "value": "terrain"}
-                            ],
-                            value="osm",
-                            clearable=False,
-                            style={"width": "100%"},
-                            placeholder="Select Map Style"
-                        )
-                    ], width=4),
-                    dbc.Col([
-                        html.Div([
-                            dbc.Label("Dot Size", className="slider-label"),
-                            dcc.Slider(
-                                id="dot-size-slider1",
-                                min=1,
-                                max=5,
-                                step=0.5,
-                                value=2,
-                                marks={i: str(i) for i in range(1, 6)},
-                                tooltip={"placement": "bottom", "always_visible": True},
-                                updatemode='drag',
-                                vertical=False,
-                            ),
-                        ], style={"padding": "20px 20px 0 20px"})
-                    ], width=8)
-                ], className="mb-4"),
-                # Interactive Map
+# Function to create the markers for a selection of providers, clustered or as single dots
+def create_markers(store, positions, zoom, dot_size, cluster, kind, bounds=None):
+    """
+    - store: Provider store snapshot
+    - positions: Row positions in the provider store
+    - zoom: Current zoom level of the map
+    - dot_size: User-controlled size multiplier from the slider
+    - cluster: Aggregate providers into clusters below the single-dot zoom; either way,
+      providers at one site share a dot
+    - kind: Map the markers belong to ("provider" or "geo")
+    - bounds: Visible map bounds; when given, only providers inside them (plus a margin) are drawn,
+      and dense views are aggregated or sampled down to MAX_VIEWPORT_MARKERS
+    """
+    if bounds:
+        positions = store.in_bounds(positions, bounds, margin=VIEWPORT_MARGIN)
+    # Providers sharing a site are drawn as one dot
+    sites, counts, pcp = group_sites(store, positions)
+    if bounds:
+        # Too many dots for the visible area: aggregate them instead
+        cluster = cluster or len(sites) > MAX_VIEWPORT_MARKERS
+    if not cluster:
+        return create_dot_markers(store.df.iloc[sites], zoom, dot_size, kind, counts, pcp)
+    groups = store.clusters.clusters(positions, zoom)
+    sites, counts, pcp = group_sites(store, groups["singles"])
+    if bounds and len(sites) > MAX_VIEWPORT_MARKERS:
+        # Past the clustering zooms every site is single; keep an evenly spaced sample
+        sample = np.linspace(0, len(sites) - 1, MAX_VIEWPORT_MARKERS).astype(np.int64)
+        sites, counts, pcp = sites[sample], counts[sample], pcp[sample]
+    return (create_cluster_markers(groups, dot_size, kind)
+            + create_dot_markers(store.df.iloc[sites], zoom, dot_size, kind, counts, pcp))
+
+# Function to collect the distance band limits from Radius 1, Radius 2 and the extra bands, ascending
+def band_radii(radius1, radius2, extra_bands):
+    radii = [r for r in [radius1, radius2] if r]
+    for part in (extra_bands or "").replace(";", ",").split(","):
+        try:
+            radii.append(float(part))
+        except ValueError:
+            continue
+    return sorted({float(r) for r in radii if math.isfinite(r) and r > 0})
+
+# Function to run a geo-access query: filtered providers within the largest radius, nearest first
+def run_geo_query(store, query):
+    with stage("filter"):
+        mask = store.filters.mask(**query["filters"])
+    if query.get("measure") == DRIVE:
+        return run_drive_query(store, query, mask)
+    with stage("distance"):
+        positions, distances = store.within_radius(tuple(query["origin"]), max(query["radii"]),
+                                                   method=DISTANCE_METHOD, mask=mask)
+        order = np.argsort(distances, kind="stable")
+    return positions[order], distances[order]
+
+# Function to run a drive-time geo-access query: filtered providers within the largest band in
+# minutes, nearest first, with drive minutes in place of miles
+def run_drive_query(store, query, mask):
+    network = road_network()
+    if network is None:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    limit = max(query["radii"])
+    origin = tuple(query["origin"])
+    with stage("distance"):
+        # Only providers within straight-line reach of the time limit are looked up on the graph
+        positions, _ = store.within_radius(origin, network.reach_miles(limit), method=HAVERSINE, mask=mask)
+        nodes, access = store.road_nodes(network)
+        minutes = network.drive_minutes(origin, nodes[positions], access[positions], limit)
+        reached = np.isfinite(minutes)
+        positions, minutes = positions[reached], minutes[reached]
+        order = np.argsort(minutes, kind="stable")
+    return positions[order], minutes[order]
+
+# Function to compute a table query: row positions, plus distances for geo-access queries
+def compute_query(store, query):
+    if query and "origin" in query:
+        return run_geo_query(store, query)
+    with stage("filter"):
+        return store.filters.select(**(query or {})), None
+
+# Function to resolve a table query against a store snapshot, through the shared result store unless it has no filters
+@lru_cache(maxsize=64)
+def resolve_query(store, query_json):
+    query = json.loads(query_json)
+    if not query or not any(query.values()):
+        return compute_query(store, query)
+    return results.get_or_compute(query_key(query_json, store.version), lambda: compute_query(store, query))
+
+# Function to get the sorted rows of a table query
+def table_rows(store, query, sort_by):
+    positions, distances = resolve_query(store, json.dumps(query, sort_keys=True))
+    if sort_by:
+        column, ascending = sort_by[0]["column_id"], sort_by[0]["direction"] == "asc"
+        # Bands follow distance order, so both sort by distance
+        by_distance = column in ("Distance", "Band")
+        if by_distance and distances is None:
+            return positions, distances
+        order = store.sort_order(positions, column, ascending, values=distances if by_distance else None)
+        positions = positions[order]
+        distances = None if distances is None else distances[order]
+    return positions, distances
+
+# Function to build the table frame for a slice of rows, with distance bands for geo-access queries
+def table_frame(store, positions, distances, radii=None, unit="mi"):
+    frame = store.df.iloc[positions]
+    if distances is not None:
+        frame = frame.assign(Distance=distances.round(2))
+        if radii:
+            frame = frame.assign(Band=np.array(band_labels(radii, unit))[distance_bands(distances, radii)])
+    return frame
+
+# Function to get the band limits of a table query, or None for a tab 1 query
+def query_radii(query):
+    return query["radii"] if query and "origin" in query else None
+
+# Function to get the unit of a table query's distances: drive minutes or miles
+def query_unit(query):
+    return "min" if query and query.get("measure") == DRIVE else "mi"
+
+# Function to get the geo-access table columns, with the distance header for the query's unit
+def geo_table_columns(store, query=None):
+    return [{"name": col, "id": col} for col in store.df.columns] + [
+        {"name": DISTANCE_HEADERS[query_unit(query)], "id": "Distance"}, {"name": "Distance Band", "id": "Band"}]
+
+# Function to serve one page of a table query
+def table_page(store, query, page_current, page_size, sort_by):
+    positions, distances = table_rows(store, query, sort_by)
+    page = slice(page_current * page_size, (page_current + 1) * page_size)
+    data = table_frame(store, positions[page], None if distances is None else distances[page],
+                       query_radii(query), query_unit(query)).to_dict("records")
+    return data, max(1, math.ceil(len(positions) / page_size))
+
+# Function to count a geo-access query's providers per specialty and distance band
+def band_summary(store, query):
+    positions, distances = resolve_query(store, json.dumps(query, sort_keys=True))
+    radii = query["radii"]
+    labels = band_labels(radii, query_unit(query))
+    # A columnar store reads Specialty back as a Categorical, which cannot take a new "Unknown" value
+    codes, specialties = pd.factorize(store.df["Specialty"].iloc[positions].astype(object).fillna("Unknown"),
+                                      sort=True)
+    # One bincount over (specialty, band) pairs
+    cells = codes * len(radii) + distance_bands(distances, radii)
+    counts = np.bincount(cells, minlength=len(specialties) * len(radii)).reshape(len(specialties), len(radii))
+    frame = pd.DataFrame(counts, columns=labels)
+    frame.insert(0, "Specialty", list(specialties))
+    frame["Total"] = counts.sum(axis=1)
+    totals = frame.drop(columns="Specialty").sum().to_frame().T.assign(Specialty="All Specialties")
+    return pd.concat([frame, totals[frame.columns]], ignore_index=True)
+
+# Function to build the streamed CSV export link for a table query
+def export_href(name, query, sort_by):
+    return f"/export/{name}.csv?" + urlencode({"query": json.dumps(query), "sort_by": json.dumps(sort_by or [])})
+
+# Function to get the initial map center: the mean location of the providers that have coordinates
+@lru_cache(maxsize=1)
+def store_center(store):
+    located = np.isfinite(store.lats) & np.isfinite(store.lons)
+    if not located.any():
+        return DEFAULT_CENTER
+    return (store.lats[located].mean(), store.lons[located].mean())
+
+# Tab 1 layout with Enhanced Filters, built once per provider store
+@lru_cache(maxsize=1)
+def tab1_layout(store):
+    return dbc.Container([
+        dbc.Row([
+            # Sidebar for Filters
+            dbc.Col(
+                create_filters_tab1(store),
+                width=3,
+                id="sidebar-tab1",
+                style={"position": "sticky", "top": "20px", "height": "fit-content"}
+            ),
+            # Main Content
+            dbc.Col(
                 html.Div([
-                    dl.Map([
-                        dl.TileLayer(id="base-tile", url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"),
-                        dl.LayerGroup(id="provider-markers"),
-                    ], id="provider-map", className="map-container", center=(df['Latitude'].mean(), df['Longitude'].mean()), zoom=6)
-                ], className="map-container"),
-                # Loading Indicator for Map
-                dcc.Loading(
-                    id="loading-map-tab1",
-                    type="default",
-                    children=html.Div(id="map-loading-output")
-                )
-            ], style={"position": "relative"})
-            , width=9
-        )
-    ], className="mb-4"),
-    dbc.Row([
-        dbc.Col(
-            dbc.Card(
-                [
-                    dbc.CardHeader(html.H5("Provider Data", className="mb-0")),
-                    dbc.CardBody(
-                        dash_table.DataTable(
-                            id="provider-table",
-                            columns=[{"name": col, "id": col} for col in df.columns],
-                            data=df.to_dict("records"),
-                            style_table={"overflowX": "auto"},
-                            style_cell={
-                                'textAlign': 'left',
-                                'padding': '10px',
-                                'font-family': 'Roboto, sans-serif',
-                                'font-size': '14px'
-                            },
-                            style_header={
-                                'backgroundColor': '#0d6efd',
-                                'color': 'white',
-                                'fontWeight': '500',
-                                'fontSize': '16px'
-                            },
-                            page_size=10,
-                            sort_action="native",
-                            filter_action='none',
-                            style_data_conditional=[
-                                {
-                                    'if': {'row_index': 'odd'},
-                                    'backgroundColor': '#f8f9fa'
-                                }
-                            ],
-                            export_format="csv",
-                            export_headers="display",
-                            merge_duplicate_headers=True,
-                            style_as_list_view=True,
-                        )
+                    # Map Controls with Tooltips
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Label("Map Style", className="slider-label"),
+                            dcc.Dropdown(
+                                id="map-style-dropdown",
+                                options=[
+                                    {"label": "OpenStreetMap Standard", "value": "osm"},
+                                    {"label": "Esri World Imagery", "value": "world_imagery"},
+                                    {"label": "CartoDB Positron", "value": "positron"},
+                                    {"label": "Stamen Terrain", "value": "terrain"}
+                                ],
+                                value="osm",
+                                clearable=False,
+                                style={"width": "100%"},
+                                placeholder="Select Map Style"
+                            )
+                        ], width=4),
+                        dbc.Col([
+                            html.Div([
+                                dbc.Label("Dot Size", className="slider-label"),
+                                dcc.Slider(
+                                    id="dot-size-slider1",
+                                    min=1,
+                                    max=5,
+                                    step=0.5,
+                                    value=2,
+                                    marks={i: str(i) for i in range(1, 6)},
+                                    tooltip={"placement": "bottom", "always_visible": True},
+                                    updatemode='drag',
+                                    vertical=False,
+                                ),
+                            ], style={"padding": "20px 20px 0 20px"})
+                        ], width=5),
+                        dbc.Col([
+                            dbc.Label("Markers", className="slider-label"),
+                            dbc.Checklist(
+                                id="cluster-toggle1",
+                                options=[{"label": "Cluster markers", "value": "cluster"}],
+                                value=["cluster"],
+                                switch=True,
+                            ),
+                            dbc.Checklist(
+                                id="viewport-toggle1",
+                                options=[{"label": "Visible area only", "value": "viewport"}],
+                                value=["viewport"],
+                                switch=True,
+                            ),
+                            dbc.Checklist(
+                                id="layer-toggle1",
+                                options=[{"label": "GeoJSON layer", "value": "geojson"}],
+                                value=[],
+                                switch=True,
+                            )
+                        ], width=3)
+                    ], className="mb-4"),
+                    # Interactive Map
+                    html.Div([
+                        dl.Map([
+                            dl.TileLayer(id="base-tile", url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"),
+                            dl.LayerGroup(id="provider-markers"),
+                            dl.GeoJSON(id="provider-geojson", pointToLayer={"variable": "provlocator.providerPoint"},
+                                       hideout={"dotSize": 2, "zoom": 6}),
+                            dl.LayerGroup(id="provider-popup"),
+                        ], id="provider-map", className="map-container", center=store_center(store), zoom=6)
+                    ], className="map-container"),
+                    # Loading Indicator for Map
+                    dcc.Loading(
+                        id="loading-map-tab1",
+                        type="default",
+                        children=html.Div(id="map-loading-output")
                     )
-                ],
-                className="table-container"
-            ), width=12
-        )
-    ]),
-    # Loading Indicator for Table
-    dcc.Loading(
-        id="loading-table-tab1",
-        type="default",
-        children=html.Div(id="table-loading-output")
-    )
-], fluid=True)
-
-# Tab 2 layout with Enhanced Filters and "Calculate Radius" Button
-tab2_layout = dbc.Container([
-    dbc.Row([
-        # Sidebar for Address Inputs and Filters
-        dbc.Col(
-            create_filters_tab2(),
-            width=3,
-            id="sidebar-tab2",
-            style={"position": "sticky", "top": "20px", "height": "fit-content"}
-        ),
-        # Main Content
-        dbc.Col(
-            html.Div([
-                # Map Controls with Tooltips
-                dbc.Row([
-                    dbc.Col([
-                        dbc.Label("Map Style", className="slider-label"),
-                        dcc.Dropdown(
-                            id="geoaccess-map-style-dropdown",
-                            options=[
-                                {"label": "OpenStreetMap Standard", "value": "osm"},
-                                {"label": "Esri World Imagery", "value": "world_imagery"},
-                                {"label": "CartoDB Positron", "value": "positron"},
-                                {"label": "Stamen Terrain", "value": "terrain"}
-                            ],
-                            value="osm",
-                            clearable=False,
-                            style={"width": "100%"},
-                            placeholder="Select Map Style"
+                ], style={"position": "relative"})
+                , width=9
+            )
+        ], className="mb-4"),
+        dbc.Row([
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader(html.Div([
+                            html.H5("Provider Data", className="mb-0"),
+                            html.A(
+                                dbc.Button([html.I(className="fa fa-download mr-2"), "Export CSV"], color="primary", size="sm"),
+                                id="provider-export",
+                                href="#"
+                            )
+                        ], className="d-flex justify-content-between align-items-center")),
+                        dbc.CardBody(
+                            dash_table.DataTable(
+                                id="provider-table",
+                                columns=[{"name": col, "id": col} for col in store.df.columns],
+                                data=[],
+                                style_table={"overflowX": "auto"},
+                                style_cell={
+                                    'textAlign': 'left',
+                                    'padding': '10px',
+                                    'font-family': 'Roboto, sans-serif',
+                                    'font-size': '14px'
+                                },
+                                style_header={
+                                    'backgroundColor': '#0d6efd',
+                                    'color': 'white',
+                                    'fontWeight': '500',
+                                    'fontSize': '16px'
+                                },
+                                page_current=0,
+                                page_size=10,
+                                page_action="custom",
+                                sort_action="custom",
+                                sort_mode="single",
+                                sort_by=[],
+                                filter_action='none',
+                                style_data_conditional=[
+                                    {
+                                        'if': {'row_index': 'odd'},
+                                        'backgroundColor': '#f8f9fa'
+                                    }
+                                ],
+                                merge_duplicate_headers=True,
+                                style_as_list_view=True,
+                            )
                         )
-                    ], width=4),
-                    dbc.Col([
-                        html.Div([
-                            dbc.Label("Dot Size", className="slider-label"),
-                            dcc.Slider(
-                                id="dot-size-slider2",
-                                min=1,
-                                max=5,
-                                step=0.5,
-                                value=2,
-                                marks={i: str(i) for i in range(1, 6)},
-                                tooltip={"placement": "bottom", "always_visible": True},
-                                updatemode='drag',
-                                vertical=False,
-                            ),
-                        ], style={"padding": "20px 20px 0 20px"})
-                    ], width=8)
-                ], className="mb-4"),
-                # Interactive Map with Correct Layer Order
+                    ],
+                    className="table-container"
+                ), width=12
+            )
+        ]),
+        # Loading Indicator for Table
+        dcc.Loading(
+            id="loading-table-tab1",
+            type="default",
+            children=html.Div(id="table-loading-output")
+        ),
+        # Current provider filters, shared by the table paging callback
+        dcc.Store(id="provider-query"),
+        # Provider whose marker was clicked last, set in the browser
+        dcc.Store(id="provider-popup-key")
+    ], fluid=True)
+
+# Tab 2 layout with Enhanced Filters and "Calculate Radius" Button, built once per provider store
+@lru_cache(maxsize=1)
+def tab2_layout(store):
+    return dbc.Container([
+        dbc.Row([
+            # Sidebar for Address Inputs and Filters
+            dbc.Col(
+                create_filters_tab2(store),
+                width=3,
+                id="sidebar-tab2",
+                style={"position": "sticky", "top": "20px", "height": "fit-content"}
+            ),
+            # Main Content
+            dbc.Col(
                 html.Div([
-                    dl.Map([
-                        dl.TileLayer(id="base-tile-geoaccess", url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"),
-                        dl.LayerGroup(id="geoaccess-circles"),   # Add circles first
-                        dl.LayerGroup(id="geoaccess-markers")    # Add markers after
+                    # Map Controls with Tooltips
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Label("Map Style", className="slider-label"),
+                            dcc.Dropdown(
+                                id="geoaccess-map-style-dropdown",
+                                options=[
+                                    {"label": "OpenStreetMap Standard", "value": "osm"},
+                                    {"label": "Esri World Imagery", "value": "world_imagery"},
+                                    {"label": "CartoDB Positron", "value": "positron"},
+                                    {"label": "Stamen Terrain", "value": "terrain"}
+                                ],
+                                value="osm",
+                                clearable=False,
+                                style={"width": "100%"},
+                                placeholder="Select Map Style"
+                            )
+                        ], width=4),
+                        dbc.Col([
+                            html.Div([
+                                dbc.Label("Dot Size", className="slider-label"),
+                                dcc.Slider(
+                                    id="dot-size-slider2",
+                                    min=1,
+                                    max=5,
+                                    step=0.5,
+                                    value=2,
+                                    marks={i: str(i) for i in range(1, 6)},
+                                    tooltip={"placement": "bottom", "always_visible": True},
+                                    updatemode='drag',
+                                    vertical=False,
+                                ),
+                            ], style={"padding": "20px 20px 0 20px"})
+                        ], width=5),
+                        dbc.Col([
+                            dbc.Label("Markers", className="slider-label"),
+                            dbc.Checklist(
+                                id="cluster-toggle2",
+                                options=[{"label": "Cluster markers", "value": "cluster"}],
+                                value=["cluster"],
+                                switch=True,
+                            ),
+                            dbc.Checklist(
+                                id="viewport-toggle2",
+                                options=[{"label": "Visible area only", "value": "viewport"}],
+                                value=["viewport"],
+                                switch=True,
+                            ),
+                            dbc.Checklist(
+                                id="layer-toggle2",
+                                options=[{"label": "GeoJSON layer", "value": "geojson"}],
+                                value=[],
+                                switch=True,
+                            )
+                        ], width=3)
+                    ], className="mb-4"),
+                    # Interactive Map with Correct Layer Order
+                    html.Div([
+                        dl.Map([
+                            dl.TileLayer(id="base-tile-geoaccess", url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"),
+                            dl.LayerGroup(id="geoaccess-circles"),   # Add circles first
+                            dl.LayerGroup(id="geoaccess-markers"),   # Add markers after
+                            dl.GeoJSON(id="geo-geojson", pointToLayer={"variable": "provlocator.providerPoint"},
+                                       hideout={"dotSize": 2, "zoom": 6}),
+                            dl.LayerGroup(id="geo-popup")
+                        ],
+                        id="geoaccess-map",
+                        className="map-container",
+                        center=store_center(store),
+                        zoom=6)
+                    ], className="map-container"),
+                    # Loading Indicator for Map
+                    dcc.Loading(
+                        id="loading-map-tab2",
+                        type="default",
+                        children=html.Div(id="map-loading-output-tab2")
+                    )
+                ], style={"position": "relative"})
+                , width=9
+            )
+        ], className="mb-4"),
+        # Provider counts per specialty and distance band for the current query
+        dbc.Row([
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader(html.H5("Providers by Distance Band", className="mb-0")),
+                        dbc.CardBody(html.Div(id="band-summary"))
                     ],
-                    id="geoaccess-map",
-                    className="map-container",
-                    center=(df['Latitude'].mean(), df['Longitude'].mean()),
-                    zoom=6)
-                ], className="map-container"),
-                # Loading Indicator for Map
-                dcc.Loading(
-                    id="loading-map-tab2",
-                    type="default",
-                    children=html.Div(id="map-loading-output-tab2")
-                )
-            ], style={"position": "relative"})
-            , width=9
-        )
-    ], className="mb-4"),
-    dbc.Row([
-        dbc.Col(
-            dbc.Card(
-                [
-                    dbc.CardHeader(html.H5("Geo-Access Provider Data", className="mb-0")),
-                    dbc.CardBody(
-                        dash_table.DataTable(
-                            id="geo-provider-table",
-                            columns=[{"name": col, "id": col} for col in df.columns] + [{"name": "Distance (Miles)", "id": "Distance"}],
-                            data=[],
-                            style_table={"overflowX": "auto"},
-                            style_cell={
-                                'textAlign': 'left',
-                                'padding': '10px',
-                                'font-family': 'Roboto, sans-serif',
-                                'font-size': '14px'
-                            },
-                            style_header={
-                                'backgroundColor': '#28a745',
-                                'color': 'white',
-                                'fontWeight': '500',
-                                'fontSize': '16px'
-                            },
-                            page_size=10,
-                            sort_action="native",
-                            filter_action='none',
-                            style_data_conditional=[
-                                {
-                                    'if': {'row_index': 'odd'},
-                                    'backgroundColor': '#f8f9fa'
-                                }
-                            ],
-                            export_format="csv",
-                            export_headers="display",
-                            merge_duplicate_headers=True,
-                            style_as_list_view=True,
+                    className="table-container"
+                ), width=12
+            )
+        ], className="mb-4"),
+        dbc.Row([
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader(html.Div([
+                            html.H5("Geo-Access Provider Data", className="mb-0"),
+                            html.A(
+                                dbc.Button([html.I(className="fa fa-download mr-2"), "Export CSV"], color="success", size="sm"),
+                                id="geo-export",
+                                href="#"
+                            )
+                        ], className="d-flex justify-content-between align-items-center")),
+                        dbc.CardBody(
+                            dash_table.DataTable(
+                                id="geo-provider-table",
+                                columns=geo_table_columns(store),
+                                data=[],
+                                style_table={"overflowX": "auto"},
+                                style_cell={
+                                    'textAlign': 'left',
+                                    'padding': '10px',
+                                    'font-family': 'Roboto, sans-serif',
+                                    'font-size': '14px'
+                                },
+                                style_header={
+                                    'backgroundColor': '#28a745',
+                                    'color': 'white',
+                                    'fontWeight': '500',
+                                    'fontSize': '16px'
+                                },
+                                page_current=0,
+                                page_size=10,
+                                page_action="custom",
+                                sort_action="custom",
+                                sort_mode="single",
+                                sort_by=[],
+                                filter_action='none',
+                                style_data_conditional=[
+                                    {
+                                        'if': {'row_index': 'odd'},
+                                        'backgroundColor': '#f8f9fa'
+                                    }
+                                ],
+                                merge_duplicate_headers=True,
+                                style_as_list_view=True,
+                            )
                         )
-                    )
-                ],
-                className="table-container"
-            ), width=12
-        )
-    ]),
-    # Loading Indicator for Table
-    dcc.Loading(
-        id="loading-table-tab2",
-        type="default",
-        children=html.Div(id="table-loading-output-tab2")
-    )
-], fluid=True)
+                    ],
+                    className="table-container"
+                ), width=12
+            )
+        ]),
+        # Loading Indicator for Table
+        dcc.Loading(
+            id="loading-table-tab2",
+            type="default",
+            children=html.Div(id="table-loading-output-tab2")
+        ),
+        # Batch adequacy report for an uploaded member roster
+        dbc.Row([
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader(html.H5("Network Adequacy Report", className="mb-0")),
+                        dbc.CardBody([
+                            html.P(
+                                "Upload a member CSV with MemberID and either Latitude/Longitude or "
+                                "Address/City/State/Zip columns. Distances to the nearest provider of each "
+                                "specialty are banded by the Radius 1, Radius 2 and More Bands limits.",
+                                className="text-muted"
+                            ),
+                            dcc.Upload(
+                                dbc.Button([html.I(className="fa fa-upload mr-2"), "Upload Member File"],
+                                           color="success", size="md"),
+                                id="adequacy-upload",
+                                accept=".csv"
+                            ),
+                            html.Div([
+                                dbc.Progress(id="adequacy-progress", value=0, striped=True, animated=True,
+                                             className="mt-3"),
+                                dbc.Button("Cancel", id="cancel-adequacy-button", color="outline-danger",
+                                           className="mt-2", size="sm")
+                            ], id="adequacy-progress-panel", style={"display": "none"}),
+                            dcc.Loading(
+                                id="loading-adequacy",
+                                type="default",
+                                children=html.Div(id="adequacy-summary", className="mt-4")
+                            ),
+                            dcc.Download(id="adequacy-download")
+                        ])
+                    ],
+                    className="table-container"
+                ), width=12
+            )
+        ]),
+        # Current geo-access query, shared by the marker and table paging callbacks
+        dcc.Store(id="geo-query"),
+        # A search too large to answer inline, handed to the background job
+        dcc.Store(id="geo-job"),
+        dcc.Store(id="geo-popup-key")
+    ], fluid=True)
 
 # App layout with tabs and navbar
 app.layout = dbc.Container([
@@ -802,6 +1467,13 @@ app.layout = dbc.Container([
     html.Div(id="tab-content", className="p-4")
 ], fluid=True)
 
+# Drop per-process caches holding the old store once a reload swaps it out
+def clear_store_caches(store):
+    for cached in (resolve_query, query_geojson, query_tile, store_center, tab1_layout, tab2_layout):
+        cached.cache_clear()
+
+providers.on_reload(clear_store_caches)
+
 # Callback to toggle Accordion in Tab 1
 @app.callback(
     Output("collapse-tab1", "is_open"),
@@ -829,11 +1501,12 @@ def toggle_collapse_tab2(n, is_open):
     Output("tab-content", "children"),
     Input("tabs", "active_tab")
 )
+@instrumented("render_tab_content")
 def render_tab_content(active_tab):
     if active_tab == "tab-1":
-        return tab1_layout
+        return tab1_layout(current_store())
     elif active_tab == "tab-2":
-        return tab2_layout
+        return tab2_layout(current_store())
     else:
         return dbc.Jumbotron(
             [
@@ -846,9 +1519,9 @@ def render_tab_content(active_tab):
 # Callback for Tab 1: Update Provider Table and Markers
 @app.callback(
     [
-        Output("provider-table", "data"),
+        Output("provider-query", "data"),
+        Output("provider-table", "page_current"),
         Output("provider-markers", "children"),
-        Output("base-tile", "url"),
         Output("provider-map", "center"),
         Output("provider-map", "zoom")
     ],
@@ -859,51 +1532,79 @@ def render_tab_content(active_tab):
         Input("filter-city", "value"),
         Input("filter-language", "value"),
         Input("provider-map", "zoom"),
-        Input("dot-size-slider1", "value"),
-        Input("map-style-dropdown", "value"),
+        Input("cluster-toggle1", "value"),
+        Input("viewport-toggle1", "value"),
+        Input("layer-toggle1", "value"),
+        Input("provider-map", "bounds"),
         Input("tabs", "active_tab")
-    ]
+    ],
+    # Dot size only seeds new markers; moving the slider restyles them in the browser
+    State("dot-size-slider1", "value")
 )
-def update_provider_tab(county, market, specialty, city, language, zoom, dot_size, selected_style, active_tab):
+@instrumented("update_provider_tab")
+def update_provider_tab(county, market, specialty, city, language, zoom, cluster, viewport, geojson, bounds,
+                        active_tab, dot_size):
     if active_tab != "tab-1":
         raise PreventUpdate
+
+    # Panning only changes the bounds, which matter only in viewport mode
+    ctx = dash.callback_context
+    triggered = {t["prop_id"] for t in ctx.triggered}
+    map_moved = triggered <= {"provider-map.bounds", "provider-map.zoom"}
+    if triggered == {"provider-map.bounds"} and not viewport:
+        raise PreventUpdate
+    # The GeoJSON layer draws and clusters its points in the browser
+    if geojson and map_moved:
+        raise PreventUpdate
     
     if zoom is None:
         zoom = 6
-    filtered = df.copy()
-    if county:
-        filtered = filtered[filtered["County"].isin(county)]
-    if market:
-        filtered = filtered[filtered["Market"].isin(market)]
-    if specialty:
-        filtered = filtered[filtered["Specialty"].isin(specialty)]
-    if city:
-        filtered = filtered[filtered["City"].isin(city)]
-    if language:
-        filtered = filtered[filtered["Language"].isin(language)]
-
-    markers = create_dot_markers(filtered, zoom, dot_size)
-
-    # Update tile layer URL based on selected style
-    tile_urls = {
-        "osm": "https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png",
-        "world_imagery": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
-        "positron": "https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png",
-        "terrain": "https://stamen-tiles.a.ssl.fastly.net/terrain/{z}/{x}/{y}.png"
-    }
-    tile_url = tile_urls.get(selected_style, tile_urls["osm"])
+    store = current_store()
+    query = {"county": county, "market": market, "specialty": specialty, "city": city, "language": language}
+    positions, _ = resolve_query(store, json.dumps(query, sort_keys=True))
+    record_rows(len(positions))
+
+    with stage("markers"):
+        markers = [] if geojson else create_markers(store, positions, zoom, dot_size, bool(cluster), "provider",
+                                                    bounds=bounds if viewport else None)
+
+    # In viewport mode a map move only redraws the markers and leaves the view where the user put it
+    if viewport and map_moved:
+        return dash.no_update, dash.no_update, markers, dash.no_update, dash.no_update
 
     # Adjust map center based on filtered data
-    if not filtered.empty:
-        mean_lat = filtered["Latitude"].mean()
-        mean_lon = filtered["Longitude"].mean()
+    # Providers without coordinates are not on the map and do not move its center
+    located = positions[np.isfinite(store.lats[positions]) & np.isfinite(store.lons[positions])]
+    if len(located):
+        mean_lat = store.lats[located].mean()
+        mean_lon = store.lons[located].mean()
         map_center = (mean_lat, mean_lon)
         map_zoom = zoom
     else:
-        map_center = (df['Latitude'].mean(), df['Longitude'].mean())
+        map_center = store_center(store)
         map_zoom = 6
 
-    return filtered.to_dict("records"), markers, tile_url, map_center, map_zoom
+    return query, 0, markers, map_center, map_zoom
+
+# Callback for Tab 1: Serve the current page of the provider table, sorted on the server
+@app.callback(
+    [
+        Output("provider-table", "data"),
+        Output("provider-table", "page_count"),
+        Output("provider-export", "href")
+    ],
+    [
+        Input("provider-query", "data"),
+        Input("provider-table", "page_current"),
+        Input("provider-table", "page_size"),
+        Input("provider-table", "sort_by")
+    ]
+)
+@instrumented("update_provider_table")
+def update_provider_table(query, page_current, page_size, sort_by):
+    with stage("table"):
+        data, page_count = table_page(current_store(), query, page_current or 0, page_size, sort_by)
+    return data, page_count, export_href("providers", query, sort_by)
 
 # Callback to clear all filters in Tab 1
 @app.callback(
@@ -929,6 +1630,8 @@ def clear_all_filters_tab1(n_clicks):
         Output("zip_code", "value"),
         Output("radius1", "value"),
         Output("radius2", "value"),
+        Output("radius-bands", "value"),
+        Output("distance-measure", "value"),
         Output("filter2-county", "value"),
         Output("filter2-market", "value"),
         Output("filter2-specialty", "value"),
@@ -939,22 +1642,51 @@ def clear_all_filters_tab1(n_clicks):
     prevent_initial_call=True
 )
 def clear_all_filters_tab2(n_clicks):
-    return [None, None, None, None, 5, 10, None, None, None, None, None]
+    return [None, None, None, None, 5, 10, None, "miles", None, None, None, None, None]
+
+# Function to build a geo-access query from a located address, bands and filters
+def geo_access_query(coords, radii, measure, filters):
+    query = {"origin": list(coords), "radii": radii, "filters": filters}
+    network = road_network() if measure == DRIVE else None
+    if network is not None:
+        # Bands are minutes; the road file version keeps stored results from outliving it
+        query.update(measure=DRIVE, roads=network.version)
+    return query
+
+# Function to get the geo-access outputs for a computed query: the query, band circles, first
+# table page, and the map centered on the address
+def geo_access_view(query, zoom):
+    # Drive-time reach is not a circle, so those bands get none
+    radii = [] if query.get("measure") == DRIVE else query["radii"]
+    circles = [
+        dl.Circle(
+            center=query["origin"],
+            radius=r * 1609.34,  # Convert miles to meters
+            color=BAND_COLORS[i % len(BAND_COLORS)],
+            fill=True,
+            fillColor=BAND_COLORS[i % len(BAND_COLORS)],
+            fillOpacity=0.2,
+            weight=2
+        )
+        for i, r in enumerate(radii)
+    ]
+    return query, circles, 0, query["origin"], zoom
 
-# Callback for Tab 2: Update Geo-Access Markers, Circles, Table, Tile URL, Center, and Zoom on Button Click or Slider Change
+# Callback for Tab 2: Update Geo-Access Query, Circles, Table, Center, and Zoom on Button Click.
+# Searches that need Nominatim, the road graph or many distances are handed to the background
+# job below; the rest answer here. Either way the result goes to the shared result store, so
+# the marker, table and summary callbacks it triggers only read it.
 @app.callback(
     [
-        Output("geoaccess-markers", "children"),
+        Output("geo-query", "data"),
         Output("geoaccess-circles", "children"),
-        Output("geo-provider-table", "data"),
-        Output("base-tile-geoaccess", "url"),
+        Output("geo-provider-table", "page_current"),
         Output("geoaccess-map", "center"),
-        Output("geoaccess-map", "zoom")
+        Output("geoaccess-map", "zoom"),
+        Output("geo-job", "data")
     ],
     [
         Input("calculate-radius-button", "n_clicks"),
-        Input("dot-size-slider2", "value"),
-        Input("geoaccess-map-style-dropdown", "value"),
         Input("tabs", "active_tab")
     ],
     [
@@ -964,39 +1696,28 @@ def clear_all_filters_tab2(n_clicks):
         State("zip_code", "value"),
         State("radius1", "value"),
         State("radius2", "value"),
+        State("radius-bands", "value"),
+        State("distance-measure", "value"),
         State("filter2-county", "value"),
         State("filter2-market", "value"),
         State("filter2-specialty", "value"),
         State("filter2-city", "value"),
         State("filter2-language", "value"),
         State("geoaccess-map", "zoom")
-    ],
+    ]
 )
-def update_geo_access(n_clicks, dot_size, selected_style, active_tab, address1, geo_city, state_input, zip_code,
-                      radius1, radius2, county, market, specialty, filter_city, language, zoom):
+@instrumented("update_geo_access")
+def update_geo_access(n_clicks, active_tab, address1, geo_city, state_input, zip_code,
+                      radius1, radius2, extra_bands, measure, county, market, specialty, filter_city, language, zoom):
     if active_tab != "tab-2":
         raise PreventUpdate
 
-    # Update tile layer URL based on selected style
-    tile_urls = {
-        "osm": "https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png",
-        "world_imagery": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
-        "positron": "https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png",
-        "terrain": "https://stamen-tiles.a.ssl.fastly.net/terrain/{z}/{x}/{y}.png"
-    }
-    tile_url = tile_urls.get(selected_style, tile_urls["osm"])
-
     if zoom is None:
         zoom = 6
 
-    # Default to all providers
-    all_markers = create_dot_markers(df, zoom, dot_size)
-    circles = []
-    table_data = []
-    map_center = (df['Latitude'].mean(), df['Longitude'].mean())
-    map_zoom = zoom
+    store = current_store()
 
-    # Determine if the callback was triggered by the button or slider/map style/tab change
+    # Determine if the callback was triggered by the button or a tab change
     ctx = dash.callback_context
     triggered = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else None
 
@@ -1004,83 +1725,450 @@ def update_geo_access(n_clicks, dot_size, selected_style, active_tab, address1,
         # User clicked the Calculate Radius button
         parts = [address1, geo_city, state_input, zip_code]
         full_address = ", ".join([p.strip() for p in parts if p and p.strip()])
+        radii = band_radii(radius1, radius2, extra_bands)
+        filters = {"county": county, "market": market, "specialty": specialty, "city": filter_city,
+                   "language": language}
 
-        user_coords = None
-        if full_address:
-            user_coords = geocode_address(full_address)
-
-        radii = [r for r in [radius1, radius2] if r]
-        filtered = df.copy()
-
-        # Radius filtering first
-        if user_coords and radii:
-            filtered = filtered[filtered.apply(
-                lambda row: any(
-                    geodesic(user_coords, (row["Latitude"], row["Longitude"])).miles <= r
-                    for r in radii
-                ),
-                axis=1
-            )]
-
-            # Additional filters after radius filtering
-            if county:
-                filtered = filtered[filtered["County"].isin(county)]
-            if market:
-                filtered = filtered[filtered["Market"].isin(market)]
-            if specialty:
-                filtered = filtered[filtered["Specialty"].isin(specialty)]
-            if filter_city:
-                filtered = filtered[filtered["City"].isin(filter_city)]
-            if language:
-                filtered = filtered[filtered["Language"].isin(language)]
-
-            # Compute distances
-            if not filtered.empty and user_coords:
-                distances = filtered.apply(
-                    lambda row: round(geodesic(user_coords, (row["Latitude"], row["Longitude"])).miles, 2),
-                    axis=1
-                )
-                filtered = filtered.copy()
-                filtered["Distance"] = distances
-                filtered = filtered.sort_values(by="Distance", ascending=True)
-                table_data = filtered.to_dict("records")
-            else:
-                filtered = filtered.copy()
-                filtered["Distance"] = None
-                table_data = filtered.to_dict("records")
-
-            markers = create_dot_markers(filtered, zoom, dot_size)
-
-            # Create circles for each radius
-            if user_coords and radii:
-                colors = ["#dc3545", "#0d6efd"]
-                for i, r in enumerate(radii):
-                    circles.append(
-                        dl.Circle(
-                            center=user_coords,
-                            radius=r * 1609.34,  # Convert miles to meters
-                            color=colors[i % len(colors)],
-                            fill=True,
-                            fillColor=colors[i % len(colors)],
-                            fillOpacity=0.2,
-                            weight=2
-                        )
-                    )
-                map_center = user_coords
-                map_zoom = zoom
+        if full_address and radii:
+            street = bool(address1 and address1.strip())
+            with stage("geocode"):
+                coords = geocode_local(full_address, street=street)
+            # Radius filtering touches only providers in nearby index cells; count the sites it would measure
+            remote = coords is None and not OFFLINE_GEOCODING
+            large = coords is not None and store.radius_sites(coords, max(radii)) > GEO_JOB_MIN_SITES
+            if remote or large or coords is not None and measure == DRIVE:
+                # The click count makes every request a change, so a repeated search runs again
+                job = {"address": full_address, "origin": coords, "radii": radii, "measure": measure,
+                       "filters": filters, "zoom": zoom, "clicks": n_clicks}
+                return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, job
+            if coords is not None:
+                query = geo_access_query(coords, radii, measure, filters)
+                resolve_query(store, json.dumps(query, sort_keys=True))
+                return geo_access_view(query, zoom) + (dash.no_update,)
+
+    # Otherwise (tab switch or no geocoded address) show all providers
+    return None, [], 0, store_center(store), zoom, dash.no_update
+
+# Callback for Tab 2: Run a geo-access search handed over by update_geo_access as a background job
+@job_callback(
+    [
+        Output("geo-query", "data", allow_duplicate=True),
+        Output("geoaccess-circles", "children", allow_duplicate=True),
+        Output("geo-provider-table", "page_current", allow_duplicate=True),
+        Output("geoaccess-map", "center", allow_duplicate=True),
+        Output("geoaccess-map", "zoom", allow_duplicate=True)
+    ],
+    Input("geo-job", "data"),
+    progress=[Output("geo-progress", "value"), Output("geo-progress", "label")],
+    cancel=[Input("cancel-radius-button", "n_clicks")],
+    running=[
+        (Output("calculate-radius-button", "disabled"), True, False),
+        (Output("geo-progress-panel", "style"), {"display": "block"}, {"display": "none"}),
+    ],
+    prevent_initial_call=True
+)
+@instrumented("run_geo_access_job")
+def run_geo_access_job(set_progress, job):
+    if not job:
+        raise PreventUpdate
 
-            return markers, circles, table_data, tile_url, map_center, map_zoom
+    store = current_store()
+    coords = job["origin"]
+    if coords is None:
+        set_progress((10, "Locating address"))
+        with stage("geocode"):
+            coords = geocode_remote(job["address"])
+    if not coords:
+        return None, [], 0, store_center(store), job["zoom"]
 
-    elif triggered in ["dot-size-slider2", "geoaccess-map-style-dropdown", "tabs"] and active_tab == "tab-2":
-        # User adjusted the dot size slider, changed map style, or switched to Tab 2
-        markers = create_dot_markers(df, zoom, dot_size)
-        return markers, circles, df.to_dict("records"), tile_url, map_center, map_zoom
+    query = geo_access_query(coords, job["radii"], job["measure"], job["filters"])
+    if query.get("measure") == DRIVE:
+        set_progress((40, f"Finding providers within a {max(query['radii']):g} min drive"))
+    else:
+        set_progress((40, f"Finding providers within {max(query['radii']):g} mi"))
+    resolve_query(store, json.dumps(query, sort_keys=True))
+    set_progress((90, "Drawing results"))
+    return geo_access_view(query, job["zoom"])
+
+# Callback for Tab 2: Serve the current page of the geo-access table, sorted on the server
+@app.callback(
+    [
+        Output("geo-provider-table", "data"),
+        Output("geo-provider-table", "page_count"),
+        Output("geo-export", "href"),
+        Output("geo-provider-table", "columns")
+    ],
+    [
+        Input("geo-query", "data"),
+        Input("geo-provider-table", "page_current"),
+        Input("geo-provider-table", "page_size"),
+        Input("geo-provider-table", "sort_by")
+    ]
+)
+@instrumented("update_geo_table")
+def update_geo_table(query, page_current, page_size, sort_by):
+    store = current_store()
+    with stage("table"):
+        data, page_count = table_page(store, query, page_current or 0, page_size, sort_by)
+    return data, page_count, export_href("geo-access", query, sort_by), geo_table_columns(store, query)
+
+# Callback for Tab 2: Provider counts per specialty and distance band for the current query
+@app.callback(
+    Output("band-summary", "children"),
+    Input("geo-query", "data")
+)
+@instrumented("update_band_summary")
+def update_band_summary(query):
+    if not query:
+        return html.P("Calculate a radius to count providers by specialty and distance band.",
+                      className="text-muted mb-0")
+    with stage("table"):
+        frame = band_summary(current_store(), query)
+    return dash_table.DataTable(
+        columns=[{"name": col, "id": col} for col in frame.columns],
+        data=frame.to_dict("records"),
+        style_table={"overflowX": "auto"},
+        style_cell={'textAlign': 'left', 'padding': '10px', 'font-family': 'Roboto, sans-serif', 'font-size': '14px'},
+        style_header={'backgroundColor': '#28a745', 'color': 'white', 'fontWeight': '500', 'fontSize': '16px'},
+        style_data_conditional=[{'if': {'row_index': len(frame) - 1}, 'fontWeight': '500'}],
+        style_as_list_view=True,
+    )
 
-    # When the tab is switched to Tab 2, show all providers
-    if triggered == "tabs" and active_tab == "tab-2":
-        return all_markers, circles, df.to_dict("records"), tile_url, map_center, map_zoom
+# Function to decode an upload's data URL into a file a piece at a time; returns the number of lines written
+def save_upload(contents, path):
+    start = contents.index(",") + 1
+    lines = 0
+    with open(path, "wb") as f:
+        for offset in range(start, len(contents), UPLOAD_PIECE):
+            data = base64.b64decode(contents[offset:offset + UPLOAD_PIECE])
+            lines += data.count(b"\n")
+            f.write(data)
+    return lines
 
-    return all_markers, circles, df.to_dict("records"), tile_url, map_center, map_zoom
+# Callback for Tab 2: Adequacy report for an uploaded member roster, using the distance bands,
+# run as a background job that reports progress chunk by chunk
+@job_callback(
+    [
+        Output("adequacy-summary", "children"),
+        Output("adequacy-download", "data")
+    ],
+    Input("adequacy-upload", "contents"),
+    [
+        State("adequacy-upload", "filename"),
+        State("radius1", "value"),
+        State("radius2", "value"),
+        State("radius-bands", "value"),
+        State("distance-measure", "value")
+    ],
+    progress=[Output("adequacy-progress", "value"), Output("adequacy-progress", "label")],
+    cancel=[Input("cancel-adequacy-button", "n_clicks")],
+    running=[
+        (Output("adequacy-upload", "disabled"), True, False),
+        (Output("adequacy-progress-panel", "style"), {"display": "block"}, {"display": "none"}),
+    ],
+    prevent_initial_call=True
+)
+@instrumented("run_adequacy_upload")
+def run_adequacy_upload(set_progress, contents, filename, radius1, radius2, extra_bands, measure):
+    if not contents:
+        raise PreventUpdate
+    # Imported here so workers that never run a report skip it at startup
+    from adequacy import run_adequacy
+
+    radii = band_radii(radius1, radius2, extra_bands) or [5, 10]
+    drive = measure == DRIVE and road_network() is not None
+    specialties = current_store().filters.options("Specialty")
+    name = os.path.splitext(filename or "members")[0]
+
+    # The roster and its detail rows stay on disk: chunks go through the same process pool as
+    # adequacy.py, and each chunk's rows are appended to the detail file as it finishes
+    with tempfile.TemporaryDirectory(prefix="adequacy-") as tmp:
+        members_path = os.path.join(tmp, "members.csv")
+        # Line count less the header; close enough for a progress bar
+        total = max(save_upload(contents, members_path) - 1, 1)
+        detail_path = os.path.join(tmp, f"{name}_adequacy.csv")
+
+        def progress(done, elapsed):
+            set_progress((min(100, 100 * done // total), f"{done:,} members assessed"))
+
+        # Pool processes start from a fork server, since forking a threaded web worker can hang
+        frame = run_adequacy(members_path, detail_path, os.path.join(tmp, "summary.csv"), radii=radii,
+                             specialties=specialties, workers=ADEQUACY_WORKERS, data_path=providers.path,
+                             method=DISTANCE_METHOD, progress=progress, roads_path=ROADS_PATH if drive else None,
+                             context=multiprocessing.get_context("forkserver"))
+        download = dcc.send_file(detail_path)
+    table = dash_table.DataTable(
+        columns=[{"name": col, "id": col} for col in frame.columns],
+        data=frame.to_dict("records"),
+        style_table={"overflowX": "auto"},
+        style_cell={'textAlign': 'left', 'padding': '10px', 'font-family': 'Roboto, sans-serif', 'font-size': '14px'},
+        style_header={'backgroundColor': '#28a745', 'color': 'white', 'fontWeight': '500', 'fontSize': '16px'},
+        style_as_list_view=True,
+    )
+    return table, download
+
+# Function to build the GeoJSON layer of a table query, one point per site, cached per query
+@lru_cache(maxsize=16)
+def query_geojson(store, query_json):
+    positions, _ = resolve_query(store, query_json)
+    sites, counts, pcp = group_sites(store, positions)
+    return encode_point_geojson(store.lats[sites], store.lons[sites], sites, pcp * 2 >= counts, counts)
+
+# Function to build one vector tile of a table query, cached per query and tile
+@lru_cache(maxsize=4096)
+def query_tile(store, query_json, z, x, y):
+    positions, _ = resolve_query(store, query_json)
+    # Mercator stretches latitudes unevenly within a tile, so prefilter with a double buffer
+    positions = store.in_bounds(positions, tile_bounds(z, x, y), margin=2 * TILE_BUFFER / TILE_EXTENT)
+    sites, counts, pcp = group_sites(store, positions)
+    px, py, keep = tile_points(store.lats[sites], store.lons[sites], z, x, y)
+    sites, counts, pcp = sites[keep], counts[keep], pcp[keep]
+    properties = {
+        "specialty": store.df["Specialty"].iloc[sites].astype(str).to_numpy(),
+        "pcp": pcp * 2 >= counts,
+        "count": counts,
+    }
+    return encode_point_tile(px[keep], py[keep], sites, properties)
+
+# Function to read a JSON request argument, answering 400 when it is malformed or not of the expected shape
+def json_arg(name, default, valid):
+    try:
+        value = json.loads(request.args.get(name, default))
+    except ValueError:
+        abort(400)
+    if not valid(value):
+        abort(400)
+    return value
+
+# Function to check a table or layer query argument: a filter dict, or null for no filters
+def valid_query(query):
+    return query is None or isinstance(query, dict)
+
+# Function to check a table sort argument: a list of {"column_id", "direction"} dicts as the DataTable sends them
+def valid_sort_by(sort_by):
+    return isinstance(sort_by, list) and all(
+        isinstance(s, dict) and isinstance(s.get("column_id"), str) and s.get("direction") in ("asc", "desc")
+        for s in sort_by
+    )
+
+# Function to read the layer query argument in canonical form, so equal filters share cache entries
+def layer_query_json():
+    return json.dumps(json_arg("query", "null", valid_query), sort_keys=True)
+
+# Function to send a layer payload that browsers and proxies may cache and revalidate by dataset and filter hash
+def cached_layer_response(body, mimetype, version, query_json, *tile):
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(hashlib.sha1(repr((version, query_json) + tile).encode("utf-8")).hexdigest())
+    response.cache_control.public = True
+    response.cache_control.max_age = LAYER_MAX_AGE
+    return response.make_conditional(request)
+
+# Filtered providers as compact GeoJSON points for the dl.GeoJSON layer
+@app.server.route("/providers.geojson")
+def provider_geojson():
+    store, query_json = current_store(), layer_query_json()
+    return cached_layer_response(query_geojson(store, query_json), "application/geo+json", store.version, query_json)
+
+# Filtered providers as Mapbox Vector Tiles, for vector-tile clients such as Leaflet.VectorGrid
+@app.server.route("/tiles/<int:z>/<int:x>/<int:y>.pbf")
+def provider_tile(z, x, y):
+    if not (0 <= z <= 22 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        abort(404)
+    store, query_json = current_store(), layer_query_json()
+    return cached_layer_response(query_tile(store, query_json, z, x, y), "application/vnd.mapbox-vector-tile",
+                                 store.version, query_json, z, x, y)
+
+# Prometheus metrics for this worker process
+@app.server.route("/metrics")
+def metrics():
+    return Response(REGISTRY.expose(), mimetype="text/plain; version=0.0.4")
+
+# Streamed CSV export of a table query, built chunk by chunk on the server
+@app.server.route("/export/<name>.csv")
+def export_csv(name):
+    if name not in ("providers", "geo-access"):
+        abort(404)
+    query = json_arg("query", "null", valid_query)
+    sort_by = json_arg("sort_by", "[]", valid_sort_by)
+    # The generator runs after the request context ends, so it keeps this snapshot
+    store = current_store()
+    positions, distances = table_rows(store, query, sort_by)
+
+    def generate():
+        for start in range(0, max(len(positions), 1), EXPORT_CHUNK_ROWS):
+            chunk = slice(start, start + EXPORT_CHUNK_ROWS)
+            frame = table_frame(store, positions[chunk], None if distances is None else distances[chunk],
+                                query_radii(query), query_unit(query))
+            frame = frame.rename(columns={"Distance": DISTANCE_HEADERS[query_unit(query)], "Band": "Distance Band"})
+            yield frame.to_csv(index=False, header=start == 0)
+
+    return Response(generate(), mimetype="text/csv",
+                    headers={"Content-Disposition": f"attachment; filename={name}.csv"})
+
+# Callback for Tab 2: Rebuild Geo-Access Markers for the current query, zoom, dot size and clustering
+@app.callback(
+    Output("geoaccess-markers", "children"),
+    [
+        Input("geo-query", "data"),
+        Input("geoaccess-map", "zoom"),
+        Input("cluster-toggle2", "value"),
+        Input("viewport-toggle2", "value"),
+        Input("layer-toggle2", "value"),
+        Input("geoaccess-map", "bounds")
+    ],
+    State("dot-size-slider2", "value")
+)
+@instrumented("update_geo_markers")
+def update_geo_markers(query, zoom, cluster, viewport, geojson, bounds, dot_size):
+    ctx = dash.callback_context
+    triggered = {t["prop_id"] for t in ctx.triggered}
+    if not viewport and triggered == {"geoaccess-map.bounds"}:
+        raise PreventUpdate
+    if geojson:
+        if triggered <= {"geoaccess-map.bounds", "geoaccess-map.zoom"}:
+            raise PreventUpdate
+        return []
+    if zoom is None:
+        zoom = 6
+    store = current_store()
+    positions, _ = resolve_query(store, json.dumps(query, sort_keys=True))
+    record_rows(len(positions))
+    with stage("markers"):
+        return create_markers(store, positions, zoom, dot_size, bool(cluster), "geo",
+                              bounds=bounds if viewport else None)
+
+# Browser-side callbacks for cosmetic controls: they restyle what is already on the map
+# without a server round trip or a marker/table payload
+for style_dropdown, tile_layer in [("map-style-dropdown", "base-tile"),
+                                   ("geoaccess-map-style-dropdown", "base-tile-geoaccess")]:
+    app.clientside_callback(
+        """
+        function(style) {
+            const urls = %s;
+            return urls[style] || urls.osm;
+        }
+        """ % json.dumps(TILE_URLS),
+        Output(tile_layer, "url"),
+        Input(style_dropdown, "value")
+    )
+
+# Band inputs are labelled in the unit of the chosen measure
+app.clientside_callback(
+    """
+    function(measure) {
+        const unit = measure === "%s" ? "minutes" : "miles";
+        return ["Radius 1 (" + unit + ")", "Radius 2 (" + unit + ")", "More Bands (" + unit + ")"];
+    }
+    """ % DRIVE,
+    Output("radius1-label", "children"),
+    Output("radius2-label", "children"),
+    Output("radius-bands-label", "children"),
+    Input("distance-measure", "value")
+)
+
+# Dot and cluster radii use the same formulas as create_dot_markers and create_cluster_markers
+for kind, slider, map_id in [("provider", "dot-size-slider1", "provider-map"),
+                             ("geo", "dot-size-slider2", "geoaccess-map")]:
+    app.clientside_callback(
+        """
+        function(dotSize, zoom) {
+            const outputs = dash_clientside.callback_context.outputs_list;
+            const z = zoom == null ? 6 : zoom;
+            const dots = outputs[0].map(() => Math.max(2, dotSize + (z - 10) * 0.3));
+            const clusters = outputs[1].map(o => dotSize * 3 + Math.min(25, 2 * Math.sqrt(o.id.count)));
+            return [dots, clusters];
+        }
+        """,
+        Output({"type": f"{kind}-dot", "index": ALL}, "radius"),
+        Output({"type": f"{kind}-cluster", "index": ALL, "count": ALL}, "radius"),
+        Input(slider, "value"),
+        State(map_id, "zoom"),
+        prevent_initial_call=True
+    )
+
+# A marker or GeoJSON point click records the clicked provider's key in the browser, so the
+# server sees one small request instead of the click counts of every marker on the map
+for kind in ["provider", "geo"]:
+    app.clientside_callback(
+        """
+        function(clicks, feature) {
+            const triggered = dash_clientside.callback_context.triggered[0];
+            if (!triggered || !triggered.value) {
+                return dash_clientside.no_update;
+            }
+            if (triggered.prop_id.endsWith(".clickData")) {
+                return {index: feature.properties.id, clicks: Date.now()};
+            }
+            const id = JSON.parse(triggered.prop_id.slice(0, triggered.prop_id.lastIndexOf(".")));
+            return {index: id.index, clicks: triggered.value};
+        }
+        """,
+        Output(f"{kind}-popup-key", "data"),
+        Input({"type": f"{kind}-dot", "index": ALL}, "n_clicks"),
+        Input(f"{kind}-geojson", "clickData"),
+        prevent_initial_call=True
+    )
+
+# The GeoJSON layer fetches the current query's points from /providers.geojson, restyles
+# them for the dot size and zoom, and clusters them in the browser
+for kind, query_store, layer_toggle, cluster_toggle, slider, map_id in [
+    ("provider", "provider-query", "layer-toggle1", "cluster-toggle1", "dot-size-slider1", "provider-map"),
+    ("geo", "geo-query", "layer-toggle2", "cluster-toggle2", "dot-size-slider2", "geoaccess-map"),
+]:
+    app.clientside_callback(
+        """
+        function(query, layer, cluster) {
+            if (!layer || !layer.length) {
+                return [null, {type: "FeatureCollection", features: []}, false];
+            }
+            return ["/providers.geojson?query=" + encodeURIComponent(JSON.stringify(query)), null, cluster.length > 0];
+        }
+        """,
+        Output(f"{kind}-geojson", "url"),
+        Output(f"{kind}-geojson", "data"),
+        Output(f"{kind}-geojson", "cluster"),
+        Input(query_store, "data"),
+        Input(layer_toggle, "value"),
+        Input(cluster_toggle, "value")
+    )
+    app.clientside_callback(
+        """
+        function(dotSize, zoom) {
+            return {dotSize: dotSize, zoom: zoom};
+        }
+        """,
+        Output(f"{kind}-geojson", "hideout"),
+        Input(slider, "value"),
+        Input(map_id, "zoom")
+    )
+
+# Callback for Tab 1: Fill the popup of the clicked provider marker
+@app.callback(
+    Output("provider-popup", "children"),
+    Input("provider-popup-key", "data"),
+    State("provider-query", "data"),
+    prevent_initial_call=True
+)
+def show_provider_popup(key, query):
+    if not key:
+        raise PreventUpdate
+    store = current_store()
+    selected, _ = resolve_query(store, json.dumps(query, sort_keys=True))
+    return create_provider_popup(store, int(key["index"]), "provider", key["clicks"], selected)
+
+# Callback for Tab 2: Fill the popup of the clicked provider marker
+@app.callback(
+    Output("geo-popup", "children"),
+    Input("geo-popup-key", "data"),
+    State("geo-query", "data"),
+    prevent_initial_call=True
+)
+def show_geo_popup(key, query):
+    if not key:
+        raise PreventUpdate
+    store = current_store()
+    selected, _ = resolve_query(store, json.dumps(query, sort_keys=True))
+    return create_provider_popup(store, int(key["index"]), "geo", key["clicks"], selected)
 
 # Run the Dash app
 if __name__ == "__main__":
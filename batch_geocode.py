@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from geocache import GeocodeCache, Gazetteer, normalize_address
+
+# Remote geocoder and its request budget; override with environment variables.
+# The public Nominatim service allows one request per second per client.
+GEOCODER_URL = os.environ.get("PROVLOCATOR_GEOCODER_URL", "https://nominatim.openstreetmap.org/search")
+GEOCODER_RATE = float(os.environ.get("PROVLOCATOR_GEOCODER_RATE", "1"))
+USER_AGENT = "geoaccess_tool"
+# Lookups in flight at once; the rate limit, not this, bounds requests per second
+WORKERS = 4
+# Attempts per address before it is reported as failed, and the first retry delay in seconds
+RETRIES = 4
+BACKOFF = 1.0
+# HTTP statuses worth retrying: rate limited, or the service is briefly unavailable
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+# Share of the configured rate each answered request gives back after a 429 halved it (250 requests from half)
+RATE_RECOVERY = 0.002
+
+
+class TransientGeocodeError(Exception):
+    """
+    A lookup that may succeed if retried (timeouts, 429s, 5xx responses).
+    - retry_after: Seconds the service asked us to wait, if it said
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class NominatimBackend:
+    """
+    Geocodes through a Nominatim-compatible /search endpoint. Point url at a
+    self-hosted Nominatim, or at a local stub in benchmarks.
+
+    A backend is any object with a name (recorded as the geocode store source)
+    and geocode(address) returning (lat, lon) or None for no match, raising
+    TransientGeocodeError for failures worth retrying.
+    - url: Search endpoint
+    - timeout: Seconds to wait for each response
+    """
+
+    name = "nominatim"
+
+    def __init__(self, url=GEOCODER_URL, user_agent=USER_AGENT, timeout=10):
+        self.url = url
+        self.user_agent = user_agent
+        self.timeout = timeout
+
+    def geocode(self, address):
+        query = urllib.parse.urlencode({"q": address, "format": "jsonv2", "limit": 1})
+        request = urllib.request.Request(f"{self.url}?{query}", headers={"User-Agent": self.user_agent})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                places = json.loads(response.read())
+        except urllib.error.HTTPError as error:
+            if error.code in TRANSIENT_STATUSES:
+                retry_after = error.headers.get("Retry-After")
+                raise TransientGeocodeError(f"HTTP {error.code}",
+                                            float(retry_after) if retry_after and retry_after.isdigit() else None)
+            raise
+        except (urllib.error.URLError, OSError) as error:
+            raise TransientGeocodeError(str(getattr(error, "reason", error)))
+        if not places:
+            return None
+        return float(places[0]["lat"]), float(places[0]["lon"])
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Each acquire() reserves the next free slot, so
+    waiting threads are served in order at no more than rate per second.
+    pause() halves the current rate, and recover() raises it back in steps
+    toward the configured max_rate.
+    - rate: Tokens added per second
+    - burst: Most tokens that can build up while idle
+    """
+
+    def __init__(self, rate, burst=1):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._stamp = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """
+        Wait for a token. Returns False without taking one if it would not come
+        before deadline (a time.monotonic() value).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if deadline is not None and now + wait > deadline:
+                return False
+            self._tokens -= 1
+        if wait:
+            time.sleep(wait)
+        return True
+
+    def pause(self, seconds):
+        """
+        Hold every caller back for seconds and halve the current rate, e.g. after the
+        service answers 429. Other 429s arriving during the pause were sent before it, so
+        they do not pause or slow it again.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return
+            self._paused_until = now + seconds
+            self.rate /= 2
+            self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+    def recover(self):
+        """
+        Raise a rate that pause() lowered by RATE_RECOVERY of the configured rate,
+        up to the configured rate, e.g. after the service answers normally again.
+        """
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_RECOVERY)
+
+
+class RateLimitedGeocoder:
+    """
+    A backend behind a shared rate limit, with retries and jittered exponential backoff.
+    - backend: See NominatimBackend
+    - rate: Requests per second across all threads using this geocoder
+    - retries: Attempts per address
+    - backoff: Delay before the first retry, doubling after each
+    """
+
+    def __init__(self, backend, rate=GEOCODER_RATE, retries=RETRIES, backoff=BACKOFF):
+        self.backend = backend
+        self.name = backend.name
+        self.bucket = TokenBucket(rate)
+        self.retries = retries
+        self.backoff = backoff
+
+    def lookup(self, address, deadline=None):
+        """
+        Geocode one address. Returns (status, coords, attempts, error) where status is
+        "geocoded", "not_found", "failed", or "deferred" when deadline (a
+        time.monotonic() value) passed before an answer.
+        """
+        error = None
+        for attempt in range(1, self.retries + 1):
+            if not self.bucket.acquire(deadline):
+                return "deferred", None, attempt - 1, error
+            try:
+                coords = self.backend.geocode(address)
+            except TransientGeocodeError as e:
+                error = str(e)
+                if e.retry_after:
+                    # The service said when to come back: hold every thread, not just this one
+                    self.bucket.pause(e.retry_after)
+                    continue
+                delay = self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                if attempt < self.retries:
+                    if deadline is not None and time.monotonic() + delay > deadline:
+                        return "deferred", None, attempt, error
+                    time.sleep(delay)
+                continue
+            except Exception as e:
+                return "failed", None, attempt, str(e)
+            self.bucket.recover()
+            return ("geocoded" if coords else "not_found"), coords, attempt, None
+        return "failed", None, self.retries, error
+
+
+def geocode_batch(addresses, geocache, geocoder, gazetteer=None, workers=WORKERS, max_seconds=None, progress=None):
+    """
+    Geocode many addresses, each distinct normalized address at most once.
+
+    Addresses in the geocode store are answered first. The rest go to the
+    geocoder from a thread pool, and its answers are stored. Addresses it
+    cannot place fall back to their gazetteer centroid (not stored, so they
+    are retried next time). With max_seconds, lookups not started by then
+    are reported as "deferred" and can be picked up by a later run.
+    Returns one status dict per input address, in input order.
+    - progress: Called as progress(done, total, elapsed) as lookups finish
+    """
+    started = time.monotonic()
+    deadline = started + max_seconds if max_seconds else None
+    keys = [normalize_address(a) if isinstance(a, str) else "" for a in addresses]
+    outcomes = {"": {"status": "empty", "source": "", "coords": None, "attempts": 0, "error": None}}
+
+    unique = sorted(set(keys) - {""})
+    for key, coords in geocache.get_many(unique).items():
+        outcomes[key] = {"status": "cached", "source": "geocache", "coords": coords, "attempts": 0, "error": None}
+    misses = [key for key in unique if key not in outcomes]
+
+    def finish(key, status, coords, attempts, error):
+        source = geocoder.name if coords else ""
+        if status == "geocoded":
+            geocache.put(key, coords, geocoder.name)
+        elif status in ("not_found", "failed") and gazetteer is not None:
+            coords = gazetteer.lookup(key)
+            source = "gazetteer" if coords else ""
+        if status == "failed":
+            geocache.count("remote_errors")
+        outcomes[key] = {"status": status, "source": source, "coords": coords, "attempts": attempts, "error": error}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(geocoder.lookup, key, deadline): key for key in misses}
+        for done, future in enumerate(as_completed(futures), 1):
+            finish(futures[future], *future.result())
+            if progress:
+                progress(done, len(misses), time.monotonic() - started)
+
+    rows = []
+    for address, key in zip(addresses, keys):
+        outcome = outcomes[key]
+        coords = outcome["coords"] or (None, None)
+        rows.append({"address": address, "normalized": key, "status": outcome["status"],
+                     "source": outcome["source"], "latitude": coords[0], "longitude": coords[1],
+                     "attempts": outcome["attempts"], "error": outcome["error"]})
+    return rows
+
+
+def main(argv=None):
+    from adequacy import member_addresses
+
+    parser = argparse.ArgumentParser(description="Geocode a roster, adding Latitude/Longitude and a per-row status.")
+    parser.add_argument("roster", help="CSV with Address/City/State/Zip columns")
+    parser.add_argument("--out", default="geocoded.csv", help="Roster with Latitude, Longitude, Geocode Status and Geocode Source")
+    parser.add_argument("--url", default=GEOCODER_URL, help="Nominatim-compatible search endpoint")
+    parser.add_argument("--rate", type=float, default=GEOCODER_RATE, help="Requests per second")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Lookups in flight at once")
+    parser.add_argument("--retries", type=int, default=RETRIES, help="Attempts per address")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Defer lookups not started by then")
+    args = parser.parse_args(argv)
+
+    roster = pd.read_csv(args.roster, dtype={"Zip": str})
+    geocoder = RateLimitedGeocoder(NominatimBackend(args.url), rate=args.rate, retries=args.retries)
+
+    def progress(done, total, elapsed):
+        print(f"\r{done:,}/{total:,} remote lookups in {elapsed:.0f}s", end="", file=sys.stderr)
+
+    rows = geocode_batch(member_addresses(roster), GeocodeCache(), geocoder, gazetteer=Gazetteer(),
+                         workers=args.workers, max_seconds=args.max_seconds, progress=progress)
+    print(file=sys.stderr)
+    roster["Latitude"] = [row["latitude"] for row in rows]
+    roster["Longitude"] = [row["longitude"] for row in rows]
+    roster["Geocode Status"] = [row["status"] for row in rows]
+    roster["Geocode Source"] = [row["source"] for row in rows]
+    roster.to_csv(args.out, index=False)
+    for status, count in Counter(row["status"] for row in rows).most_common():
+        print(f"{status:<10} {count:>8,}")
+
+
+if __name__ == "__main__":
+    main()
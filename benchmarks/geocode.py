@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from synthetic import generate_gazetteer, generate_providers  # noqa: E402
+from batch_geocode import NominatimBackend, RateLimitedGeocoder, geocode_batch  # noqa: E402
+from geocache import GeocodeCache, Gazetteer  # noqa: E402
+
+
+class StubGeocoder(ThreadingHTTPServer):
+    """
+    Local stand-in for a Nominatim /search endpoint, answering from the synthetic
+    gazetteer. It adds latency, fails a share of requests with 503, and answers
+    429 with Retry-After once clients exceed its rate limit, like the real service.
+    - latency: Mean seconds per response
+    - error_rate: Share of requests answered 503
+    - limit: Requests per second before 429s; 0 for no limit
+    """
+
+    def __init__(self, gazetteer, latency=0.05, error_rate=0.02, limit=0, seed=0):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.gazetteer = gazetteer
+        self.latency = latency
+        self.error_rate = error_rate
+        self.limit = limit
+        self.random = random.Random(seed)
+        self.counts = Counter()
+        self.window = deque()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/search"
+
+    def admit(self):
+        """
+        Status for the next request: 200, 429 past the rate limit, or 503 for an injected failure.
+        """
+        with self.lock:
+            now = time.monotonic()
+            while self.window and self.window[0] < now - 1:
+                self.window.popleft()
+            self.window.append(now)
+            self.counts["requests"] += 1
+            self.counts["peak_per_second"] = max(self.counts["peak_per_second"], len(self.window))
+            if self.limit and len(self.window) > self.limit:
+                status = 429
+            elif self.random.random() < self.error_rate:
+                status = 503
+            else:
+                status = 200
+            self.counts[status] += 1
+            return status
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        status = server.admit()
+        time.sleep(random.expovariate(1 / server.latency) if server.latency else 0)
+        if status != 200:
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "1")
+            self.end_headers()
+            return
+        address = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+        coords = server.gazetteer.lookup(address)
+        places = []
+        if coords:
+            # Spread street addresses around their town centroid, the same way each time
+            h = zlib.crc32(address.encode())
+            places = [{"lat": str(coords[0] + (h % 1000 - 500) * 1e-5),
+                       "lon": str(coords[1] + (h // 1000 % 1000 - 500) * 1e-5)}]
+        body = json.dumps(places).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def roster_addresses(n, seed=0):
+    """
+    Addresses of n synthetic providers; practice sites repeat, as they do in real rosters.
+    """
+    frame = generate_providers(n, seed=seed)
+    return [f"{address}, {city}, CA" for address, city in zip(frame["Address"], frame["City"])]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the batch geocoder against a local Nominatim stub.")
+    parser.add_argument("--addresses", type=int, default=5000, help="Roster rows to geocode")
+    parser.add_argument("--rate", type=float, default=200, help="Client requests per second")
+    parser.add_argument("--limit", type=float, default=0, help="Stub's own requests per second before 429s")
+    parser.add_argument("--workers", type=int, default=16, help="Lookups in flight at once")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean stub response time in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Share of stub requests failing with 503")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Defer lookups not started by then")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gazetteer_path = os.path.join(tmp, "gazetteer.csv")
+        generate_gazetteer(args.seed).to_csv(gazetteer_path, index=False)
+        gazetteer = Gazetteer(gazetteer_path)
+        stub = StubGeocoder(gazetteer, latency=args.latency, error_rate=args.error_rate,
+                            limit=args.limit, seed=args.seed)
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        try:
+            addresses = roster_addresses(args.addresses, seed=args.seed)
+            geocache = GeocodeCache(os.path.join(tmp, "geocache.sqlite"))
+            geocoder = RateLimitedGeocoder(NominatimBackend(stub.url), rate=args.rate, backoff=0.2)
+
+            runs = []
+            for run in ("cold", "cached"):
+                started = time.perf_counter()
+                rows = geocode_batch(addresses, geocache, geocoder, gazetteer=gazetteer,
+                                     workers=args.workers, max_seconds=args.max_seconds)
+                runs.append((run, time.perf_counter() - started, Counter(row["status"] for row in rows)))
+        finally:
+            stub.shutdown()
+            stub.server_close()
+
+    distinct = len({row["normalized"] for row in rows})
+    print(f"{len(addresses):,} addresses, {distinct:,} distinct, client rate {args.rate:g}/s, "
+          f"{args.workers} workers")
+    for run, seconds, statuses in runs:
+        print(f"{run:<7} {seconds:8.2f}s  " + ", ".join(f"{s} {n:,}" for s, n in statuses.most_common()))
+    counts = stub.counts
+    print(f"stub: {counts['requests']:,} requests, {counts[429]:,} x 429, {counts[503]:,} x 503, "
+          f"peak {counts['peak_per_second']:,}/s")
+
+
+if __name__ == "__main__":
+    main()
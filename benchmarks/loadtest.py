@@ -0,0 +1,383 @@
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic import generate_gazetteer, write_providers  # noqa: E402
+
+PERCENTILES = (50, 95, 99)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_tree_rss_mb(pid):
+    """
+    Resident memory of a process and its descendants, in MB, per process (Linux /proc).
+    """
+    rss = {}
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss[current] = int(line.split()[1]) / 1024
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return rss
+
+
+class AppServer:
+    """
+    The app started in a child process on a free local port, offline.
+    - data_path: Provider CSV to serve
+    - workers: gunicorn worker processes; without gunicorn, one threaded Werkzeug server
+    """
+
+    def __init__(self, data_path, gazetteer_path, workers=2, threads=4):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._tmp = tempfile.TemporaryDirectory()
+        env = dict(os.environ, PROVLOCATOR_DATA=data_path, PROVLOCATOR_OFFLINE="1",
+                   PROVLOCATOR_GAZETTEER=gazetteer_path,
+                   PROVLOCATOR_GEOCACHE=os.path.join(self._tmp.name, "geocache.sqlite"),
+                   PROVLOCATOR_RESULT_CACHE=os.path.join(self._tmp.name, "results.sqlite"),
+                   PROVLOCATOR_JOBS=os.path.join(self._tmp.name, "jobs"),
+                   PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])))
+        try:
+            import gunicorn  # noqa: F401
+            command = [sys.executable, "-m", "gunicorn", "app1:server", "--bind", f"127.0.0.1:{self.port}",
+                       "--workers", str(workers), "--threads", str(threads), "--log-level", "warning"]
+            self.kind = f"gunicorn x{workers} ({threads} threads)"
+        except ImportError:
+            command = [sys.executable, "-c",
+                       f"import app1; app1.server.run(host='127.0.0.1', port={self.port}, threaded=True)"]
+            self.kind = "werkzeug (threaded)"
+        # Server logs go to a file: an undrained pipe fills up and blocks the server mid-run
+        self._log = open(os.path.join(self._tmp.name, "server.log"), "w+b")
+        self.process = subprocess.Popen(command, cwd=REPO_DIR, env=env,
+                                        stdout=subprocess.DEVNULL, stderr=self._log)
+
+    def wait_ready(self, timeout=300):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                self._log.seek(0)
+                raise RuntimeError("App exited during startup:\n" + self._log.read().decode()[-2000:])
+            try:
+                urllib.request.urlopen(self.url + "/_dash-layout", timeout=2).read()
+                return
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.2)
+        raise RuntimeError("App did not start in time")
+
+    def rss_mb(self):
+        return process_tree_rss_mb(self.process.pid)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self._log.close()
+        self._tmp.cleanup()
+
+
+class DashClient:
+    """
+    Builds /_dash-update-component requests from the app's own callback graph,
+    so request bodies always match the registered inputs and states.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        with urllib.request.urlopen(url + "/_dash-dependencies", timeout=30) as response:
+            self.callbacks = {dep["output"]: dep for dep in json.load(response)}
+
+    def find(self, first_output, changed=()):
+        """
+        The callback whose outputs include `first_output` ("component.property"), counting
+        outputs shared through allow_duplicate. Where several callbacks share it, the one
+        that one of the `changed` inputs triggers.
+        """
+        matches = [dep for output, dep in self.callbacks.items()
+                   if first_output in (o.split("@")[0] for o in output.strip(".").split("..."))]
+        if not matches:
+            raise KeyError(first_output)
+        for dep in matches:
+            if any(f"{i['id']}.{i['property']}" in changed for i in dep["inputs"]):
+                return dep
+        return matches[0]
+
+    def body(self, first_output, values, changed):
+        dep = self.find(first_output, changed)
+        outputs = [dict(zip(("id", "property"), o.rsplit(".", 1))) for o in dep["output"].strip(".").split("...")]
+
+        def fill(items):
+            return [{"id": i["id"], "property": i["property"], "value": values.get(f"{i['id']}.{i['property']}")}
+                    for i in items]
+        return {
+            "output": dep["output"],
+            "outputs": outputs if len(outputs) > 1 else outputs[0],
+            "inputs": fill(dep["inputs"]),
+            "state": fill(dep["state"]),
+            "changedPropIds": changed,
+        }
+
+    def _post(self, data, query=""):
+        request = urllib.request.Request(self.url + "/_dash-update-component" + query, data=data,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                payload = response.read()
+                return response.status, (json.loads(payload) if payload else None), len(payload)
+        except urllib.error.HTTPError as error:
+            return error.code, None, 0
+        except (urllib.error.URLError, OSError):
+            # Timeouts and dropped connections count as errors rather than ending the session
+            return 0, None, 0
+
+    def call(self, first_output, values, changed):
+        """
+        Post one callback request. Returns (status, response JSON or None, bytes received).
+        Background callbacks are polled at their interval until the job's result arrives,
+        as the browser does, so their latency includes the wait.
+        """
+        dep = self.find(first_output, changed)
+        data = json.dumps(self.body(first_output, values, changed)).encode("utf-8")
+        status, response, size = self._post(data)
+        if not (dep.get("background") and response and "job" in response):
+            return status, response, size
+        interval = dep["background"].get("interval", 1000) / 1000
+        query = "?" + urllib.parse.urlencode({"cacheKey": response["cacheKey"], "job": response["job"]})
+        while True:
+            time.sleep(interval)
+            status, response, received = self._post(data, query)
+            size += received
+            if status != 200 or not response or "response" in response:
+                return status, response, size
+
+
+class Session:
+    """
+    One analyst's session: browse tab 1 (filters, zoom, paging, sorting), then run
+    geo-access searches from random towns on tab 2. Every step is a callback request
+    the browser would send for the same interaction.
+    """
+
+    def __init__(self, client, options, towns, rng):
+        self.client = client
+        self.options = options
+        self.towns = towns
+        self.rng = rng
+        self.state = {
+            "tabs.active_tab": "tab-1", "provider-map.zoom": 6,
+            "dot-size-slider1.value": 2, "dot-size-slider2.value": 2,
+            "cluster-toggle1.value": ["cluster"], "viewport-toggle1.value": ["viewport"], "layer-toggle1.value": [],
+            "cluster-toggle2.value": ["cluster"], "viewport-toggle2.value": ["viewport"], "layer-toggle2.value": [],
+            "provider-table.page_current": 0, "provider-table.page_size": 20, "provider-table.sort_by": [],
+            "geo-provider-table.page_current": 0, "geo-provider-table.page_size": 20,
+            "geo-provider-table.sort_by": [], "geoaccess-map.zoom": 6, "radius1.value": 5, "radius2.value": 10,
+        }
+
+    def _call(self, step, first_output, changed, record):
+        started = time.perf_counter()
+        status, response, size = self.client.call(first_output, self.state, changed)
+        record(step, time.perf_counter() - started, status, size)
+        return response
+
+    def _bounds(self, lat, lon, zoom):
+        half = 180 / 2 ** zoom
+        return [[lat - half / 2, lon - half], [lat + half / 2, lon + half]]
+
+    def run(self, record):
+        rng, state = self.rng, self.state
+        state["tabs.active_tab"] = "tab-1"
+        self._call("render_tab", "tab-content.children", ["tabs.active_tab"], record)
+        response = self._call("provider_tab", "provider-query.data", ["tabs.active_tab"], record)
+        state["provider-query.data"] = (response or {}).get("response", {}).get("provider-query", {}).get("data")
+        self._call("provider_table", "provider-table.data", ["provider-query.data"], record)
+
+        # Filter changes: a county, then a specialty on top
+        for column, key in (("County", "filter-county.value"), ("Specialty", "filter-specialty.value")):
+            state[key] = [rng.choice(self.options[column])]
+            response = self._call("filter_change", "provider-query.data", [key], record)
+            state["provider-query.data"] = (response or {}).get("response", {}).get("provider-query", {}).get("data")
+            state["provider-table.page_current"] = 0
+            self._call("provider_table", "provider-table.data", ["provider-query.data"], record)
+
+        # Zoom into a town, which redraws the visible markers
+        lat, lon = self.towns[rng.randrange(len(self.towns))][1:]
+        for zoom in (9, 12):
+            state["provider-map.zoom"] = zoom
+            state["provider-map.bounds"] = self._bounds(lat, lon, zoom)
+            self._call("zoom", "provider-query.data", ["provider-map.zoom", "provider-map.bounds"], record)
+
+        # Page and sort the table
+        state["provider-table.page_current"] = 1
+        self._call("provider_table_page", "provider-table.data", ["provider-table.page_current"], record)
+        state["provider-table.sort_by"] = [{"column_id": "ProviderName", "direction": "asc"}]
+        self._call("provider_table_sort", "provider-table.data", ["provider-table.sort_by"], record)
+
+        # Geo-access: Calculate Radius from a town, then markers and table for the result
+        state["tabs.active_tab"] = "tab-2"
+        self._call("render_tab", "tab-content.children", ["tabs.active_tab"], record)
+        for _ in range(2):
+            city, lat, lon = self.towns[rng.randrange(len(self.towns))]
+            state.update({"address1.value": None, "geo-city.value": city, "state.value": "CA",
+                          "zip_code.value": None, "filter2-specialty.value": rng.choice([None, ["PCP"]]),
+                          "calculate-radius-button.n_clicks": state.get("calculate-radius-button.n_clicks", 0) + 1})
+            response = self._call("calculate_radius", "geo-query.data", ["calculate-radius-button.n_clicks"], record)
+            # Searches too large to answer inline come back as a job for the background callback
+            job = (response or {}).get("response", {}).get("geo-job", {}).get("data")
+            if job:
+                state["geo-job.data"] = job
+                response = self._call("calculate_radius_job", "geo-query.data", ["geo-job.data"], record)
+            state["geo-query.data"] = (response or {}).get("response", {}).get("geo-query", {}).get("data")
+            state["geoaccess-map.zoom"] = 11
+            state["geoaccess-map.bounds"] = self._bounds(lat, lon, 11)
+            self._call("geo_markers", "geoaccess-markers.children", ["geo-query.data"], record)
+            self._call("geo_table", "geo-provider-table.data", ["geo-query.data"], record)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    """
+    Latency percentiles (ms) and throughput per step and overall.
+    """
+    by_step = defaultdict(list)
+    for step, seconds, status, size in samples:
+        by_step[step].append((seconds, status, size))
+    by_step["all"] = [(s, st, sz) for rows in list(by_step.values()) for s, st, sz in rows]
+    summary = {}
+    for step, rows in by_step.items():
+        latencies = sorted(s * 1000 for s, _, _ in rows)
+        summary[step] = {
+            "requests": len(rows),
+            "errors": sum(1 for _, status, _ in rows if status != 200 and status != 204),
+            "rps": round(len(rows) / elapsed, 2),
+            "mean_bytes": round(sum(sz for _, _, sz in rows) / max(len(rows), 1)),
+            **{f"p{p}_ms": round(percentile(latencies, p), 1) for p in PERCENTILES},
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive the app's callbacks with concurrent simulated analysts.")
+    parser.add_argument("--rows", type=int, default=100000, help="Synthetic providers to serve")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent simulated analysts")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run after warm-up")
+    parser.add_argument("--think", type=float, default=0.0, help="Pause between sessions, in seconds")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers, when gunicorn is installed")
+    parser.add_argument("--url", default=None, help="Test an already running app instead of starting one")
+    parser.add_argument("--out", default=None, help="Write the report JSON here")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    data_path = os.path.join(BENCH_DIR, "data", f"providers_{args.rows}.csv")
+    if not os.path.exists(data_path):
+        write_providers(args.rows, data_path)
+    gazetteer = generate_gazetteer()
+    gazetteer_path = os.path.join(BENCH_DIR, "data", "gazetteer.csv")
+    gazetteer.to_csv(gazetteer_path, index=False)
+    towns = list(zip(gazetteer["city"], gazetteer["latitude"], gazetteer["longitude"]))
+
+    server = None
+    if args.url:
+        url = args.url.rstrip("/")
+    else:
+        server = AppServer(data_path, gazetteer_path, workers=args.workers)
+        print(f"Starting {server.kind} on {server.url} ...", file=sys.stderr)
+        server.wait_ready()
+        url = server.url
+
+    try:
+        client = DashClient(url)
+        from pandas import read_csv
+        providers = read_csv(data_path, usecols=["County", "Specialty"])
+        options = {column: sorted(providers[column].dropna().unique()) for column in providers}
+
+        # Warm-up session so startup costs are not counted
+        Session(client, options, towns, random.Random(args.seed)).run(lambda *sample: None)
+
+        samples = []
+        lock = threading.Lock()
+        rss_peaks = {}
+        stop_at = time.time() + args.duration
+
+        def record(step, seconds, status, size):
+            with lock:
+                samples.append((step, seconds, status, size))
+
+        def user(index):
+            rng = random.Random(args.seed * 1000 + index)
+            while time.time() < stop_at:
+                Session(client, options, towns, rng).run(record)
+                if args.think:
+                    time.sleep(args.think)
+
+        threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(args.users)]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            if server:
+                for pid, mb in server.rss_mb().items():
+                    rss_peaks[pid] = max(rss_peaks.get(pid, 0), mb)
+            time.sleep(0.5)
+        elapsed = time.time() - started
+    finally:
+        if server:
+            server.stop()
+
+    report = {
+        "rows": args.rows,
+        "users": args.users,
+        "duration_s": round(elapsed, 1),
+        "server": server.kind if server else url,
+        "peak_rss_mb": {str(pid): round(mb, 1) for pid, mb in sorted(rss_peaks.items())},
+        "steps": summarize(samples, elapsed),
+    }
+    print(f"\n{args.users} users, {args.rows:,} providers, {report['server']}, {elapsed:.0f}s")
+    print(f"{'step':<22}{'requests':>9}{'errors':>7}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'bytes':>10}")
+    for step, row in sorted(report["steps"].items(), key=lambda item: item[0] == "all"):
+        print(f"{step:<22}{row['requests']:>9}{row['errors']:>7}{row['rps']:>8}{row['p50_ms']:>9}"
+              f"{row['p95_ms']:>9}{row['p99_ms']:>9}{row['mean_bytes']:>10}")
+    if rss_peaks:
+        print("peak RSS (MB) per process: " + ", ".join(f"{mb:.0f}" for mb in report["peak_rss_mb"].values()))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
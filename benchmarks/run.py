@@ -0,0 +1,222 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+DEFAULT_SIZES = (1000, 100000, 1000000)
+DEFAULT_REPEATS = 5
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def timed(name, func, repeats, rows, results, items=None):
+    """
+    Run func `repeats` times and append its timing summary to results. Returns the last result.
+    """
+    times = []
+    value = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        value = func()
+        times.append(time.perf_counter() - started)
+    times.sort()
+    results.append({
+        "rows": rows,
+        "name": name,
+        "repeats": repeats,
+        "min_s": round(times[0], 6),
+        "median_s": round(times[len(times) // 2], 6),
+        "mean_s": round(sum(times) / len(times), 6),
+        "items": items,
+    })
+    print(f"{rows:>9,} {name:<28} {times[len(times) // 2] * 1000:10.2f} ms", file=sys.stderr)
+    return value
+
+
+def run_size(csv_path, rows, repeats):
+    """
+    Time the app's real code paths against one provider file. Runs in its own
+    process (see main), because app1 loads its store from PROVLOCATOR_DATA at import.
+    """
+    import numpy as np
+    import pandas as pd
+    from plotly.utils import PlotlyJSONEncoder
+
+    from columnar_store import ingest
+    from geocache import Gazetteer
+    from provider_store import ProviderStore, load_provider_store
+    from validate_locations import validate_locations
+
+    results = []
+    heavy = max(1, repeats // 2) if rows >= 1000000 else repeats
+
+    timed("load_csv", lambda: pd.read_csv(csv_path), heavy, rows, results)
+    df = pd.read_csv(csv_path)
+    timed("build_store", lambda: ProviderStore(df), heavy, rows, results)
+    gazetteer = Gazetteer()
+    timed("validate_locations", lambda: validate_locations(df, gazetteer), heavy, rows, results)
+    with tempfile.TemporaryDirectory() as tmp:
+        artifact = os.path.join(tmp, "providers.store")
+        timed("ingest_columnar", lambda: ingest(csv_path, artifact), 1, rows, results)
+        timed("load_columnar", lambda: load_provider_store(artifact), heavy, rows, results)
+
+    # Cold start: importing the app loads the store; tab layouts are built on first render
+    app1 = timed("import_app", lambda: importlib.import_module("app1"), 1, rows, results)
+    store = app1.providers.current()
+    timed("build_tab_layouts", lambda: (app1.tab1_layout.__wrapped__(store), app1.tab2_layout.__wrapped__(store)),
+          repeats, rows, results)
+    rng = np.random.default_rng(0)
+
+    # Tab 1: typical sidebar selections, from one county to several columns at once
+    counties = store.filters.options("County")
+    specialties = store.filters.options("Specialty")
+    languages = store.filters.options("Language")
+    selections = [
+        {"county": [counties[0]]},
+        {"county": counties[:3], "specialty": ["PCP"]},
+        {"specialty": specialties[:5], "language": languages[1:3]},
+        {"market": store.filters.options("Market")[:2], "specialty": ["PCP", "Pediatrics"], "language": ["Spanish"]},
+    ]
+    timed("filter_tab1", lambda: [store.filters.select(**f) for f in selections], repeats, rows, results,
+          items=len(selections))
+
+    # Marker building: the capped dot set a viewport can show, and clusters for the whole network
+    everything = np.arange(len(store))
+    dots = everything[:min(len(store), app1.MAX_VIEWPORT_MARKERS)]
+    markers = timed("create_dot_markers", lambda: app1.create_dot_markers(store.df.iloc[dots], 12, 2, "provider"),
+                    repeats, rows, results, items=len(dots))
+    clusters = timed("create_markers_clustered", lambda: app1.create_markers(store, everything, 8, 2, True, "provider"),
+                     repeats, rows, results)
+    timed("group_sites", lambda: app1.group_sites(store, everything), repeats, rows, results, items=len(store.sites))
+
+    # Geo-access radius search from provider locations, as update_geo_access queries it
+    origins = rng.choice(len(store), 20)
+    queries = [{"origin": [float(store.lats[i]), float(store.lons[i])], "radii": [5, 10],
+                "filters": {"specialty": ["PCP"]}} for i in origins]
+    found = timed("radius_search", lambda: [app1.run_geo_query(store, q) for q in queries], repeats, rows, results,
+                  items=len(queries))
+    positions, distances = max(found, key=lambda pair: len(pair[0]))
+
+    # Drive-time search over the synthetic road graph: snapping every provider site once,
+    # then the same origins with 15 and 30 minute bands, each searched from scratch
+    network = app1.road_network()
+    if network is not None:
+        timed("snap_providers", lambda: network.snap(store.sites.lats, store.sites.lons), repeats, rows, results,
+              items=len(store.sites))
+        drives = [dict(q, radii=[15, 30], measure=app1.DRIVE) for q in queries]
+
+        def drive_search():
+            network._origins.clear()
+            return [app1.run_geo_query(store, q) for q in drives]
+
+        timed("drive_time_search", drive_search, repeats, rows, results, items=len(drives))
+
+    # Serialization: a table page, a full result set and marker components
+    page = slice(0, 500)
+    timed("records_page", lambda: app1.table_frame(store, positions[page], distances[page]).to_dict("records"),
+          repeats, rows, results, items=len(positions[page]))
+    timed("records_full_result", lambda: app1.table_frame(store, positions, distances).to_dict("records"),
+          repeats, rows, results, items=len(positions))
+    timed("serialize_markers", lambda: json.dumps(markers + clusters, cls=PlotlyJSONEncoder),
+          repeats, rows, results, items=len(markers) + len(clusters))
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return results, round(peak_mb, 1)
+
+
+def compare(old_path, new):
+    with open(old_path) as f:
+        old = json.load(f)
+    before = {(r["rows"], r["name"]): r["median_s"] for r in old["results"]}
+    print(f"\n{'rows':>9} {'benchmark':<28} {old['commit']:>10} {new['commit']:>10}  change")
+    for r in new["results"]:
+        key = (r["rows"], r["name"])
+        if key in before and before[key] > 0:
+            print(f"{r['rows']:>9,} {r['name']:<28} {before[key] * 1000:8.2f}ms {r['median_s'] * 1000:8.2f}ms "
+                  f"{r['median_s'] / before[key]:6.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the app's hot paths on synthetic provider networks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Provider counts")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Runs per benchmark (median reported)")
+    parser.add_argument("--out", default=None, help="Results JSON (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        results, peak_mb = run_size(args.worker, args.sizes[0], args.repeats)
+        print(json.dumps({"results": results, "peak_rss_mb": peak_mb}))
+        return
+
+    sys.path.insert(0, BENCH_DIR)
+    sys.path.insert(0, REPO_DIR)
+    from synthetic import generate_gazetteer, generate_roads, write_providers
+    from road_network import build_road_network, save_road_network
+
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeats": args.repeats,
+        "results": [],
+        "peak_rss_mb": {},
+    }
+    # Gazetteer for the synthetic towns, so location validation has places to check against
+    gazetteer_path = os.path.join(BENCH_DIR, "data", "gazetteer.csv")
+    os.makedirs(os.path.dirname(gazetteer_path), exist_ok=True)
+    generate_gazetteer().to_csv(gazetteer_path, index=False)
+    # Road graph for the drive-time benchmarks
+    roads_path = os.path.join(BENCH_DIR, "data", "roads.npz")
+    if not os.path.exists(roads_path):
+        save_road_network(build_road_network(*generate_roads()), roads_path)
+    for rows in args.sizes:
+        csv_path = os.path.join(BENCH_DIR, "data", f"providers_{rows}.csv")
+        if not os.path.exists(csv_path):
+            write_providers(rows, csv_path)
+        with tempfile.TemporaryDirectory() as tmp:
+            # A fresh interpreter per size, offline and with throwaway geocode and result stores
+            env = dict(os.environ, PROVLOCATOR_DATA=csv_path, PROVLOCATOR_OFFLINE="1",
+                       PROVLOCATOR_GEOCACHE=os.path.join(tmp, "geocache.sqlite"),
+                       PROVLOCATOR_RESULT_CACHE=os.path.join(tmp, "results.sqlite"),
+                       PROVLOCATOR_GAZETTEER=gazetteer_path, PROVLOCATOR_ROADS=roads_path,
+                       PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])))
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", csv_path,
+                                  "--sizes", str(rows), "--repeats", str(args.repeats)],
+                                 cwd=REPO_DIR, env=env, stdout=subprocess.PIPE, check=True, text=True).stdout
+        worker = json.loads(out.strip().splitlines()[-1])
+        report["results"].extend(worker["results"])
+        report["peak_rss_mb"][str(rows)] = worker["peak_rss_mb"]
+
+    out_path = args.out or os.path.join(BENCH_DIR, "results", f"{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=1)
+    print(out_path)
+    if args.compare:
+        compare(args.compare, report)
+
+
+if __name__ == "__main__":
+    main()
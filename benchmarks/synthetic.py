@@ -0,0 +1,192 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# (county, market, centroid latitude, centroid longitude, relative provider share)
+COUNTIES = [
+    ("Los Angeles", "Southern", 34.05, -118.25, 30.0),
+    ("San Diego", "Southern", 32.72, -117.16, 8.5),
+    ("Orange", "Southern", 33.72, -117.83, 8.0),
+    ("Riverside", "Inland Empire", 33.95, -117.40, 6.0),
+    ("San Bernardino", "Inland Empire", 34.11, -117.29, 5.5),
+    ("Santa Clara", "Bay Area", 37.35, -121.95, 5.0),
+    ("Alameda", "Bay Area", 37.65, -122.00, 4.5),
+    ("Sacramento", "Northern", 38.58, -121.49, 4.0),
+    ("San Francisco", "Bay Area", 37.77, -122.42, 3.5),
+    ("Contra Costa", "Bay Area", 37.92, -122.00, 3.0),
+    ("Fresno", "Central Valley", 36.74, -119.78, 2.8),
+    ("Kern", "Central Valley", 35.37, -119.02, 2.4),
+    ("Ventura", "Southern", 34.28, -119.23, 2.2),
+    ("San Mateo", "Bay Area", 37.50, -122.31, 2.0),
+    ("San Joaquin", "Central Valley", 37.95, -121.29, 1.8),
+    ("Stanislaus", "Central Valley", 37.64, -120.99, 1.4),
+    ("Sonoma", "Northern", 38.44, -122.71, 1.2),
+    ("Tulare", "Central Valley", 36.33, -119.29, 1.1),
+    ("Santa Barbara", "Central Coast", 34.42, -119.70, 1.1),
+    ("Monterey", "Central Coast", 36.60, -121.89, 1.0),
+    ("Placer", "Northern", 38.79, -121.24, 0.9),
+    ("San Luis Obispo", "Central Coast", 35.28, -120.66, 0.7),
+    ("Santa Cruz", "Central Coast", 36.97, -122.03, 0.7),
+    ("Marin", "Bay Area", 38.03, -122.54, 0.7),
+    ("Butte", "Northern", 39.73, -121.84, 0.6),
+    ("Shasta", "Northern", 40.59, -122.39, 0.5),
+    ("Humboldt", "Northern", 40.80, -124.16, 0.3),
+    ("Imperial", "Southern", 32.79, -115.56, 0.3),
+]
+# (specialty, relative share); primary care dominates real networks
+SPECIALTIES = [
+    ("PCP", 38.0), ("Pediatrics", 7.0), ("OBGYN", 5.0), ("Cardiology", 4.0), ("Orthopedics", 4.0),
+    ("Dermatology", 3.0), ("Psychiatry", 3.5), ("Ophthalmology", 3.0), ("Gastroenterology", 2.5),
+    ("Neurology", 2.5), ("Oncology", 2.5), ("Pulmonology", 2.0), ("Endocrinology", 2.0), ("Urology", 2.0),
+    ("Nephrology", 1.5), ("Rheumatology", 1.2), ("Otolaryngology", 1.5), ("Allergy", 1.0),
+    ("Podiatry", 1.5), ("Physical Therapy", 3.0), ("Chiropractic", 1.5), ("Optometry", 2.0),
+    ("General Surgery", 2.0), ("Plastic Surgery", 0.8), ("Infectious Disease", 0.8),
+    ("Hematology", 0.8), ("Pain Management", 1.0), ("Radiology", 1.5), ("Urgent Care", 1.5),
+    ("Behavioral Health", 2.0),
+]
+LANGUAGES = [
+    ("English", 55.0), ("Spanish", 28.0), ("Mandarin", 3.5), ("Cantonese", 2.5), ("Vietnamese", 2.5),
+    ("Tagalog", 2.5), ("Korean", 1.5), ("Armenian", 1.0), ("Farsi", 1.0), ("Russian", 0.8),
+    ("Hindi", 0.7), ("Punjabi", 0.5), ("Arabic", 0.3), ("Japanese", 0.2),
+]
+STREETS = ["Main St", "Oak Ave", "Park Blvd", "Mission St", "El Camino Real", "Broadway", "1st St",
+           "Center St", "Hospital Dr", "Medical Plaza", "Sunset Blvd", "Pine St", "Maple Ave", "Lake Dr"]
+# Towns per county (weighted toward the first), and how far towns and providers spread, in degrees
+TOWNS_PER_COUNTY = 24
+TOWN_SPREAD_DEG = 0.25
+SITE_SPREAD_DEG = 0.03
+
+
+def _weights(pairs):
+    w = np.array([p[-1] for p in pairs], dtype=np.float64)
+    return w / w.sum()
+
+
+def town_names():
+    """
+    Town names, shape (counties, towns): the county seat takes the county's name.
+    """
+    names = np.array([c[0] if t == 0 else f"{c[0]} {t + 1}" for c in COUNTIES for t in range(TOWNS_PER_COUNTY)],
+                     dtype=object)
+    return names.reshape(len(COUNTIES), TOWNS_PER_COUNTY)
+
+
+def town_centroids(seed=0):
+    """
+    Town centre coordinates, shape (counties, towns, 2).
+    """
+    offsets = np.random.default_rng(seed + 1).normal(0, TOWN_SPREAD_DEG, (len(COUNTIES), TOWNS_PER_COUNTY, 2))
+    offsets[:, 0] = 0  # The first town is the county seat
+    return np.array([(c[2], c[3]) for c in COUNTIES])[:, None, :] + offsets
+
+
+def generate_providers(n, seed=0):
+    """
+    Synthetic provider network of n rows with the provider file's columns.
+
+    Providers sit in towns scattered around county centroids, and several
+    providers share each practice site (same address and coordinates), like
+    clinics and medical groups do. Categorical cardinalities are close to a
+    statewide network: 28 counties, 6 markets, 30 specialties, 14 languages
+    and a few hundred cities.
+    """
+    rng = np.random.default_rng(seed)
+    county = rng.choice(len(COUNTIES), n, p=_weights(COUNTIES))
+    # Town sizes fall off geometrically within a county
+    town_weights = 0.8 ** np.arange(TOWNS_PER_COUNTY)
+    town = rng.choice(TOWNS_PER_COUNTY, n, p=town_weights / town_weights.sum())
+
+    # About 3 providers per practice site
+    n_sites = max(1, n // 3)
+    site = rng.integers(0, n_sites, n)
+    site_county, site_town = county[site], town[site]
+    site_jitter = rng.normal(0, SITE_SPREAD_DEG, (n_sites, 2))[site]
+    coords = town_centroids(seed)[site_county, site_town] + site_jitter
+
+    county_names = np.array([c[0] for c in COUNTIES], dtype=object)
+    markets = np.array([c[1] for c in COUNTIES], dtype=object)
+    specialties = np.array([s[0] for s in SPECIALTIES], dtype=object)
+    languages = np.array([lang[0] for lang in LANGUAGES], dtype=object)
+    streets = np.array(STREETS, dtype=object)
+
+    ids = np.arange(n)
+    return pd.DataFrame({
+        "ProviderName": [f"Provider {i}" for i in ids],
+        "ProviderID": 1_000_000 + ids,
+        "VendorID": rng.integers(1, max(2, n // 50), n),
+        "PCNID": rng.integers(1, 400, n),
+        "Address": [f"{100 + s % 9800} {streets[(s // 9800) % len(streets)]}" for s in site],
+        "City": town_names()[site_county, site_town],
+        "County": county_names[site_county],
+        "Market": markets[site_county],
+        "Specialty": specialties[rng.choice(len(SPECIALTIES), n, p=_weights(SPECIALTIES))],
+        "Language": languages[rng.choice(len(LANGUAGES), n, p=_weights(LANGUAGES))],
+        "Latitude": np.round(coords[:, 0], 6),
+        "Longitude": np.round(coords[:, 1], 6),
+    })
+
+
+def generate_gazetteer(seed=0):
+    """
+    Gazetteer rows (zip, city, state, latitude, longitude) for the synthetic towns,
+    so addresses in them geocode offline.
+    """
+    names, centroids = town_names(), town_centroids(seed)
+    rows = []
+    for c in range(len(COUNTIES)):
+        for t in range(TOWNS_PER_COUNTY):
+            rows.append({"zip": f"{90000 + c * 100 + t:05d}", "city": names[c, t], "state": "CA",
+                         "latitude": round(centroids[c, t, 0], 6), "longitude": round(centroids[c, t, 1], 6)})
+    return pd.DataFrame(rows)
+
+
+def generate_roads(spacing_deg=0.02, seed=0):
+    """
+    Synthetic road graph as (nodes, edges) frames in road_network.py's input format:
+    a jittered grid over the state with local streets, an arterial every 10th line
+    and a highway every 40th.
+    """
+    rng = np.random.default_rng(seed + 2)
+    lat_lines = np.arange(32.3, 42.0, spacing_deg)
+    lon_lines = np.arange(-124.6, -114.0, spacing_deg)
+    rows, cols = len(lat_lines), len(lon_lines)
+    grid = np.arange(rows * cols).reshape(rows, cols)
+    lats = np.repeat(lat_lines, cols) + rng.normal(0, spacing_deg / 10, rows * cols)
+    lons = np.tile(lon_lines, rows) + rng.normal(0, spacing_deg / 10, rows * cols)
+    nodes = pd.DataFrame({"id": grid.ravel(), "lat": np.round(lats, 6), "lon": np.round(lons, 6)})
+
+    def speeds(lines):
+        return np.where(lines % 40 == 0, 65, np.where(lines % 10 == 0, 45, 25))
+
+    # East-west edges run along a grid row, north-south edges along a column
+    tails = np.concatenate([grid[:, :-1].ravel(), grid[:-1, :].ravel()])
+    heads = np.concatenate([grid[:, 1:].ravel(), grid[1:, :].ravel()])
+    mph = np.concatenate([np.repeat(speeds(np.arange(rows)), cols - 1), np.tile(speeds(np.arange(cols)), rows - 1)])
+    lat1, lat2 = np.radians(lats[tails]), np.radians(lats[heads])
+    miles = 3958.76 * np.hypot(lat2 - lat1, np.radians(lons[heads] - lons[tails]) * np.cos((lat1 + lat2) / 2))
+    edges = pd.DataFrame({"from": tails, "to": heads, "miles": np.round(miles, 4), "mph": mph})
+    return nodes, edges
+
+
+def write_providers(n, path, seed=0):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    generate_providers(n, seed=seed).to_csv(path, index=False)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic providers.csv.")
+    parser.add_argument("rows", type=int, help="Number of providers")
+    parser.add_argument("--out", default=None, help="Output CSV (default: benchmarks/data/providers_<rows>.csv)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    path = args.out or os.path.join(os.path.dirname(__file__), "data", f"providers_{args.rows}.csv")
+    print(write_providers(args.rows, path, seed=args.seed))
+
+
+if __name__ == "__main__":
+    main()
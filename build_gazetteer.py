@@ -0,0 +1,78 @@
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+import urllib.request
+import zipfile
+
+from geocache import GAZETTEER_PATH
+
+# GeoNames US postal code centroids (CC BY 4.0): a zip holding a tab-separated US.txt
+GEONAMES_URL = "https://download.geonames.org/export/zip/US.zip"
+# Columns of a GeoNames postal code dump used here: postal code, place name, state code, latitude, longitude
+ZIP_FIELD, CITY_FIELD, STATE_FIELD, LAT_FIELD, LON_FIELD = 1, 2, 4, 9, 10
+
+
+def read_geonames(source=GEONAMES_URL):
+    """
+    (zip, city, state, latitude, longitude) rows of a GeoNames postal code dump.
+    Rows without a 5-digit ZIP, a state code or coordinates are skipped.
+    - source: URL or local path of the .zip download, or of the .txt inside it
+    """
+    if source.startswith(("http://", "https://")):
+        with urllib.request.urlopen(source, timeout=120) as response:
+            data = response.read()
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+    if zipfile.is_zipfile(io.BytesIO(data)):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            name = next(name for name in archive.namelist() if name.lower() != "readme.txt")
+            data = archive.read(name)
+
+    for line in data.decode("utf-8").splitlines():
+        fields = line.split("\t")
+        if len(fields) <= LON_FIELD:
+            continue
+        zip_code, state = fields[ZIP_FIELD].strip(), fields[STATE_FIELD].strip()
+        if len(zip_code) != 5 or not zip_code.isdigit() or not state:
+            continue
+        try:
+            lat, lon = float(fields[LAT_FIELD]), float(fields[LON_FIELD])
+        except ValueError:
+            continue
+        yield zip_code, fields[CITY_FIELD].strip(), state, lat, lon
+
+
+def write_gazetteer(rows, path=GAZETTEER_PATH):
+    """
+    Write gazetteer rows as the CSV Gazetteer reads, replacing any earlier file in one rename.
+    Returns the number of rows written.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    with open(path + ".tmp", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["zip", "city", "state", "latitude", "longitude"])
+        for zip_code, city, state, lat, lon in rows:
+            writer.writerow([zip_code, city, state, f"{lat:.5f}", f"{lon:.5f}"])
+            count += 1
+    os.replace(path + ".tmp", path)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the local ZIP/city gazetteer from GeoNames postal codes.")
+    parser.add_argument("--source", default=GEONAMES_URL, help="GeoNames US.zip (or US.txt) URL or local path")
+    parser.add_argument("--out", default=GAZETTEER_PATH, help="Gazetteer CSV")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    count = write_gazetteer(read_geonames(args.source), args.out)
+    print(f"{count:,} ZIP centroids written to {args.out} in {time.time() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import numpy as np
+
+# Zoom levels with a precomputed cluster level; at higher zooms every provider is its own dot
+MIN_CLUSTER_ZOOM = 0
+MAX_CLUSTER_ZOOM = 13
+# Cluster cells per side of the world at zoom 0 (64 px cells on 256 px tiles); each zoom doubles it,
+# so every cell splits into 2x2 cells at the next
+CLUSTER_CELLS_Z0 = 4
+
+
+def mercator_xy(lats, lons):
+    """
+    Project coordinates to Web Mercator in [0, 1) world units.
+    """
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -85.05112878, 85.05112878)
+    x = (np.asarray(lons, dtype=np.float64) + 180) / 360
+    sin_lat = np.sin(np.radians(lats))
+    y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * np.pi)
+    return np.clip(x, 0, 1 - 1e-12), np.clip(y, 0, 1 - 1e-12)
+
+
+class ClusterIndex:
+    """
+    Precomputed cluster hierarchy over provider points, supercluster-style.
+
+    For every zoom level each point gets the label of the screen-pixel grid
+    cell it falls in. The grid has CLUSTER_CELLS_Z0 * 2**zoom cells per side,
+    so each cell is exactly four cells of the next zoom: the cells nest, and
+    every cluster is the union of its children one zoom in. Clustering any selection of points at a
+    zoom is then a label lookup plus a bincount, with no rebuild. Each zoom's
+    labels are computed the first time that zoom is asked for, so startup
+    does not pay for levels nobody views.
+    - lats, lons: Arrays of point coordinates in degrees
+    - is_pcp: Boolean array marking PCP providers
+    - labels: Optional precomputed {zoom: labels} from a previous build, e.g. a columnar store
+    """
+
+    def __init__(self, lats, lons, is_pcp, labels=None):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.is_pcp = np.asarray(is_pcp, dtype=bool)
+        self.labels = dict(labels or {})
+
+    def level(self, zoom):
+        """
+        Cluster label of every point at one zoom, computed on first use.
+        """
+        if zoom not in self.labels:
+            x, y = mercator_xy(self.lats, self.lons)
+            cells_per_side = CLUSTER_CELLS_Z0 * 2 ** zoom
+            cx = (x * cells_per_side).astype(np.int64)
+            cy = (y * cells_per_side).astype(np.int64)
+            _, labels = np.unique(cy * cells_per_side + cx, return_inverse=True)
+            # Threads racing on a level compute the same labels, so the last assignment wins harmlessly
+            self.labels[zoom] = labels.astype(np.int32)
+        return self.labels[zoom]
+
+    def all_levels(self):
+        """
+        Labels for every clustering zoom as {zoom: labels}, computing any still missing.
+        """
+        return {zoom: self.level(zoom) for zoom in range(MIN_CLUSTER_ZOOM, MAX_CLUSTER_ZOOM + 1)}
+
+    def clusters(self, positions, zoom):
+        """
+        Aggregate the selected points into the clusters of one zoom level.
+        - positions: Integer positions of the selected points
+        - zoom: Map zoom level
+        Returns a dict of per-cluster arrays (lat, lon, count, pcp) and the
+        positions of points that stand alone ("singles").
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        zoom = int(round(zoom))
+        if zoom > MAX_CLUSTER_ZOOM or len(positions) == 0:
+            empty = np.empty(0)
+            return {"lat": empty, "lon": empty, "count": empty, "pcp": empty, "singles": positions}
+        zoom = max(zoom, MIN_CLUSTER_ZOOM)
+
+        _, local, counts = np.unique(self.level(zoom)[positions], return_inverse=True, return_counts=True)
+        lat = np.bincount(local, weights=self.lats[positions]) / counts
+        lon = np.bincount(local, weights=self.lons[positions]) / counts
+        pcp = np.bincount(local, weights=self.is_pcp[positions]).astype(np.int64)
+
+        multi = counts > 1
+        singles = positions[~multi[local]]
+        return {"lat": lat[multi], "lon": lon[multi], "count": counts[multi], "pcp": pcp[multi], "singles": singles}
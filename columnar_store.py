@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+MANIFEST = "manifest.json"
+# Location validation report saved with an artifact (see validate_locations.py)
+LOCATION_REPORT = "locations.csv"
+FORMAT_VERSION = 1
+# Coordinates stay float64: float32 rounds to about a metre, enough to move a provider across a radius edge
+COORDINATE_COLUMNS = ("Latitude", "Longitude")
+
+
+def artifact_path(csv_path):
+    """
+    Default artifact directory for a provider CSV: data/providers.csv -> data/providers.store
+    """
+    return os.path.splitext(csv_path)[0] + ".store"
+
+
+def write_columnar(df, directory, source=None, indexes=None, report=None):
+    """
+    Write a provider frame as a directory of raw column files plus a manifest.
+
+    Numeric columns are stored as-is. Every text column is dictionary-encoded:
+    integer codes in a raw file and the sorted distinct values in JSON, so the
+    reader maps the codes straight into categoricals. The artifact is built in
+    a temporary directory and renamed into place, so readers never see a
+    partial write.
+    - df: Provider DataFrame
+    - directory: Artifact directory, replaced if it exists
+    - source: Path of the CSV the frame came from, recorded for staleness checks
+    - indexes: Optional {name: array} of derived index arrays stored alongside the columns
+    - report: Optional location validation report, saved as LOCATION_REPORT with its counts in the manifest
+    """
+    building = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        if name in COORDINATE_COLUMNS:
+            series = series.astype(np.float64)
+        entry = {"name": name, "file": f"{i:03d}.bin"}
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            values = series.to_numpy()
+            entry.update(kind="numeric", dtype=values.dtype.str)
+        else:
+            categorical = pd.Categorical(series.where(series.isna(), series.astype(str)))
+            values = categorical.codes
+            entry.update(kind="category", dtype=values.dtype.str, categories=f"{i:03d}.json")
+            with open(os.path.join(building, entry["categories"]), "w", encoding="utf-8") as f:
+                json.dump([str(v) for v in categorical.categories], f)
+        np.ascontiguousarray(values).tofile(os.path.join(building, entry["file"]))
+        columns.append(entry)
+
+    stored_indexes = []
+    for i, (name, values) in enumerate((indexes or {}).items()):
+        values = np.ascontiguousarray(values)
+        entry = {"name": name, "file": f"index-{i:03d}.bin", "dtype": values.dtype.str}
+        values.tofile(os.path.join(building, entry["file"]))
+        stored_indexes.append(entry)
+
+    manifest = {
+        "version": FORMAT_VERSION,
+        "rows": len(df),
+        "columns": columns,
+        "indexes": stored_indexes,
+        "source": source,
+        "source_mtime": os.path.getmtime(source) if source else None,
+        "created": time.time(),
+    }
+    if report is not None:
+        from validate_locations import summarize
+        report.to_csv(os.path.join(building, LOCATION_REPORT), index=False)
+        manifest["locations"] = summarize(report)
+    with open(os.path.join(building, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+
+    if os.path.exists(directory):
+        retired = f"{directory}.old-{os.getpid()}"
+        os.rename(directory, retired)
+        os.rename(building, directory)
+        shutil.rmtree(retired, ignore_errors=True)
+    else:
+        os.rename(building, directory)
+    return manifest
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_columnar(directory):
+    """
+    Provider frame backed by read-only memory maps of an artifact's column files.
+
+    Pages are loaded on first touch and shared between every process that maps
+    the same files, so workers do not each hold a private copy of the data.
+    """
+    manifest = read_manifest(directory)
+    if manifest["version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported provider artifact version {manifest['version']} in {directory}")
+    rows = manifest["rows"]
+    data = {}
+    for entry in manifest["columns"]:
+        path = os.path.join(directory, entry["file"])
+        values = np.memmap(path, dtype=np.dtype(entry["dtype"]), mode="r", shape=(rows,)) if rows \
+            else np.empty(0, dtype=np.dtype(entry["dtype"]))
+        if entry["kind"] == "category":
+            with open(os.path.join(directory, entry["categories"]), encoding="utf-8") as f:
+                categories = json.load(f)
+            values = pd.Categorical.from_codes(values, categories=categories, validate=False)
+        data[entry["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def read_indexes(directory):
+    """
+    Derived index arrays stored with an artifact, as {name: read-only memory map}.
+    """
+    manifest = read_manifest(directory)
+    rows = manifest["rows"]
+    return {
+        entry["name"]: np.memmap(os.path.join(directory, entry["file"]), dtype=np.dtype(entry["dtype"]),
+                                 mode="r", shape=(rows,))
+        for entry in manifest.get("indexes", []) if rows
+    }
+
+
+def is_fresh(directory, csv_path):
+    """
+    Whether an artifact exists and was built from the current version of a CSV.
+    """
+    if not os.path.exists(os.path.join(directory, MANIFEST)):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    mtime = read_manifest(directory).get("source_mtime")
+    return mtime is not None and mtime >= os.path.getmtime(csv_path)
+
+
+def ingest(csv_path, directory=None, validate=True):
+    """
+    Convert a provider CSV into a columnar artifact, with the cluster labels
+    precomputed so loading it skips the most expensive index build. Coordinates
+    are first checked and repaired by validate_locations, and its report is
+    stored in the artifact. Returns the manifest.
+    """
+    from provider_store import ProviderStore
+
+    directory = directory or artifact_path(csv_path)
+    df = pd.read_csv(csv_path)
+    report = None
+    if validate:
+        from geocache import GeocodeCache, Gazetteer
+        from validate_locations import validate_locations
+        df, report = validate_locations(df, Gazetteer(), GeocodeCache())
+    return write_columnar(df, directory, source=csv_path, indexes=ProviderStore(df).stored_indexes(), report=report)
+
+
+def main(argv=None):
+    from provider_store import DATA_PATH
+
+    parser = argparse.ArgumentParser(description="Convert the provider CSV into a memory-mapped columnar store.")
+    parser.add_argument("csv", nargs="?", default=DATA_PATH, help="Provider CSV")
+    parser.add_argument("--out", default=None, help="Artifact directory (default: next to the CSV, .store suffix)")
+    parser.add_argument("--no-validate", action="store_true", help="Skip coordinate validation and repair")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    manifest = ingest(args.csv, args.out, validate=not args.no_validate)
+    print(f"{manifest['rows']:,} providers, {len(manifest['columns'])} columns written to "
+          f"{args.out or artifact_path(args.csv)} in {time.time() - started:.1f}s")
+    if "locations" in manifest:
+        locations = manifest["locations"]
+        print(f"{locations['flagged']:,} locations flagged: "
+              + ", ".join(f"{k} {v:,}" for k, v in locations["issues"].items())
+              + "; repairs: " + ", ".join(f"{k} {v:,}" for k, v in locations["repairs"].items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+# Sidebar filter arguments and the provider columns they select on
+FILTER_COLUMNS = {
+    "county": "County",
+    "market": "Market",
+    "specialty": "Specialty",
+    "city": "City",
+    "language": "Language",
+}
+
+
+class CategoryIndex:
+    """
+    Per-value row position arrays for the categorical filter columns.
+
+    Each column is factorized once into sorted codes. Rows are stored grouped
+    by code, so the rows holding any value are one contiguous slice. A filter
+    combination resolves by OR-ing the slices within a column into a bitmap
+    and AND-ing the bitmaps across columns.
+    - df: Provider DataFrame
+    """
+
+    def __init__(self, df, columns=FILTER_COLUMNS):
+        self.n_rows = len(df)
+        self.columns = dict(columns)
+        self.values = {}
+        self.codes = {}
+        self.order = {}
+        self.starts = {}
+        for column in self.columns.values():
+            codes, uniques = pd.factorize(df[column], sort=True)
+            order = np.argsort(codes, kind="stable")
+            # Rows with missing values have code -1 and sort first; skip them
+            first = np.searchsorted(codes[order], 0)
+            self.values[column] = list(uniques)
+            self.codes[column] = {value: code for code, value in enumerate(uniques)}
+            self.order[column] = order
+            self.starts[column] = first + np.searchsorted(codes[order][first:], np.arange(len(uniques) + 1))
+
+    def options(self, column):
+        """
+        Sorted distinct values of a column, for dropdown options.
+        """
+        return self.values[column]
+
+    def rows(self, column, values):
+        """
+        Sorted positions of the rows whose column holds any of the values.
+        """
+        codes = [self.codes[column][v] for v in values if v in self.codes[column]]
+        starts, order = self.starts[column], self.order[column]
+        runs = [order[starts[code]:starts[code + 1]] for code in codes]
+        return np.sort(np.concatenate(runs)) if runs else np.empty(0, dtype=np.int64)
+
+    def mask(self, **filters):
+        """
+        Boolean row mask for a filter combination, or None when no filter is set.
+        - filters: Keyword arguments named as in FILTER_COLUMNS, each a list of values
+        """
+        mask = None
+        for name, values in filters.items():
+            if not values:
+                continue
+            bitmap = np.zeros(self.n_rows, dtype=bool)
+            bitmap[self.rows(self.columns[name], values)] = True
+            mask = bitmap if mask is None else mask & bitmap
+        return mask
+
+    def select(self, **filters):
+        """
+        Sorted row positions matching a filter combination.
+        """
+        mask = self.mask(**filters)
+        return np.arange(self.n_rows) if mask is None else np.flatnonzero(mask)
@@ -0,0 +1,130 @@
+import csv
+import os
+import re
+import time
+
+from sqlite_store import SQLiteStore
+
+# Durable geocode store and local gazetteer; override with environment variables
+GEOCACHE_PATH = os.environ.get("PROVLOCATOR_GEOCACHE", "data/geocache.sqlite")
+GAZETTEER_PATH = os.environ.get("PROVLOCATOR_GAZETTEER", "data/gazetteer.csv")
+
+ZIP_PATTERN = re.compile(r"\b(\d{5})(?:-\d{4})?\b")
+
+
+def normalize_address(address):
+    """
+    Canonical form of an address used as the cache key.
+    "12 Main St.,  Fresno , ca 93701" -> "12 MAIN ST, FRESNO, CA 93701"
+    """
+    address = re.sub(r"[.#]", " ", str(address).upper())
+    parts = [" ".join(part.split()) for part in address.split(",")]
+    return ", ".join(part for part in parts if part)
+
+
+class GeocodeCache(SQLiteStore):
+    """
+    On-disk geocode store shared by every worker process.
+
+    Keyed on normalized addresses, with hit/miss counters kept in the same
+    SQLite file so they add up across workers and restarts.
+    - path: SQLite file location
+    """
+
+    def __init__(self, path=GEOCACHE_PATH):
+        super().__init__(path, [
+            "CREATE TABLE IF NOT EXISTS geocodes ("
+            "address TEXT PRIMARY KEY, latitude REAL, longitude REAL, source TEXT, updated REAL)",
+        ])
+
+    def get(self, address):
+        """
+        Cached (lat, lon) for an address, or None, counting the hit or miss.
+        """
+        key = normalize_address(address)
+        with self._connect() as conn:
+            row = conn.execute("SELECT latitude, longitude FROM geocodes WHERE address = ?", (key,)).fetchone()
+            self._count(conn, "hits" if row else "misses")
+        return tuple(row) if row else None
+
+    def get_many(self, addresses):
+        """
+        Cached coordinates for many addresses as {normalized address: (lat, lon)}.
+        """
+        keys = sorted({normalize_address(a) for a in addresses})
+        found = {}
+        with self._connect() as conn:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT address, latitude, longitude FROM geocodes WHERE address IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                found.update({address: (lat, lon) for address, lat, lon in rows})
+            self._count(conn, "hits", len(found))
+            self._count(conn, "misses", len(keys) - len(found))
+        return found
+
+    def put(self, address, coords, source):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO geocodes (address, latitude, longitude, source, updated) VALUES (?, ?, ?, ?, ?)",
+                (normalize_address(address), coords[0], coords[1], source, time.time()),
+            )
+
+    def stats(self):
+        """
+        Counter totals across all workers, plus the hit rate.
+        """
+        with self._connect() as conn:
+            stats = self._counters(conn)
+            stats["entries"] = conn.execute("SELECT COUNT(*) FROM geocodes").fetchone()[0]
+        lookups = stats.get("hits", 0) + stats.get("misses", 0)
+        stats["hit_rate"] = stats.get("hits", 0) / lookups if lookups else 0.0
+        return stats
+
+
+class Gazetteer:
+    """
+    Local ZIP and city/state centroid lookup for offline geocoding.
+
+    Reads a CSV with zip, city, state, latitude and longitude columns. A
+    missing file gives an empty gazetteer that resolves nothing.
+    - path: Gazetteer CSV location
+    """
+
+    def __init__(self, path=GAZETTEER_PATH):
+        self.zips = {}
+        self.cities = {}
+        if not os.path.exists(path):
+            return
+        city_points = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                coords = (float(row["latitude"]), float(row["longitude"]))
+                self.zips[row["zip"].strip().zfill(5)] = coords
+                key = (normalize_address(row["city"]), normalize_address(row["state"]))
+                city_points.setdefault(key, []).append(coords)
+        # A city spanning several ZIPs resolves to the mean of their centroids
+        for key, points in city_points.items():
+            self.cities[key] = (sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+
+    def __len__(self):
+        return len(self.zips)
+
+    def lookup(self, address):
+        """
+        Centroid for the ZIP code in an address, else for its trailing "city, state" pair.
+        The ZIP is the last 5-digit number, since a house number can look like one.
+        """
+        key = normalize_address(address)
+        zips = ZIP_PATTERN.findall(key)
+        if zips and zips[-1] in self.zips:
+            return self.zips[zips[-1]]
+        parts = [ZIP_PATTERN.sub("", part).strip() for part in key.split(",")]
+        parts = [part for part in parts if part]
+        for i in range(len(parts) - 1):
+            coords = self.cities.get((parts[i], parts[i + 1]))
+            if coords:
+                return coords
+        return None
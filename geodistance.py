@@ -0,0 +1,136 @@
+import numpy as np
+
+# Mean earth radius and WGS-84 ellipsoid parameters, in miles
+EARTH_RADIUS_MILES = 3958.7613
+WGS84_A = 6378137.0 / 1609.344
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+# Upper bound on the relative difference between haversine and ellipsoidal distances
+HAVERSINE_TOLERANCE = 0.006
+
+# Distance modes accepted by distances_miles
+HAVERSINE = "haversine"
+ELLIPSOIDAL = "ellipsoidal"
+
+
+def haversine_miles(lat, lon, lats, lons):
+    """
+    Great-circle distance on a sphere from one point to many points.
+    - lat, lon: Origin in degrees
+    - lats, lons: Arrays of destination coordinates in degrees
+
+    Fast, but differs from geopy's ellipsoidal geodesic by up to ~0.5%.
+    """
+    lat1 = np.radians(lat)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(lons, dtype=np.float64) - lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def vincenty_miles(lat, lon, lats, lons, max_iter=200, tol=1e-12):
+    """
+    Vincenty's inverse formula on the WGS-84 ellipsoid, vectorized over destinations.
+    - lat, lon: Origin in degrees, or arrays of origins broadcastable against the destinations
+    - lats, lons: Arrays of destination coordinates in degrees
+
+    Agrees with geopy.distance.geodesic (Karney) to within 1e-6 miles for all
+    non-antipodal pairs. Nearly antipodal pairs where the iteration does not
+    converge fall back to the spherical distance.
+    """
+    arrays = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (lat, lon, lats, lons)))
+    shape = arrays[0].shape
+    lat, lon, lats, lons = (a.ravel() for a in arrays)
+
+    U1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat)))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lats)))
+    L = np.radians(lons - lon)
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    active = np.ones(lam.shape, dtype=bool)
+    sin_sigma = np.zeros_like(lam)
+    cos_sigma = np.ones_like(lam)
+    sigma = np.zeros_like(lam)
+    cos2_alpha = np.ones_like(lam)
+    cos_2sigma_m = np.zeros_like(lam)
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        sin_lam, cos_lam = np.sin(lam[active]), np.cos(lam[active])
+        cu1, su1 = cosU1[active], sinU1[active]
+        cu2, su2 = cosU2[active], sinU2[active]
+        s_sigma = np.sqrt((cu2 * sin_lam) ** 2 + (cu1 * su2 - su1 * cu2 * cos_lam) ** 2)
+        c_sigma = su1 * su2 + cu1 * cu2 * cos_lam
+        sig = np.arctan2(s_sigma, c_sigma)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sin_alpha = np.where(s_sigma == 0, 0.0, cu1 * cu2 * sin_lam / s_sigma)
+            c2a = 1 - sin_alpha ** 2
+            # Equatorial lines have cos^2(alpha) == 0
+            c2sm = np.where(c2a == 0, 0.0, c_sigma - 2 * su1 * su2 / c2a)
+        C = WGS84_F / 16 * c2a * (4 + WGS84_F * (4 - 3 * c2a))
+        lam_prev = lam[active]
+        lam_new = L[active] + (1 - C) * WGS84_F * sin_alpha * (
+            sig + C * s_sigma * (c2sm + C * c_sigma * (-1 + 2 * c2sm ** 2))
+        )
+
+        lam[active] = lam_new
+        sin_sigma[active] = s_sigma
+        cos_sigma[active] = c_sigma
+        sigma[active] = sig
+        cos2_alpha[active] = c2a
+        cos_2sigma_m[active] = c2sm
+
+        idx = np.flatnonzero(active)
+        active[idx[np.abs(lam_new - lam_prev) <= tol]] = False
+
+    u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    delta_sigma = B * sin_sigma * (
+        cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+        )
+    )
+    dist = WGS84_B * A * (sigma - delta_sigma)
+
+    if active.any():
+        dist[active] = haversine_miles(lat[active], lon[active], lats[active], lons[active])
+    return dist.reshape(shape)
+
+
+def distances_miles(origin, lats, lons, method=ELLIPSOIDAL):
+    """
+    Distances in miles from one origin to every destination in a single array pass.
+    - origin: (lat, lon) tuple; the coordinates may also be arrays broadcastable against the destinations
+    - lats, lons: Arrays (or Series) of destination coordinates
+    - method: "haversine" (fast, ~0.5% tolerance) or "ellipsoidal" (geopy-accurate)
+    """
+    lat, lon = origin
+    if method == HAVERSINE:
+        return haversine_miles(lat, lon, lats, lons)
+    if method == ELLIPSOIDAL:
+        return vincenty_miles(lat, lon, lats, lons)
+    raise ValueError(f"Unknown distance method: {method}")
+
+
+def distance_bands(distances, radii):
+    """
+    Band of each distance against ascending band limits, by one sorted-threshold lookup.
+    Band i holds distances in (radii[i-1], radii[i]]; distances past the last limit get len(radii).
+    """
+    return np.searchsorted(np.asarray(radii, dtype=np.float64), distances, side="left")
+
+
+def band_labels(radii, unit="mi"):
+    """
+    Display labels for ascending band limits, e.g. "0-5 mi", "5-10 mi".
+    - unit: Unit shown after each band, e.g. "min" for drive-time bands
+    """
+    edges = [0] + list(radii)
+    return [f"{low:g}-{high:g} {unit}" for low, high in zip(edges, edges[1:])]
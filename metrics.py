@@ -0,0 +1,223 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, has_request_context
+
+# Set PROVLOCATOR_SERVER_TIMING=1 to send per-stage timings in a Server-Timing response header
+SERVER_TIMING = os.environ.get("PROVLOCATOR_SERVER_TIMING") == "1"
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1 KiB .. 256 MiB
+ROWS_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+# Callback name and captured observations of work running outside a request, e.g. a background job
+_local = threading.local()
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join('{}="{}"'.format(n, str(v).replace("\\", "\\\\").replace('"', '\\"')) for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    """
+    Prometheus-style cumulative histogram with labels, safe to observe from any thread.
+    - name: Metric name
+    - help: One-line description
+    - buckets: Upper bounds of the buckets, ascending
+    - labelnames: Label names, given as keyword arguments to observe
+    """
+
+    def __init__(self, name, help, buckets, labelnames=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        observations = getattr(_local, "observations", None)
+        if observations is not None:
+            observations.append((self.name, value, labels))
+            return
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            counts, total = self._series.get(key, ([0] * len(self.buckets), [0, 0.0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            total[0] += 1
+            total[1] += value
+            self._series[key] = (counts, total)
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), list(total)) for key, (counts, total) in self._series.items()}
+        for key, (counts, (count, total)) in sorted(series.items()):
+            for bound, n in zip(self.buckets, counts):
+                labels = _format_labels(self.labelnames + ("le",), key + (f"{bound:g}",))
+                lines.append(f"{self.name}_bucket{labels} {n}")
+            labels = _format_labels(self.labelnames + ("le",), key + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total:.6g}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """
+    The metrics of one process, plus gauge callbacks evaluated at scrape time.
+    """
+
+    def __init__(self):
+        self.histograms = []
+        self.gauges = []
+
+    def histogram(self, name, help, buckets, labelnames=()):
+        histogram = Histogram(name, help, buckets, labelnames)
+        self.histograms.append(histogram)
+        return histogram
+
+    def gauge(self, name, help, read):
+        """
+        - read: Function returning the current value, or {labels tuple: value} for labelled gauges
+        """
+        self.gauges.append((name, help, read))
+
+    def expose(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for histogram in self.histograms:
+            lines.extend(histogram.expose())
+        for name, help, read in self.gauges:
+            try:
+                value = read()
+            except Exception:
+                continue
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} gauge"])
+            samples = value.items() if isinstance(value, dict) else [((), value)]
+            for labels, sample in samples:
+                label_text = _format_labels(*zip(*labels)) if labels else ""
+                lines.append(f"{name}{label_text} {float(sample):.6g}" if math.isfinite(sample) else f"{name}{label_text} NaN")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "provlocator_stage_seconds", "Time spent in each stage of a callback.", SECONDS_BUCKETS, ("callback", "stage"))
+PAYLOAD_BYTES = REGISTRY.histogram(
+    "provlocator_payload_bytes", "Size of callback responses sent to the browser.", BYTES_BUCKETS, ("callback",))
+RESULT_ROWS = REGISTRY.histogram(
+    "provlocator_result_rows", "Providers matched by a callback's query.", ROWS_BUCKETS, ("callback",))
+
+
+def current_callback():
+    return getattr(g, "metrics_callback", "") if has_request_context() else getattr(_local, "callback", "")
+
+
+@contextmanager
+def captured():
+    """
+    Collect this thread's observations as (metric, value, labels) tuples instead of
+    recording them, for a process that exits before anything scrapes it, such as a
+    background job. Record them in a process that serves /metrics with replay().
+    """
+    _local.observations = observations = []
+    try:
+        yield observations
+    finally:
+        _local.observations = None
+
+
+def replay(observations):
+    """
+    Record observations gathered by captured(), possibly in another process.
+    """
+    histograms = {histogram.name: histogram for histogram in REGISTRY.histograms}
+    for name, value, labels in observations:
+        if name in histograms:
+            histograms[name].observe(value, **labels)
+
+
+def _record(stage_name, seconds):
+    STAGE_SECONDS.observe(seconds, callback=current_callback(), stage=stage_name)
+    if has_request_context():
+        g.setdefault("metrics_timings", []).append((stage_name, seconds))
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a block as one stage of the current callback: `with stage("filter"): ...`
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - started)
+
+
+def record_rows(n):
+    RESULT_ROWS.observe(n, callback=current_callback())
+
+
+def instrumented(name):
+    """
+    Decorator for a Dash callback: labels its stages with `name` and times the whole call.
+    Serialization and payload size are measured once the response is built (see
+    install_request_hooks).
+    """
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if has_request_context():
+                g.metrics_callback = name
+            else:
+                _local.callback = name
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                STAGE_SECONDS.observe(elapsed, callback=name, stage="total")
+                if has_request_context():
+                    g.metrics_callback_seconds = elapsed
+        return wrapper
+    return decorate
+
+
+def install_request_hooks(server):
+    """
+    Record the serialize stage and payload size of instrumented callbacks, and send the
+    Server-Timing header when enabled.
+    """
+    @server.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @server.after_request
+    def finish_request_metrics(response):
+        name = getattr(g, "metrics_callback", None)
+        if not name:
+            return response
+        elapsed = time.perf_counter() - g.metrics_started
+        # Dash encodes the outputs after the callback returns; the remainder of the request is that work
+        _record("serialize", max(0.0, elapsed - getattr(g, "metrics_callback_seconds", elapsed)))
+        if not response.is_streamed:
+            PAYLOAD_BYTES.observe(response.calculate_content_length() or 0, callback=name)
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = ", ".join(
+                f"{stage_name};dur={seconds * 1000:.2f}" for stage_name, seconds in g.get("metrics_timings", [])
+            )
+        return response
@@ -0,0 +1,200 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from adequacy import CHUNK_SIZE, geocode_members
+from geocache import GeocodeCache, Gazetteer, GEOCACHE_PATH, GAZETTEER_PATH
+from geodistance import ELLIPSOIDAL, HAVERSINE
+from provider_store import DATA_PATH, dataset_version, load_provider_store
+
+# Nearest providers reported per member and specialty
+DEFAULT_N = 5
+# Run parameters and finished chunks, kept in the output directory so a rerun can resume
+PROGRESS_FILE = "_progress.json"
+# Part file formats; Parquet requires pyarrow
+FORMATS = ("parquet", "csv")
+
+
+def nearest_frame(store, members, specialties, n, geocache, gazetteer, method=ELLIPSOIDAL):
+    """
+    The n nearest providers of each specialty for one chunk of members, in long form:
+    one row per member, specialty and rank, ordered that way. Members without
+    coordinates get no rows.
+    Returns (frame, number of unresolved members).
+    """
+    lats, lons, _ = geocode_members(members, geocache, gazetteer)
+    member_ids = members["MemberID"].to_numpy() if "MemberID" in members else members.index.to_numpy()
+    provider_ids = store.df["ProviderID"].to_numpy() if "ProviderID" in store.df else np.arange(len(store))
+    resolved = np.flatnonzero(~np.isnan(lats) & ~np.isnan(lons))
+
+    # One k-nearest search per specialty, each over that specialty's own spatial index
+    rows, codes, ranks, positions, miles = [], [], [], [], []
+    for code, specialty in enumerate(specialties):
+        found, distances = store.nearest_many(lats[resolved], lons[resolved], n, specialty=specialty, method=method)
+        row, rank = np.nonzero(found >= 0)
+        rows.append(resolved[row])
+        codes.append(np.full(len(row), code, dtype=np.int32))
+        ranks.append(rank)
+        positions.append(found[row, rank])
+        miles.append(distances[row, rank])
+    rows, codes, ranks, positions, miles = (np.concatenate(a) for a in (rows, codes, ranks, positions, miles))
+    order = np.lexsort((ranks, codes, rows))
+
+    frame = pd.DataFrame({
+        "MemberID": member_ids[rows[order]],
+        "Specialty": pd.Categorical.from_codes(codes[order], categories=list(specialties)),
+        "Rank": (ranks[order] + 1).astype(np.int16),
+        "ProviderID": provider_ids[positions[order]],
+        "Miles": miles[order].round(3).astype(np.float32),
+    })
+    return frame, len(members) - len(resolved)
+
+
+def part_path(out_dir, chunk, fmt):
+    return os.path.join(out_dir, f"part-{chunk:05d}.{fmt}")
+
+
+def _write_json(path, data):
+    # Written aside and renamed, so an interrupted run never leaves half a file
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+# Per-process state for pool workers, loaded once by _init_worker
+_worker = {}
+
+
+def _init_worker(data_path, geocache_path, gazetteer_path):
+    _worker["store"] = load_provider_store(data_path)
+    _worker["geocache"] = GeocodeCache(geocache_path)
+    _worker["gazetteer"] = Gazetteer(gazetteer_path)
+
+
+def _run_chunk(chunk, members, out_dir, specialties, n, method, fmt):
+    # Workers write their own parts, so result rows never travel back through the pool
+    frame, unresolved = nearest_frame(_worker["store"], members, specialties, n,
+                                      _worker["geocache"], _worker["gazetteer"], method=method)
+    path = part_path(out_dir, chunk, fmt)
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), path + ".tmp")
+    else:
+        frame.to_csv(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    return chunk, len(members), unresolved, len(frame)
+
+
+def run_nearest_matrix(members_path, out_dir, n=DEFAULT_N, specialties=None, workers=None, chunk_size=CHUNK_SIZE,
+                       data_path=DATA_PATH, method=ELLIPSOIDAL, fmt="parquet", restart=False, progress=None):
+    """
+    Write the n nearest providers of each specialty for every member of a roster as
+    a dataset of part files in out_dir, one per chunk of members.
+
+    Chunks run in a process pool, at most two per worker in flight, and each
+    worker writes its chunk's part file under a temporary name and renames it
+    when complete. The progress file records the run's parameters and every
+    finished chunk, so rerunning an interrupted run with the same parameters
+    skips those chunks and picks up from there. A run with different
+    parameters refuses to mix its parts in unless restart is set, which
+    removes the earlier run's part and progress files first.
+    Returns the progress record.
+    - progress: Called as progress(record, elapsed) after each chunk
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    workers = workers or os.cpu_count() or 1
+    if specialties is None:
+        specialties = load_provider_store(data_path).filters.options("Specialty")
+    stat = os.stat(members_path)
+    params = {
+        "members": os.path.abspath(members_path), "members_size": stat.st_size, "members_mtime_ns": stat.st_mtime_ns,
+        "providers": dataset_version(data_path), "n": n, "specialties": list(specialties),
+        "chunk_size": chunk_size, "method": method, "format": fmt,
+    }
+
+    state_path = os.path.join(out_dir, PROGRESS_FILE)
+    os.makedirs(out_dir, exist_ok=True)
+    if restart:
+        for path in glob.glob(os.path.join(out_dir, "part-*")) + [state_path]:
+            if os.path.exists(path):
+                os.remove(path)
+    record = {"params": params, "finished": [], "members": 0, "unresolved": 0, "rows": 0}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            saved = json.load(f)
+        if saved["params"] != params:
+            raise ValueError(f"{out_dir} holds a run with different parameters; use a new directory or restart")
+        record = saved
+    finished = set(record["finished"])
+    started = time.time()
+    pending = deque()
+
+    def finish(future):
+        chunk, members, unresolved, rows = future.result()
+        finished.add(chunk)
+        record["finished"] = sorted(finished)
+        record["members"] += members
+        record["unresolved"] += unresolved
+        record["rows"] += rows
+        _write_json(state_path, record)
+        if progress:
+            progress(record, time.time() - started)
+
+    initargs = (data_path, GEOCACHE_PATH, GAZETTEER_PATH)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+        reader = pd.read_csv(members_path, chunksize=chunk_size, dtype={"Zip": str})
+        for chunk, members in enumerate(reader):
+            if chunk in finished:
+                continue
+            pending.append(pool.submit(_run_chunk, chunk, members, out_dir, specialties, n, method, fmt))
+            if len(pending) >= 2 * workers:
+                finish(pending.popleft())
+        while pending:
+            finish(pending.popleft())
+    record["complete"] = True
+    _write_json(state_path, record)
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nearest providers of each specialty for every member of a roster.")
+    parser.add_argument("members", help="Member CSV with MemberID and Address/City/State/Zip or Latitude/Longitude")
+    parser.add_argument("--out", default="nearest_providers", help="Output directory of part files")
+    parser.add_argument("-n", type=int, default=DEFAULT_N, help="Nearest providers per member and specialty")
+    parser.add_argument("--specialty", action="append", dest="specialties", help="Limit to a specialty (repeatable)")
+    parser.add_argument("--format", choices=FORMATS, default="parquet", help="Part file format")
+    parser.add_argument("--haversine", action="store_true", help="Spherical distances: faster, within 0.6%%")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Members per chunk")
+    parser.add_argument("--data", default=DATA_PATH, help="Provider file")
+    parser.add_argument("--restart", action="store_true", help="Discard an earlier run in the output directory")
+    args = parser.parse_args(argv)
+
+    def progress(record, elapsed):
+        print(f"\r{len(record['finished']):,} chunks, {record['members']:,} members, {record['rows']:,} rows "
+              f"in {elapsed:.0f}s", end="", file=sys.stderr)
+
+    try:
+        record = run_nearest_matrix(args.members, args.out, n=args.n, specialties=args.specialties,
+                                    workers=args.workers, chunk_size=args.chunk_size, data_path=args.data,
+                                    method=HAVERSINE if args.haversine else ELLIPSOIDAL, fmt=args.format,
+                                    restart=args.restart, progress=progress)
+    except ValueError as e:
+        parser.error(str(e))
+    print(file=sys.stderr)
+    print(f"{record['members']:,} members ({record['unresolved']:,} unresolved), {record['rows']:,} rows "
+          f"in {len(record['finished']):,} parts under {args.out}")
+
+
+if __name__ == "__main__":
+    main()
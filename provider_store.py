@@ -0,0 +1,259 @@
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from clustering import ClusterIndex, MAX_CLUSTER_ZOOM, MIN_CLUSTER_ZOOM
+from columnar_store import MANIFEST, artifact_path, is_fresh, read_columnar, read_indexes
+from filter_index import CategoryIndex
+from geodistance import ELLIPSOIDAL
+from sites import SiteIndex
+
+# Provider file loaded at startup; override with the PROVLOCATOR_DATA environment variable
+DATA_PATH = os.environ.get("PROVLOCATOR_DATA", "data/providers.csv")
+# Seconds between checks for a replaced provider file; 0 turns hot reload off
+RELOAD_INTERVAL = float(os.environ.get("PROVLOCATOR_RELOAD_INTERVAL", "30"))
+# Stored name of each zoom's cluster labels; renamed when the cluster grid changed, so artifacts
+# holding labels from the old grid have them recomputed instead of reused
+CLUSTER_KEY = "cluster_nested_z{}"
+
+
+class ProviderStore:
+    """
+    Provider data plus the indexes built over it when it loads.
+    - df: Provider DataFrame with Latitude/Longitude columns
+    - indexes: Optional derived index arrays saved by stored_indexes(), reused instead of rebuilt
+    - version: Identifier of the dataset the frame came from, used to key cached results
+    """
+
+    def __init__(self, df, indexes=None, version=None):
+        self.df = df
+        self.version = version
+        self.lats = df["Latitude"].to_numpy(dtype=np.float64)
+        self.lons = df["Longitude"].to_numpy(dtype=np.float64)
+        # Providers sharing a location are measured once per site
+        self.sites = SiteIndex(self.lats, self.lons, labels=(indexes or {}).get("site"))
+        # Compare the distinct specialties once and map the result through the codes
+        specialty = df["Specialty"].astype("category")
+        pcp_category = np.asarray(specialty.cat.categories.astype(str).str.strip().str.upper() == "PCP")
+        is_pcp = np.append(pcp_category, False)[specialty.cat.codes.to_numpy()]
+        labels = None
+        keys = {zoom: CLUSTER_KEY.format(zoom) for zoom in range(MIN_CLUSTER_ZOOM, MAX_CLUSTER_ZOOM + 1)}
+        if indexes and all(key in indexes for key in keys.values()):
+            labels = {zoom: indexes[key] for zoom, key in keys.items()}
+        self.clusters = ClusterIndex(self.lats, self.lons, is_pcp, labels=labels)
+        self.filters = CategoryIndex(df)
+        self._specialty_indexes = {}
+        self._road_nodes = None
+
+    def __len__(self):
+        return len(self.df)
+
+    def stored_indexes(self):
+        """
+        Derived index arrays worth saving with the data, keyed for the indexes argument.
+        """
+        indexes = {CLUSTER_KEY.format(zoom): labels for zoom, labels in self.clusters.all_levels().items()}
+        indexes["site"] = self.sites.labels
+        return indexes
+
+    def in_bounds(self, positions, bounds, margin=0.0):
+        """
+        The subset of positions inside a map bounding box.
+        - bounds: [[south, west], [north, east]] as reported by the map
+        - margin: Fraction of the box size added on every side
+        """
+        (south, west), (north, east) = bounds
+        pad_lat = (north - south) * margin
+        width = east - west if east >= west else east - west + 360
+        pad_lon = width * margin
+        lats = self.lats[positions]
+        inside = (lats >= south - pad_lat) & (lats <= north + pad_lat)
+        if width + 2 * pad_lon < 360:
+            # Measured eastward from the west edge, so boxes across the antimeridian work too
+            offset = (self.lons[positions] - (west - pad_lon)) % 360
+            inside &= offset <= width + 2 * pad_lon
+        return positions[inside]
+
+    def sort_order(self, positions, column, ascending=True, values=None):
+        """
+        Indices that sort the given positions by a column, missing values last.
+        - values: Optional per-position values to sort by instead of a store column
+        """
+        if values is None:
+            values = self.df[column].to_numpy()[positions]
+        ordered = pd.Series(values).sort_values(ascending=ascending, kind="stable", na_position="last")
+        return ordered.index.to_numpy()
+
+    def within_radius(self, origin, miles, method=ELLIPSOIDAL, mask=None):
+        """
+        Providers within `miles` of origin as (positions, distances).
+        """
+        return self.sites.query_radius(origin, miles, method=method, mask=mask)
+
+    def radius_sites(self, origin, miles):
+        """
+        Number of sites a within_radius query would measure, a cheap bound on its cost.
+        """
+        return len(self.sites.spatial.candidates(origin[0], origin[1], miles))
+
+    def specialty_index(self, specialty):
+        """
+        Site index over one specialty's providers, built on first use, with their store positions.
+        """
+        if specialty not in self._specialty_indexes:
+            positions = self.filters.rows("Specialty", [specialty])
+            _, labels = np.unique(self.sites.labels[positions], return_inverse=True)
+            index = SiteIndex(self.lats[positions], self.lons[positions], labels=labels)
+            self._specialty_indexes[specialty] = (index, positions)
+        return self._specialty_indexes[specialty]
+
+    def nearest(self, origin, k, specialty=None, method=ELLIPSOIDAL):
+        """
+        The k providers nearest to origin, optionally of one specialty, as (positions, distances).
+        """
+        if specialty is None:
+            return self.sites.query_nearest(origin, k, method=method)
+        index, positions = self.specialty_index(specialty)
+        found, distances = index.query_nearest(origin, k, method=method)
+        return positions[found], distances
+
+    def nearest_many(self, lats, lons, k, specialty=None, method=ELLIPSOIDAL):
+        """
+        The k providers nearest to each of many origins as (positions, distances) of shape (origins, k),
+        padded with -1 / inf where fewer than k providers exist.
+        """
+        if specialty is None:
+            return self.sites.query_nearest_many(lats, lons, k, method=method)
+        index, positions = self.specialty_index(specialty)
+        found, distances = index.query_nearest_many(lats, lons, k, method=method)
+        mapped = np.full(found.shape, -1, dtype=np.int64)
+        mapped[found >= 0] = positions[found[found >= 0]]
+        return mapped, distances
+
+    def road_nodes(self, network):
+        """
+        Each provider's nearest node on a RoadNetwork and the access minutes to it, as
+        (nodes, access) arrays; snapped once per site on first use.
+        """
+        if self._road_nodes is None or self._road_nodes[0] is not network:
+            nodes, access = network.snap(self.sites.lats, self.sites.lons)
+            self._road_nodes = (network, nodes[self.sites.labels], access[self.sites.labels])
+        return self._road_nodes[1], self._road_nodes[2]
+
+
+def dataset_version(path):
+    """
+    Short identifier that changes whenever the provider file (or a store's manifest) is replaced.
+    """
+    source = os.path.join(path, MANIFEST) if os.path.isdir(path) else path
+    stat = os.stat(source)
+    return hashlib.sha1(f"{os.path.abspath(source)}:{stat.st_mtime_ns}:{stat.st_size}".encode("utf-8")).hexdigest()[:16]
+
+
+def resolve_data_path(path):
+    """
+    The file or artifact directory to load for a data path: a CSV's artifact while it is up to date.
+    """
+    if not os.path.isdir(path) and is_fresh(artifact_path(path), path):
+        return artifact_path(path)
+    return path
+
+
+def load_provider_store(path=DATA_PATH):
+    """
+    Load providers from a columnar artifact directory, or from a CSV. A CSV with an
+    up-to-date artifact beside it (see columnar_store.py) is memory-mapped from the artifact.
+    """
+    path = resolve_data_path(path)
+    version = dataset_version(path)
+    if os.path.isdir(path):
+        return ProviderStore(read_columnar(path), indexes=read_indexes(path), version=version)
+    return ProviderStore(pd.read_csv(path), version=version)
+
+
+class ReloadingStore:
+    """
+    The current ProviderStore for a data path, replaced when the file is.
+
+    A background thread polls the dataset version. Once a new version has
+    stayed the same for two polls (so a file still being copied is not read),
+    the new store and its indexes are built off to the side and swapped in
+    with one assignment. Callers hold on to the store they got from current(),
+    so work already under way finishes on the old snapshot.
+    - path: Provider file or artifact directory
+    - interval: Seconds between version checks
+    """
+
+    def __init__(self, path=DATA_PATH, interval=RELOAD_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.store = load_provider_store(path)
+        self.loaded = time.time()
+        self._listeners = []
+        self._pending = None
+        self._thread = None
+
+    def current(self):
+        return self.store
+
+    def on_reload(self, listener):
+        """
+        Call listener(store) after each swap, e.g. to clear caches keyed on the old store.
+        """
+        self._listeners.append(listener)
+
+    def check(self, settle=True):
+        """
+        Reload if the dataset version changed and has settled. Returns True when the store was swapped.
+        - settle: Wait until two checks in a row see the same new version; refresh() loads at once
+        """
+        try:
+            version = dataset_version(resolve_data_path(self.path))
+        except OSError:
+            return False
+        if version == self.store.version:
+            self._pending = None
+            return False
+        if settle and version != self._pending:
+            self._pending = version
+            return False
+        store = load_provider_store(self.path)
+        self.store, self.loaded, self._pending = store, time.time(), None
+        for listener in self._listeners:
+            listener(store)
+        return True
+
+    def refresh(self):
+        """
+        Reload at once if the dataset version changed, notifying listeners as check() does.
+        For processes started from an older snapshot, such as background jobs, that have no
+        watcher of their own. Returns the current store.
+        """
+        try:
+            self.check(settle=False)
+        except Exception:
+            # A file still being replaced may not load yet; carry on with the snapshot already held
+            self._pending = None
+        return self.store
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception:
+                # A file that cannot be read yet is retried on the next change
+                self._pending = None
+
+    def start(self):
+        """
+        Start watching in a daemon thread, once per process; does nothing when interval is 0.
+        """
+        if self.interval > 0 and (self._thread is None or not self._thread.is_alive()):
+            self._thread = threading.Thread(target=self._watch, name="provider-reload", daemon=True)
+            self._thread.start()
+        return self
@@ -0,0 +1,201 @@
+import hashlib
+import io
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from sqlite_store import SQLiteStore
+
+# Query result store shared by all workers; override with environment variables
+RESULT_CACHE_PATH = os.environ.get("PROVLOCATOR_RESULT_CACHE", "data/results.sqlite")
+RESULT_CACHE_MAX_BYTES = int(float(os.environ.get("PROVLOCATOR_RESULT_CACHE_MB", "256")) * 1024 * 1024)
+
+# How long a worker may hold a computation before others stop waiting and compute it themselves
+LEASE_SECONDS = 60
+# How often a waiting worker checks whether the computation has finished
+POLL_SECONDS = 0.02
+
+
+def _owner_alive(owner):
+    """
+    Whether the process that took a lease is still running. Leases are "<pid>:<token>"
+    and workers share the SQLite file, so they share a host.
+    """
+    try:
+        os.kill(int(owner.split(":", 1)[0]), 0)
+    except ProcessLookupError:
+        return False
+    except (ValueError, OSError):
+        pass
+    return True
+
+
+def query_key(query_json, version):
+    """
+    Cache key of a canonical query JSON (sorted keys) against one dataset version.
+    """
+    return hashlib.sha1(f"{version}\n{query_json}".encode("utf-8")).hexdigest()
+
+
+def pack_arrays(values):
+    """
+    A tuple of arrays (entries may be None) as .npz bytes, without pickling.
+    """
+    buffer = io.BytesIO()
+    np.savez(buffer, n=np.array(len(values)), **{f"a{i}": v for i, v in enumerate(values) if v is not None})
+    return buffer.getvalue()
+
+
+def unpack_arrays(blob):
+    with np.load(io.BytesIO(blob), allow_pickle=False) as data:
+        return tuple(data[f"a{i}"] if f"a{i}" in data.files else None for i in range(int(data["n"])))
+
+
+class _Flight:
+    """
+    One in-process computation that other threads asking for the same key wait on.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache(SQLiteStore):
+    """
+    On-disk cache of query results shared by every worker process.
+
+    Values are tuples of arrays, stored as .npz blobs in a SQLite file and
+    evicted least recently used first once their total size passes max_bytes.
+    Identical concurrent requests compute once: threads in a process wait on
+    the first one, and other processes wait on its lease row until the
+    result appears.
+    - path: SQLite file location
+    - max_bytes: Size budget for stored results
+    """
+
+    def __init__(self, path=RESULT_CACHE_PATH, max_bytes=RESULT_CACHE_MAX_BYTES):
+        super().__init__(path, [
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB, size INTEGER, used REAL)",
+            "CREATE INDEX IF NOT EXISTS results_used ON results (used)",
+            "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT, started REAL)",
+        ])
+        self.max_bytes = max_bytes
+        self.token = uuid.uuid4().hex
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Stored value for a key, or None, marking it recently used.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row:
+                conn.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+        return unpack_arrays(row[0]) if row else None
+
+    def put(self, key, value):
+        blob = pack_arrays(value)
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO results (key, value, size, used) VALUES (?, ?, ?, ?)",
+                         (key, blob, len(blob), time.time()))
+            # Keep the most recently used results that fit the budget
+            conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM "
+                "(SELECT key, SUM(size) OVER (ORDER BY used DESC, key) AS running FROM results) WHERE running > ?)",
+                (self.max_bytes,),
+            )
+
+    def _owner(self):
+        return f"{os.getpid()}:{self.token}"
+
+    def _acquire(self, key):
+        """
+        Take the lease on computing a key, replacing a lease held past LEASE_SECONDS
+        or by a process that has exited (e.g. a cancelled background job).
+        """
+        now = time.time()
+        with self._connect() as conn:
+            held = conn.execute("SELECT owner, started FROM leases WHERE key = ?", (key,)).fetchone()
+            if held and (held[1] < now - LEASE_SECONDS or not _owner_alive(held[0])):
+                conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, held[0]))
+            taken = conn.execute("INSERT OR IGNORE INTO leases (key, owner, started) VALUES (?, ?, ?)",
+                                 (key, self._owner(), now)).rowcount
+        return taken == 1
+
+    def _release(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self._owner()))
+
+    def _get_or_compute_shared(self, key, compute):
+        deadline = time.time() + LEASE_SECONDS
+        waited = False
+        while True:
+            value = self.get(key)
+            if value is not None:
+                self.count("coalesced" if waited else "hits")
+                return value
+            if self._acquire(key):
+                break
+            if time.time() > deadline:
+                break
+            waited = True
+            time.sleep(POLL_SECONDS)
+        try:
+            # Another worker may have stored it between our lookup and taking the lease
+            value = self.get(key)
+            if value is not None:
+                self.count("coalesced")
+                return value
+            self.count("misses")
+            value = compute()
+            self.put(key, value)
+            return value
+        finally:
+            self._release(key)
+
+    def get_or_compute(self, key, compute):
+        """
+        The stored value for a key, else compute() stored under it. Concurrent calls
+        for the same key, from any thread or worker, run compute() once.
+        - compute: Function returning a tuple of arrays (entries may be None)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            self.count("coalesced")
+            return flight.value
+        try:
+            flight.value = self._get_or_compute_shared(key, compute)
+            return flight.value
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self):
+        """
+        Counter totals across all workers, plus stored entries, bytes and the hit rate.
+        Coalesced requests count as hits.
+        """
+        with self._connect() as conn:
+            stats = self._counters(conn)
+            stats["entries"], stats["bytes"] = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        hits = stats.get("hits", 0) + stats.get("coalesced", 0)
+        lookups = hits + stats.get("misses", 0)
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,246 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from geodistance import haversine_miles
+from provider_store import dataset_version
+from spatial_index import GridIndex
+
+# Preprocessed road graph for drive-time access; override with the PROVLOCATOR_ROADS environment variable.
+# Build it from node and edge CSVs (e.g. exported from an OSM extract) with `python road_network.py`.
+ROADS_PATH = os.environ.get("PROVLOCATOR_ROADS", "data/roads.npz")
+# Speed assumed for edges given as miles without a speed
+DEFAULT_MPH = 25
+# Points further than this from every road node are off the network
+SNAP_MILES = 2.0
+# Speed of the leg between a point and its nearest node, which has no road of its own
+ACCESS_MPH = 15
+# Cell size of the grid index used to snap points to nodes; road nodes are far denser than providers
+SNAP_CELL_DEG = 0.01
+# Width of the distance buckets settled together by the search, in minutes
+STEP_MINUTES = 1.0
+# Origin nodes whose search results are kept for reuse
+ORIGIN_CACHE = 256
+
+
+class RoadNetwork:
+    """
+    Directed road graph in compressed sparse row form, with travel times in minutes.
+
+    Edges leaving node i are indices[indptr[i]:indptr[i + 1]], taking minutes[...]
+    each. Points are snapped to their nearest node through a grid index over the
+    nodes. Searches are multi-source Dijkstra, bounded by a time limit, that
+    settle one STEP_MINUTES bucket of nodes per round in vectorized passes
+    (delta-stepping), so no per-node Python loop runs.
+    - lats, lons: Node coordinates in degrees
+    - indptr, indices, minutes: CSR adjacency and edge travel times
+    """
+
+    version = None
+
+    def __init__(self, lats, lons, indptr, indices, minutes):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.minutes = np.asarray(minutes, dtype=np.float64)
+        self.spatial = GridIndex(self.lats, self.lons, cell_deg=SNAP_CELL_DEG)
+        # Fastest straight-line speed along any edge, which bounds how far a trip can get
+        tails = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        miles = haversine_miles(self.lats[tails], self.lons[tails], self.lats[self.indices], self.lons[self.indices])
+        moving = self.minutes > 0
+        self.top_mph = max(ACCESS_MPH, float((miles[moving] / self.minutes[moving]).max(initial=0)) * 60)
+        self._reverse = None
+        self._origins = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.lats)
+
+    def reach_miles(self, limit):
+        """
+        Straight-line miles no trip of limit minutes can exceed, for prefiltering destinations.
+        """
+        return limit * self.top_mph / 60
+
+    def reverse(self):
+        """
+        The (indptr, indices, minutes) of the graph with every edge turned around, built on first use.
+        Searching it from providers gives each node's minutes to the nearest provider.
+        """
+        if self._reverse is None:
+            tails = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+            order = np.argsort(self.indices, kind="stable")
+            indptr = np.concatenate([[0], np.cumsum(np.bincount(self.indices, minlength=len(self)))])
+            self._reverse = (indptr, tails[order], self.minutes[order])
+        return self._reverse
+
+    def snap(self, lats, lons):
+        """
+        Nearest node of each point, and the minutes of the leg to it at ACCESS_MPH.
+        Points off the network (or without coordinates) get node -1 and inf minutes.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        nodes = np.full(len(lats), -1, dtype=np.int64)
+        access = np.full(len(lats), np.inf)
+        valid = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+        if len(valid) and len(self):
+            found, miles = self.spatial.query_nearest_within(lats[valid], lons[valid], SNAP_MILES)
+            nodes[valid] = found
+            access[valid] = miles / ACCESS_MPH * 60
+        return nodes, access
+
+    def search(self, sources, offsets, limit, reverse=False):
+        """
+        Minutes from the nearest of several sources to every node, inf past limit.
+        - sources, offsets: Source nodes and the minutes already spent reaching each
+        - limit: Stop once every node within this many minutes is settled
+        - reverse: Follow edges backwards, giving minutes to the nearest source instead
+        """
+        indptr, indices, minutes = self.reverse() if reverse else (self.indptr, self.indices, self.minutes)
+        dist = np.full(len(self), np.inf)
+        sources, offsets = np.asarray(sources, dtype=np.int64), np.asarray(offsets, dtype=np.float64)
+        keep = (sources >= 0) & (offsets <= limit)
+        np.minimum.at(dist, sources[keep], offsets[keep])
+        pending = np.unique(sources[keep])
+        bucket_end = -np.inf
+        while len(pending):
+            reached = dist[pending]
+            frontier = reached < bucket_end
+            if not frontier.any():
+                # The current bucket is settled: move on to the one holding the nearest pending node
+                bucket_end = reached.min() + STEP_MINUTES
+                frontier = reached < bucket_end
+            nodes, pending = pending[frontier], pending[~frontier]
+
+            # Relax every edge leaving the frontier at once
+            starts = indptr[nodes]
+            counts = indptr[nodes + 1] - starts
+            edges = np.arange(counts.sum()) + np.repeat(starts - np.cumsum(counts) + counts, counts)
+            heads = indices[edges]
+            candidates = np.repeat(dist[nodes], counts) + minutes[edges]
+            better = (candidates < dist[heads]) & (candidates <= limit)
+            heads, candidates = heads[better], candidates[better]
+            np.minimum.at(dist, heads, candidates)
+            # Improved nodes are searched again, in whichever bucket they now fall
+            pending = np.union1d(pending, heads)
+        return dist
+
+    def minutes_from(self, node, limit):
+        """
+        Minutes from one node to every node within limit, as sorted (nodes, minutes) arrays.
+        Cached per origin node; a cached search with a longer limit also answers shorter ones.
+        """
+        with self._lock:
+            cached = self._origins.get(node)
+            if cached is not None and cached[0] >= limit:
+                self._origins.move_to_end(node)
+                _, nodes, minutes = cached
+                keep = minutes <= limit
+                return nodes[keep], minutes[keep]
+        dist = self.search([node], [0.0], limit)
+        nodes = np.flatnonzero(np.isfinite(dist))
+        minutes = dist[nodes]
+        with self._lock:
+            self._origins[node] = (limit, nodes, minutes)
+            self._origins.move_to_end(node)
+            while len(self._origins) > ORIGIN_CACHE:
+                self._origins.popitem(last=False)
+        return nodes, minutes
+
+    def drive_minutes(self, origin, nodes, access, limit):
+        """
+        Drive minutes from origin to points already snapped with snap(), inf where
+        unreachable within limit (or off the network).
+        - origin: (lat, lon) of the trip start
+        - nodes, access: The points' snap() result
+        """
+        start, start_access = self.snap([origin[0]], [origin[1]])
+        out = np.full(len(nodes), np.inf)
+        if start[0] < 0:
+            return out
+        reached, minutes = self.minutes_from(int(start[0]), limit)
+        slots = np.minimum(np.searchsorted(reached, nodes), len(reached) - 1)
+        found = (nodes >= 0) & (reached[slots] == nodes)
+        out[found] = start_access[0] + minutes[slots[found]] + access[found]
+        out[out > limit] = np.inf
+        return out
+
+    def minutes_to(self, target_nodes, target_access, limit):
+        """
+        Drive minutes from every node to its nearest target, inf past limit, from one
+        search over the reversed graph seeded at every target. Look points up with
+        node_minutes[nodes] + access from their snap().
+        - target_nodes, target_access: The targets' snap() result, e.g. one specialty's providers
+        """
+        return self.search(target_nodes, target_access, limit, reverse=True)
+
+
+def build_road_network(nodes, edges):
+    """
+    RoadNetwork from node and edge tables.
+    - nodes: Frame with id, lat and lon columns
+    - edges: Frame with from and to node ids, and either minutes or miles (plus an optional
+      mph, else DEFAULT_MPH). Edges are two-way unless an oneway column is true.
+    """
+    ids = nodes["id"].to_numpy()
+    index = pd.Index(ids)
+    tails = index.get_indexer(edges["from"].to_numpy())
+    heads = index.get_indexer(edges["to"].to_numpy())
+    if "minutes" in edges:
+        minutes = edges["minutes"].to_numpy(dtype=np.float64)
+    else:
+        mph = edges["mph"].fillna(DEFAULT_MPH).to_numpy(dtype=np.float64) if "mph" in edges else DEFAULT_MPH
+        minutes = edges["miles"].to_numpy(dtype=np.float64) / mph * 60
+    valid = (tails >= 0) & (heads >= 0) & np.isfinite(minutes) & (minutes >= 0)
+    oneway = edges["oneway"].fillna(False).astype(bool).to_numpy() if "oneway" in edges else np.zeros(len(edges), bool)
+    back = valid & ~oneway
+    tails, heads, minutes = (np.concatenate([tails[valid], heads[back]]), np.concatenate([heads[valid], tails[back]]),
+                             np.concatenate([minutes[valid], minutes[back]]))
+
+    order = np.lexsort((heads, tails))
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(tails, minlength=len(ids)))])
+    return RoadNetwork(nodes["lat"].to_numpy(), nodes["lon"].to_numpy(), indptr, heads[order], minutes[order])
+
+
+def save_road_network(network, path):
+    np.savez(path, lats=network.lats, lons=network.lons, indptr=network.indptr,
+             indices=network.indices.astype(np.int32), minutes=network.minutes.astype(np.float32))
+
+
+def load_road_network(path=ROADS_PATH):
+    """
+    The RoadNetwork saved at path, or None when there is no such file (drive times are then unavailable).
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as arrays:
+        network = RoadNetwork(arrays["lats"], arrays["lons"], arrays["indptr"], arrays["indices"], arrays["minutes"])
+    # Drive-time results are cached under this, so a replaced road file is not served stale results
+    network.version = dataset_version(path)
+    return network
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the road graph used for drive-time access.")
+    parser.add_argument("nodes", help="Node CSV with id, lat and lon columns")
+    parser.add_argument("edges", help="Edge CSV with from, to and minutes, or miles with optional mph and oneway")
+    parser.add_argument("--out", default=ROADS_PATH, help="Road graph file (.npz)")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    network = build_road_network(pd.read_csv(args.nodes), pd.read_csv(args.edges))
+    save_road_network(network, args.out)
+    print(f"{len(network):,} nodes, {len(network.indices):,} directed edges written to {args.out} "
+          f"in {time.time() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
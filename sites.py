@@ -0,0 +1,115 @@
+import numpy as np
+
+from geodistance import ELLIPSOIDAL
+from spatial_index import GridIndex
+
+# Points whose coordinates agree to this many decimals (about 10 cm) share a site
+SITE_DECIMALS = 6
+
+
+def site_labels(lats, lons):
+    """
+    Site label of every point: points whose coordinates round to the same
+    SITE_DECIMALS share one. Points with missing or impossible coordinates
+    each get a site of their own.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    scale = 10 ** SITE_DECIMALS
+    valid = np.isfinite(lats) & np.isfinite(lons) & (np.abs(lats) <= 90) & (np.abs(lons) <= 180)
+    lat_keys = np.round(np.where(valid, lats, 0) * scale).astype(np.int64) + 90 * scale
+    lon_keys = np.round(np.where(valid, lons, 0) * scale).astype(np.int64) + 180 * scale
+    keys = np.where(valid, lat_keys * (360 * scale + 1) + lon_keys, -1 - np.arange(len(lats)))
+    _, labels = np.unique(keys, return_inverse=True)
+    return labels.astype(np.int32)
+
+
+class SiteIndex:
+    """
+    Points grouped into sites by coordinate, with a grid index over the sites.
+
+    Hospitals and large clinics list many providers at one address, so a
+    network has far fewer sites than providers. Distance queries measure each
+    site once and give that distance to all of its points. Each site's points
+    are stored contiguously, in point order.
+    - lats, lons: Arrays of point coordinates in degrees
+    - labels: Optional precomputed site_labels, e.g. from a columnar store
+    """
+
+    def __init__(self, lats, lons, labels=None):
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        self.labels = site_labels(lats, lons) if labels is None else np.asarray(labels)
+        self.order = np.argsort(self.labels, kind="stable")
+        self.counts = np.bincount(self.labels, minlength=1 if len(self.labels) else 0)
+        self.starts = np.cumsum(self.counts) - self.counts
+        first = self.order[self.starts]
+        self.lats, self.lons = lats[first], lons[first]
+        self.spatial = GridIndex(self.lats, self.lons)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def members(self, sites, limit=None):
+        """
+        Points at the given sites, site after site, with the index into sites each came from.
+        - limit: Take at most this many points per site
+        """
+        sites = np.asarray(sites, dtype=np.int64)
+        counts = self.counts[sites] if limit is None else np.minimum(self.counts[sites], limit)
+        owner = np.repeat(np.arange(len(sites)), counts)
+        # Expand each (start, count) run into contiguous slot indices
+        slots = np.arange(counts.sum()) + np.repeat(self.starts[sites] - np.cumsum(counts) + counts, counts)
+        return self.order[slots], owner
+
+    def sites_with(self, mask):
+        """
+        Boolean mask over sites that have at least one point eligible under a point mask.
+        """
+        eligible = np.zeros(len(self), dtype=bool)
+        eligible[self.labels[mask]] = True
+        return eligible
+
+    def query_radius(self, origin, miles, method=ELLIPSOIDAL, mask=None):
+        """
+        Points within `miles` of origin as (positions, distances), grouped by site.
+        - mask: Optional boolean array restricting which points are eligible
+        """
+        site_mask = None if mask is None else self.sites_with(mask)
+        sites, distances = self.spatial.query_radius(origin, miles, method=method, mask=site_mask)
+        positions, owner = self.members(sites)
+        if mask is not None:
+            keep = mask[positions]
+            positions, owner = positions[keep], owner[keep]
+        return positions, distances[owner]
+
+    def query_nearest(self, origin, k, method=ELLIPSOIDAL):
+        """
+        The k points nearest to origin as (positions, distances), nearest first.
+        """
+        # The k nearest sites hold at least k points, and no point elsewhere is nearer
+        sites, distances = self.spatial.query_nearest(origin, k, method=method)
+        positions, owner = self.members(sites, limit=k)
+        return positions[:k], distances[owner][:k]
+
+    def query_nearest_many(self, lats, lons, k, method=ELLIPSOIDAL):
+        """
+        The k points nearest to each of many origins as (positions, distances) of shape
+        (origins, k), nearest first, padded with -1 / inf where fewer than k points exist.
+        """
+        sites, distances = self.spatial.query_nearest_many(lats, lons, k, method=method)
+        positions = np.full(sites.shape, -1, dtype=np.int64)
+        found = sites >= 0
+        if k == 1:
+            positions[found] = self.order[self.starts[sites[found]]]
+            return positions, distances
+        # Fill each origin's k slots from its nearest sites in order, k points at most per site
+        flat = np.flatnonzero(found)
+        members, owner = self.members(sites.ravel()[flat], limit=k)
+        rows = flat[owner] // k
+        rank = np.arange(len(members)) - np.searchsorted(rows, rows)
+        keep = rank < k
+        out_distances = np.full(sites.shape, np.inf)
+        positions[rows[keep], rank[keep]] = members[keep]
+        out_distances[rows[keep], rank[keep]] = distances.ravel()[flat[owner[keep]]]
+        return positions, out_distances
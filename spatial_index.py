@@ -0,0 +1,259 @@
+import numpy as np
+
+from geodistance import distances_miles, haversine_miles, ELLIPSOIDAL, HAVERSINE, HAVERSINE_TOLERANCE, EARTH_RADIUS_MILES
+
+# Conservative miles per degree of latitude (the ellipsoidal minimum is ~68.7)
+MILES_PER_DEG_LAT = 68.5
+# Half the earth's circumference; no two points are farther apart than this
+MAX_DISTANCE_MILES = np.pi * EARTH_RADIUS_MILES * 1.01
+
+
+class GridIndex:
+    """
+    Grid bucket index over point coordinates for radius and k-nearest queries.
+
+    Points are bucketed into fixed-size lat/lon cells and stored contiguously
+    per cell, so a query only measures distances to points in the cells that
+    overlap its bounding box.
+    - lats, lons: Arrays of point coordinates in degrees
+    - cell_deg: Cell edge length in degrees
+    """
+
+    def __init__(self, lats, lons, cell_deg=0.1):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.cell_deg = cell_deg
+        self.n_rows = int(np.ceil(180 / cell_deg)) + 1
+        self.n_cols = int(np.ceil(360 / cell_deg)) + 1
+
+        keys = self._cell_keys(self._row(self.lats), self._col(self.lons))
+        self.order = np.argsort(keys, kind="stable")
+        self.cell_keys, self.cell_starts, self.cell_counts = np.unique(
+            keys[self.order], return_index=True, return_counts=True
+        )
+
+    def __len__(self):
+        return len(self.lats)
+
+    # Points without coordinates go in the first cell; their distances are NaN, so no query returns them
+    def _row(self, lat):
+        lat = np.asarray(lat, dtype=np.float64)
+        lat = np.where(np.isfinite(lat), lat, -90.0)
+        return np.clip(((lat + 90) // self.cell_deg).astype(np.int64), 0, self.n_rows - 1)
+
+    def _col(self, lon):
+        lon = np.asarray(lon, dtype=np.float64)
+        lon = np.where(np.isfinite(lon), lon, -180.0)
+        return ((lon + 180) // self.cell_deg).astype(np.int64) % self.n_cols
+
+    def _cell_keys(self, rows, cols):
+        return rows * self.n_cols + cols
+
+    def candidates(self, lat, lon, miles):
+        """
+        Positions of all points in the cells overlapping the box around (lat, lon).
+        May include points outside the radius; never misses one inside it.
+        """
+        if miles >= MAX_DISTANCE_MILES / 2:
+            return np.arange(len(self))
+
+        dlat = miles / MILES_PER_DEG_LAT
+        lat_lo, lat_hi = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        rows = np.arange(self._row(lat_lo), self._row(lat_hi) + 1)
+
+        # Longitude degrees shrink toward the poles; size the box for the most poleward latitude
+        max_abs_lat = max(abs(lat_lo), abs(lat_hi))
+        cos_lat = np.cos(np.radians(max_abs_lat))
+        if max_abs_lat >= 89.0 or miles / (MILES_PER_DEG_LAT * cos_lat) >= 180:
+            cols = np.arange(self.n_cols)
+        else:
+            dlon = miles / (MILES_PER_DEG_LAT * cos_lat)
+            first = int((lon - dlon + 180) // self.cell_deg)
+            last = int((lon + dlon + 180) // self.cell_deg)
+            cols = np.unique(np.arange(first, last + 1) % self.n_cols)
+
+        keys = self._cell_keys(rows[:, None], cols[None, :]).ravel()
+        found = np.searchsorted(self.cell_keys, keys)
+        in_range = found < len(self.cell_keys)
+        found, keys = found[in_range], keys[in_range]
+        found = found[self.cell_keys[found] == keys]
+        if len(found) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        starts = self.cell_starts[found]
+        counts = self.cell_counts[found]
+        # Expand each (start, count) run into contiguous slot indices
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        slots = np.arange(counts.sum()) + offsets
+        return self.order[slots]
+
+    def query_radius(self, origin, miles, method=ELLIPSOIDAL, mask=None):
+        """
+        Points within `miles` of origin.
+        - origin: (lat, lon) tuple
+        - mask: Optional boolean array restricting which points are eligible
+        Returns (positions, distances) in position order.
+        """
+        lat, lon = origin
+        positions = np.sort(self.candidates(lat, lon, miles))
+        if mask is not None:
+            positions = positions[mask[positions]]
+        distances = distances_miles(origin, self.lats[positions], self.lons[positions], method=method)
+        keep = distances <= miles
+        return positions[keep], distances[keep]
+
+    def query_nearest(self, origin, k, method=ELLIPSOIDAL, mask=None):
+        """
+        The k points nearest to origin, searching outward in growing boxes.
+        - origin: (lat, lon) tuple
+        - k: Number of neighbours to return
+        - mask: Optional boolean array restricting which points are eligible
+        Returns (positions, distances) sorted by distance.
+        """
+        eligible = len(self) if mask is None else int(np.count_nonzero(mask))
+        k = min(k, eligible)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        miles = self.cell_deg * MILES_PER_DEG_LAT
+        while True:
+            positions, distances = self.query_radius(origin, miles, method=method, mask=mask)
+            if len(positions) >= k or miles >= MAX_DISTANCE_MILES:
+                break
+            miles *= 2
+
+        nearest = np.argsort(distances, kind="stable")[:k]
+        return positions[nearest], distances[nearest]
+
+    def query_nearest_many(self, lats, lons, k, method=ELLIPSOIDAL, max_pairs=1_000_000):
+        """
+        The k points nearest to each of many origins.
+
+        Origins are grouped by grid cell. Each group shares one candidate
+        search, widened until every origin in it has k points within the
+        searched radius, and its distances are computed as one matrix.
+        - lats, lons: Arrays of origin coordinates in degrees
+        - k: Number of neighbours per origin
+        - max_pairs: Cap on origins x candidates per distance matrix, to bound memory
+        Returns (positions, distances) of shape (origins, k), nearest first.
+        Rows are padded with -1 / inf when fewer than k points exist.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        out_positions = np.full((len(lats), k), -1, dtype=np.int64)
+        out_distances = np.full((len(lats), k), np.inf)
+        k_found = min(k, len(self))
+        if k_found == 0 or len(lats) == 0:
+            return out_positions, out_distances
+
+        keys = self._cell_keys(self._row(lats), self._col(lons))
+        order = np.argsort(keys, kind="stable")
+        _, starts = np.unique(keys[order], return_index=True)
+        for group in np.split(order, starts[1:]):
+            # Search around the group's centre; any point within `miles` of a member
+            # lies within `miles + spread` of the centre
+            center = (lats[group].mean(), lons[group].mean())
+            spread = distances_miles(center, lats[group], lons[group], method=method).max() * 1.01
+            miles = self.cell_deg * MILES_PER_DEG_LAT
+            pending = group
+            while len(pending):
+                candidates = self.candidates(center[0], center[1], miles + spread)
+                if len(candidates) < k_found and miles < MAX_DISTANCE_MILES:
+                    miles *= 2
+                    continue
+                batch = max(1, max_pairs // max(len(candidates), 1))
+                unresolved = []
+                for start in range(0, len(pending), batch):
+                    rows = pending[start:start + batch]
+                    nearest, nearest_miles = self._nearest_in(lats[rows], lons[rows], candidates, k_found, method)
+                    # Exact only if the k-th neighbour is inside the fully searched radius
+                    done = (nearest_miles[:, -1] <= miles) | (miles >= MAX_DISTANCE_MILES)
+                    out_positions[rows[done], :k_found] = candidates[nearest[done]]
+                    out_distances[rows[done], :k_found] = nearest_miles[done]
+                    unresolved.append(rows[~done])
+                pending = np.concatenate(unresolved)
+                miles *= 2
+        return out_positions, out_distances
+
+    def query_nearest_within(self, lats, lons, miles, max_pairs=4_000_000):
+        """
+        The nearest point to each of many origins, if one lies within `miles`, by
+        great-circle (haversine) distance.
+
+        Suited to snapping many origins onto dense points such as road nodes: all
+        origins scan the cell ring at the same distance from their own cell at once,
+        ring by ring, and stop once the best point found is closer than any point in
+        an unscanned ring could be, or the rings cover `miles`.
+        - lats, lons: Arrays of origin coordinates in degrees
+        - max_pairs: Cap on origin x candidate pairs measured at once, to bound memory
+        Returns (positions, distances), -1 / inf where no point is within `miles`.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        best = np.full(len(lats), np.inf)
+        best_positions = np.full(len(lats), -1, dtype=np.int64)
+        if len(self) == 0:
+            return best_positions, best
+        rows, cols = self._row(lats), self._col(lons)
+        pending = np.arange(len(lats))
+        ring = 0
+        while len(pending) and ring <= self.n_cols // 2:
+            # Offsets of the cells exactly `ring` cells away, along the edges of a square
+            side = np.arange(-ring, ring + 1)
+            if ring:
+                d_rows = np.concatenate([np.full(len(side), -ring), np.full(len(side), ring), side[1:-1], side[1:-1]])
+                d_cols = np.concatenate([side, side, np.full(len(side) - 2, -ring), np.full(len(side) - 2, ring)])
+            else:
+                d_rows = d_cols = np.zeros(1, dtype=np.int64)
+            batch = max(1, max_pairs // max(1, len(d_rows) * max(1, len(self) // max(len(self.cell_keys), 1))))
+            for start in range(0, len(pending), batch):
+                origins = pending[start:start + batch]
+                cell_rows = rows[origins][:, None] + d_rows[None, :]
+                keys = self._cell_keys(cell_rows, (cols[origins][:, None] + d_cols[None, :]) % self.n_cols)
+                found = np.minimum(np.searchsorted(self.cell_keys, keys), len(self.cell_keys) - 1)
+                hit = (self.cell_keys[found] == keys) & (cell_rows >= 0) & (cell_rows < self.n_rows)
+                owner = np.broadcast_to(origins[:, None], keys.shape)[hit]
+                counts = self.cell_counts[found[hit]]
+                owner = np.repeat(owner, counts)
+                # Expand each (start, count) run into contiguous slot indices
+                slots = np.arange(counts.sum()) + np.repeat(self.cell_starts[found[hit]] - np.cumsum(counts) + counts, counts)
+                candidates = self.order[slots]
+                distances = haversine_miles(lats[owner], lons[owner], self.lats[candidates], self.lons[candidates])
+                order = np.lexsort((distances, owner))
+                first = order[np.flatnonzero(np.diff(owner[order], prepend=-1))]
+                better = distances[first] < best[owner[first]]
+                best[owner[first][better]] = distances[first][better]
+                best_positions[owner[first][better]] = candidates[first][better]
+            # Every point closer than this to an origin lies in the rings scanned so far
+            poleward = np.minimum(np.abs(lats[pending]) + (ring + 1) * self.cell_deg, 89.9)
+            covered = ring * self.cell_deg * MILES_PER_DEG_LAT * np.cos(np.radians(poleward))
+            pending = pending[(best[pending] > covered) & (covered < miles)]
+            ring += 1
+        outside = best > miles
+        best[outside], best_positions[outside] = np.inf, -1
+        return best_positions, best
+
+    def _nearest_in(self, lats, lons, candidates, k, method):
+        # Indices into candidates of the k nearest per origin, and their distances
+        spherical = haversine_miles(lats[:, None], lons[:, None],
+                                    self.lats[candidates][None, :], self.lons[candidates][None, :])
+        if method == HAVERSINE:
+            # Partition out the k nearest candidates, then order just those
+            if k < spherical.shape[1]:
+                nearest = np.argpartition(spherical, k - 1, axis=1)[:, :k]
+            else:
+                nearest = np.broadcast_to(np.arange(spherical.shape[1]), spherical.shape)
+            nearest = np.take_along_axis(nearest, np.argsort(np.take_along_axis(spherical, nearest, axis=1), axis=1,
+                                                             kind="stable"), axis=1)
+            return nearest, np.take_along_axis(spherical, nearest, axis=1)
+
+        # Only pairs that could be among the k nearest on the ellipsoid get the exact distance
+        kth = np.partition(spherical, k - 1, axis=1)[:, k - 1]
+        slack = (1 + HAVERSINE_TOLERANCE) / (1 - HAVERSINE_TOLERANCE)
+        rows, cols = np.nonzero(spherical <= kth[:, None] * slack)
+        exact = distances_miles((lats[rows], lons[rows]), self.lats[candidates[cols]], self.lons[candidates[cols]],
+                                method=method)
+        order = np.lexsort((exact, rows))
+        rows, cols, exact = rows[order], cols[order], exact[order]
+        take = np.searchsorted(rows, np.arange(len(lats)))[:, None] + np.arange(k)
+        return cols[take], exact[take]
@@ -0,0 +1,49 @@
+import os
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """
+    Base of the on-disk stores that every worker process shares through one SQLite file.
+
+    Each thread of each process gets its own connection, opened on first use
+    and again after a fork. Counters live in a stats table in the same file,
+    so they add up across workers and restarts.
+    - path: SQLite file location
+    - schema: CREATE statements for the store's own tables and indexes
+    """
+
+    def __init__(self, path, schema=()):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in schema:
+                conn.execute(statement)
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+
+    def _connect(self):
+        # One connection per thread and process; connections must not cross a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _count(self, conn, name, n=1):
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, n),
+        )
+
+    def _counters(self, conn):
+        return dict(conn.execute("SELECT name, value FROM stats").fetchall())
+
+    def count(self, name, n=1):
+        with self._connect() as conn:
+            self._count(conn, name, n)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from geodistance import (
+    ELLIPSOIDAL, HAVERSINE, HAVERSINE_TOLERANCE, band_labels, distance_bands, distances_miles, haversine_miles,
+    vincenty_miles,
+)
+
+# Origins and destinations spread over the continental US, Alaska and Hawaii
+ORIGINS = [(38.0, -97.0), (40.7128, -74.006), (61.2181, -149.9003), (21.3069, -157.8583)]
+
+
+def destinations(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(18.0, 72.0, n), rng.uniform(-170.0, -65.0, n)
+
+
+def geodesic_miles(origin, lats, lons):
+    distance = pytest.importorskip("geopy.distance")
+    return np.array([distance.geodesic(origin, (lat, lon)).miles for lat, lon in zip(lats, lons)])
+
+
+@pytest.mark.parametrize("origin", ORIGINS)
+def test_vincenty_matches_geopy(origin):
+    lats, lons = destinations()
+    expected = geodesic_miles(origin, lats, lons)
+    assert np.abs(vincenty_miles(*origin, lats, lons) - expected).max() < 4e-8
+
+
+@pytest.mark.parametrize("origin", ORIGINS)
+def test_haversine_within_tolerance(origin):
+    lats, lons = destinations()
+    expected = geodesic_miles(origin, lats, lons)
+    relative = np.abs(haversine_miles(*origin, lats, lons) - expected) / expected
+    assert relative.max() < 0.0045
+    assert relative.max() < HAVERSINE_TOLERANCE
+
+
+def test_same_point_is_zero():
+    assert vincenty_miles(38.0, -97.0, [38.0], [-97.0])[0] == 0.0
+    assert haversine_miles(38.0, -97.0, [38.0], [-97.0])[0] == 0.0
+
+
+def test_vincenty_broadcasts_origins():
+    lats, lons = destinations(20)
+    origin_lats, origin_lons = destinations(20, seed=1)
+    pairwise = vincenty_miles(origin_lats, origin_lons, lats, lons)
+    one_by_one = [vincenty_miles(a, b, [c], [d])[0] for a, b, c, d in zip(origin_lats, origin_lons, lats, lons)]
+    np.testing.assert_allclose(pairwise, one_by_one, rtol=0, atol=1e-9)
+
+
+def test_distances_miles_methods():
+    lats, lons = destinations(20)
+    origin = ORIGINS[0]
+    np.testing.assert_array_equal(distances_miles(origin, lats, lons, HAVERSINE), haversine_miles(*origin, lats, lons))
+    np.testing.assert_array_equal(distances_miles(origin, lats, lons, ELLIPSOIDAL), vincenty_miles(*origin, lats, lons))
+    with pytest.raises(ValueError):
+        distances_miles(origin, lats, lons, "manhattan")
+
+
+def test_distance_bands_edges():
+    radii = [5, 10, 25]
+    distances = np.array([0.0, 4.999, 5.0, 5.001, 10.0, 25.0, 25.001, np.inf])
+    np.testing.assert_array_equal(distance_bands(distances, radii), [0, 0, 0, 1, 1, 2, 3, 3])
+
+
+def test_distance_bands_nan_is_past_last_band():
+    assert distance_bands(np.array([np.nan]), [5, 10])[0] == 2
+
+
+def test_band_labels():
+    assert band_labels([5, 10, 25]) == ["0-5 mi", "5-10 mi", "10-25 mi"]
+    assert band_labels([15, 30], unit="min") == ["0-15 min", "15-30 min"]
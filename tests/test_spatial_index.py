@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+
+from geodistance import ELLIPSOIDAL, HAVERSINE, distances_miles
+from sites import SiteIndex
+from spatial_index import GridIndex
+
+METHODS = [HAVERSINE, ELLIPSOIDAL]
+ORIGINS = [(40.0, -75.0), (40.05, -74.95), (40.123, -75.061), (39.8, -75.3)]
+
+
+def random_points(n=600, seed=0):
+    """
+    Points around (40, -75) with some exactly on 0.1-degree cell edges, some
+    sharing coordinates, and some without coordinates.
+    """
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(39.5, 40.5, n)
+    lons = rng.uniform(-75.5, -74.5, n)
+    edges = rng.choice(n, n // 5, replace=False)
+    lats[edges] = np.round(lats[edges], 1)
+    lons[edges[::2]] = np.round(lons[edges[::2]], 1)
+    shared = rng.choice(n, n // 5, replace=False)
+    lats[shared], lons[shared] = lats[shared[0]], lons[shared[0]]
+    missing = rng.choice(n, 10, replace=False)
+    lats[missing[:5]] = np.nan
+    lons[missing[5:]] = np.nan
+    return lats, lons
+
+
+def brute_radius(lats, lons, origin, miles, method, mask=None):
+    distances = distances_miles(origin, lats, lons, method=method)
+    keep = distances <= miles
+    if mask is not None:
+        keep &= mask
+    return np.flatnonzero(keep), distances
+
+
+def brute_nearest(lats, lons, origin, k, method, mask=None):
+    distances = distances_miles(origin, lats, lons, method=method)
+    if mask is not None:
+        distances = np.where(mask, distances, np.nan)
+    finite = np.flatnonzero(np.isfinite(distances))
+    return np.sort(distances[finite])[:k], distances
+
+
+def assert_radius(positions, distances, expected, all_distances):
+    np.testing.assert_array_equal(np.sort(positions), expected)
+    np.testing.assert_array_equal(distances, all_distances[positions])
+
+
+def assert_nearest(positions, distances, expected, all_distances):
+    # Ties may come back in any order, so compare distances and check each position's own distance
+    assert len(np.unique(positions)) == len(positions)
+    np.testing.assert_allclose(distances, expected, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(all_distances[positions], distances, rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("origin", ORIGINS)
+@pytest.mark.parametrize("miles", [0.0, 1.0, 6.9, 15.0, 200.0])
+def test_grid_radius_matches_brute_force(origin, miles, method):
+    lats, lons = random_points()
+    index = GridIndex(lats, lons)
+    expected, all_distances = brute_radius(lats, lons, origin, miles, method)
+    assert_radius(*index.query_radius(origin, miles, method=method), expected, all_distances)
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("origin", ORIGINS)
+def test_grid_radius_includes_points_on_the_boundary(origin, method):
+    lats, lons = random_points()
+    index = GridIndex(lats, lons)
+    all_distances = distances_miles(origin, lats, lons, method=method)
+    for position in np.flatnonzero(np.isfinite(all_distances))[::50]:
+        miles = all_distances[position]
+        expected, _ = brute_radius(lats, lons, origin, miles, method)
+        positions, distances = index.query_radius(origin, miles, method=method)
+        assert position in positions
+        assert_radius(positions, distances, expected, all_distances)
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_grid_radius_with_mask(method):
+    lats, lons = random_points()
+    mask = np.random.default_rng(1).random(len(lats)) < 0.3
+    index = GridIndex(lats, lons)
+    for origin in ORIGINS:
+        expected, all_distances = brute_radius(lats, lons, origin, 10.0, method, mask)
+        assert_radius(*index.query_radius(origin, 10.0, method=method, mask=mask), expected, all_distances)
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("origin", ORIGINS)
+@pytest.mark.parametrize("k", [1, 5, 40])
+def test_grid_nearest_matches_brute_force(origin, k, method):
+    lats, lons = random_points()
+    index = GridIndex(lats, lons)
+    expected, all_distances = brute_nearest(lats, lons, origin, k, method)
+    assert_nearest(*index.query_nearest(origin, k, method=method), expected, all_distances)
+
+    mask = np.random.default_rng(2).random(len(lats)) < 0.2
+    expected, all_distances = brute_nearest(lats, lons, origin, k, method, mask)
+    assert_nearest(*index.query_nearest(origin, k, method=method, mask=mask), expected, all_distances)
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("k", [1, 5])
+def test_grid_nearest_many_matches_brute_force(k, method):
+    lats, lons = random_points()
+    index = GridIndex(lats, lons)
+    origin_lats, origin_lons = random_points(50, seed=3)
+    origin_lats, origin_lons = np.nan_to_num(origin_lats, nan=40.0), np.nan_to_num(origin_lons, nan=-75.0)
+    positions, distances = index.query_nearest_many(origin_lats, origin_lons, k, method=method)
+    for row, origin in enumerate(zip(origin_lats, origin_lons)):
+        expected, all_distances = brute_nearest(lats, lons, origin, k, method)
+        assert_nearest(positions[row], distances[row], expected, all_distances)
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("origin", ORIGINS)
+@pytest.mark.parametrize("miles", [0.0, 2.0, 15.0])
+def test_sites_radius_matches_brute_force(origin, miles, method):
+    lats, lons = random_points()
+    index = SiteIndex(lats, lons)
+    expected, all_distances = brute_radius(lats, lons, origin, miles, method)
+    assert_radius(*index.query_radius(origin, miles, method=method), expected, all_distances)
+
+    mask = np.random.default_rng(4).random(len(lats)) < 0.5
+    expected, all_distances = brute_radius(lats, lons, origin, miles, method, mask)
+    assert_radius(*index.query_radius(origin, miles, method=method, mask=mask), expected, all_distances)
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("origin", ORIGINS)
+@pytest.mark.parametrize("k", [1, 5, 150])
+def test_sites_nearest_matches_brute_force(origin, k, method):
+    lats, lons = random_points()
+    index = SiteIndex(lats, lons)
+    expected, all_distances = brute_nearest(lats, lons, origin, k, method)
+    assert_nearest(*index.query_nearest(origin, k, method=method), expected, all_distances)
+
+    origin_lats, origin_lons = np.array([origin[0]]), np.array([origin[1]])
+    positions, distances = index.query_nearest_many(origin_lats, origin_lons, k, method=method)
+    assert_nearest(positions[0], distances[0], expected, all_distances)
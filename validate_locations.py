@@ -0,0 +1,219 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from adequacy import ADDRESS_COLUMNS, member_addresses
+from geocache import GeocodeCache, Gazetteer, ZIP_PATTERN, normalize_address
+from geodistance import haversine_miles
+
+# Miles a provider may sit from the centroid of the ZIP or city it claims
+CITY_LIMIT_MILES = 25
+# A provider further from its county's median point than this many times the county's
+# median spread is an outlier, but only once it is also further than COUNTY_MIN_MILES
+COUNTY_SPREAD_LIMIT = 6
+COUNTY_MIN_MILES = 30
+
+# Issues a row can be flagged with, in the order they are checked
+MISSING = "missing"
+ZERO = "zero"
+OUT_OF_RANGE = "out_of_range"
+SWAPPED = "swapped"
+SIGN_FLIPPED = "sign_flipped"
+FAR_FROM_CITY = "far_from_city"
+COUNTY_OUTLIER = "county_outlier"
+
+
+def claimed_centroids(df, gazetteer):
+    """
+    Centroid of the ZIP, else the city, each provider claims, as (lats, lons) with NaN where
+    the gazetteer knows neither. Without a State column a city name matches only if it
+    is unique across states. Looks up each distinct value once.
+    """
+    lats = np.full(len(df), np.nan)
+    lons = np.full(len(df), np.nan)
+    if not len(gazetteer):
+        return lats, lons
+
+    if "City" in df:
+        if "State" in df:
+            keys = df["City"].astype(str).map(normalize_address) + "|" + df["State"].astype(str).map(normalize_address)
+            cities = {f"{city}|{state}": coords for (city, state), coords in gazetteer.cities.items()}
+        else:
+            keys = df["City"].astype(str).map(normalize_address)
+            states = pd.Series([city for city, _ in gazetteer.cities]).value_counts()
+            cities = {city: coords for (city, _), coords in gazetteer.cities.items() if states[city] == 1}
+        lats = keys.map({key: c[0] for key, c in cities.items()}).to_numpy(dtype=np.float64)
+        lons = keys.map({key: c[1] for key, c in cities.items()}).to_numpy(dtype=np.float64)
+
+    # A ZIP code is more precise than a city, so it wins where both are known
+    if "Zip" in df:
+        zips = df["Zip"].astype(str).str.extract(ZIP_PATTERN.pattern, expand=False)
+        zip_lats = zips.map({z: c[0] for z, c in gazetteer.zips.items()}).to_numpy(dtype=np.float64)
+        zip_lons = zips.map({z: c[1] for z, c in gazetteer.zips.items()}).to_numpy(dtype=np.float64)
+        known = ~np.isnan(zip_lats)
+        lats[known], lons[known] = zip_lats[known], zip_lons[known]
+    return lats, lons
+
+
+def county_limits(df, lats, lons, usable):
+    """
+    Per-row county median point and outlier distance, from the usable rows of each county.
+    Returns (median lats, median lons, limits), NaN for rows without a county.
+    """
+    n = len(df)
+    if "County" not in df:
+        return np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+    county = df["County"].astype("category").cat.codes.to_numpy()
+    usable = usable & (county >= 0)
+    frame = pd.DataFrame({"county": county[usable], "lat": lats[usable], "lon": lons[usable]})
+    medians = frame.groupby("county")[["lat", "lon"]].median()
+    frame["miles"] = haversine_miles(medians["lat"].reindex(frame["county"]).to_numpy(),
+                                     medians["lon"].reindex(frame["county"]).to_numpy(),
+                                     frame["lat"].to_numpy(), frame["lon"].to_numpy())
+    limits = np.maximum(COUNTY_MIN_MILES, COUNTY_SPREAD_LIMIT * frame.groupby("county")["miles"].median())
+    by_row = pd.Index(county)
+    return (medians["lat"].reindex(by_row).to_numpy(), medians["lon"].reindex(by_row).to_numpy(),
+            limits.reindex(by_row).to_numpy())
+
+
+def _miles(lats, lons, ref_lats, ref_lons):
+    with np.errstate(invalid="ignore"):
+        return haversine_miles(ref_lats, ref_lons, lats, lons)
+
+
+def validate_locations(df, gazetteer=None, geocache=None, drop_unresolved=True):
+    """
+    Check every provider's coordinates against the ZIP, city and county it claims,
+    and repair what can be repaired, in vectorized passes over the whole frame.
+
+    Missing, zeroed and out-of-range coordinates are flagged, as are points far
+    from their claimed ZIP or city centroid and, for rows the gazetteer cannot
+    place, county outliers. Swapped and
+    sign-flipped pairs that land back on their claimed place are corrected in
+    place. Other flagged rows are repaired from the geocode store, else from the
+    claimed ZIP or city centroid. Rows left without usable coordinates are dropped
+    when drop_unresolved is set.
+    Returns (clean frame, report frame with one row per flagged provider).
+    """
+    gazetteer = gazetteer if gazetteer is not None else Gazetteer(path="")
+    lats = pd.to_numeric(df["Latitude"], errors="coerce").to_numpy(dtype=np.float64, copy=True)
+    lons = pd.to_numeric(df["Longitude"], errors="coerce").to_numpy(dtype=np.float64, copy=True)
+    n = len(df)
+    issue = np.full(n, "", dtype=object)
+
+    missing = np.isnan(lats) | np.isnan(lons)
+    zero = ~missing & ((lats == 0) | (lons == 0))
+    out_of_range = ~missing & ~zero & ((np.abs(lats) > 90) | (np.abs(lons) > 180))
+    issue[missing], issue[zero], issue[out_of_range] = MISSING, ZERO, OUT_OF_RANGE
+
+    # Reference point per row: the claimed ZIP or city, else the county's median point
+    ref_lats, ref_lons = claimed_centroids(df, gazetteer)
+    has_place = ~np.isnan(ref_lats)
+    usable = ~(missing | zero | out_of_range)
+    county_lats, county_lons, county_max = county_limits(df, lats, lons, usable)
+    ref_lats = np.where(has_place, ref_lats, county_lats)
+    ref_lons = np.where(has_place, ref_lons, county_lons)
+    limits = np.where(has_place, CITY_LIMIT_MILES, county_max)
+    has_ref = ~np.isnan(ref_lats)
+
+    off = np.where(usable & has_ref, _miles(lats, lons, ref_lats, ref_lons), np.nan)
+    far = usable & has_ref & (off > limits)
+    # Swapped or sign-flipped pairs only count when the corrected point is where the row claims to be
+    suspect = (far | out_of_range) & has_ref
+    swapped = suspect & (np.abs(lons) <= 90) & (_miles(lons, lats, ref_lats, ref_lons) <= limits)
+    flipped = suspect & ~swapped & (_miles(lats, -lons, ref_lats, ref_lons) <= limits)
+    issue[swapped], issue[flipped] = SWAPPED, SIGN_FLIPPED
+    far_from_city = far & ~swapped & ~flipped & has_place
+    issue[far_from_city] = FAR_FROM_CITY
+
+    # County outliers among rows that passed every other check; a row close to the ZIP
+    # or city it claims is trusted, as counties can be far larger than their spread suggests
+    county_off = _miles(lats, lons, county_lats, county_lons)
+    county_outlier = usable & ~has_place & (issue == "") & (county_off > county_max)
+    issue[county_outlier] = COUNTY_OUTLIER
+    off = np.where(county_outlier, county_off, off)
+
+    new_lats, new_lons = lats.copy(), lons.copy()
+    repair = np.full(n, "", dtype=object)
+    new_lats[swapped], new_lons[swapped] = lons[swapped], lats[swapped]
+    new_lons[flipped] = -lons[flipped]
+    repair[swapped], repair[flipped] = "swapped", "sign"
+
+    # Everything else flagged is looked up by address, then placed at its claimed centroid
+    rows = np.flatnonzero((issue != "") & (repair == ""))
+    if geocache is not None and len(rows) and any(c in df for c in ADDRESS_COLUMNS):
+        keys = [normalize_address(a) for a in member_addresses(df.iloc[rows])]
+        found = geocache.get_many([k for k in keys if k])
+        cached = np.array([found.get(k, (np.nan, np.nan)) for k in keys], dtype=np.float64).reshape(-1, 2)
+        # A stored geocode that also disagrees with the claimed place is no better
+        plausible = ~has_place[rows] | (_miles(cached[:, 0], cached[:, 1], ref_lats[rows], ref_lons[rows])
+                                        <= CITY_LIMIT_MILES)
+        use = rows[~np.isnan(cached[:, 0]) & plausible]
+        new_lats[use], new_lons[use] = cached[~np.isnan(cached[:, 0]) & plausible].T
+        repair[use] = "geocache"
+    use = (issue != "") & (repair == "") & has_place
+    new_lats[use], new_lons[use], repair[use] = ref_lats[use], ref_lons[use], "gazetteer"
+
+    pending = (issue != "") & (repair == "")
+    unresolved = pending & np.isin(issue, [MISSING, ZERO, OUT_OF_RANGE])
+    repair[pending] = "kept"
+    if drop_unresolved:
+        repair[unresolved] = "dropped"
+
+    flagged = np.flatnonzero(issue != "")
+    report = pd.DataFrame({"Row": flagged})
+    for column in ("ProviderID", "ProviderName", "City", "County"):
+        if column in df:
+            report[column] = df[column].to_numpy()[flagged]
+    report["Latitude"], report["Longitude"] = lats[flagged], lons[flagged]
+    report["Issue"] = issue[flagged]
+    report["Miles Off"] = np.round(off[flagged], 1)
+    report["Repair"] = repair[flagged]
+    report["Repaired Latitude"], report["Repaired Longitude"] = new_lats[flagged], new_lons[flagged]
+
+    clean = df.copy()
+    clean["Latitude"], clean["Longitude"] = new_lats, new_lons
+    if drop_unresolved:
+        clean = clean[~unresolved].reset_index(drop=True)
+    return clean, report
+
+
+def summarize(report):
+    """
+    Counts of flagged rows by issue and by repair, for the artifact manifest and the CLI.
+    """
+    return {
+        "flagged": len(report),
+        "issues": {k: int(v) for k, v in report["Issue"].value_counts().items()},
+        "repairs": {k: int(v) for k, v in report["Repair"].value_counts().items()},
+    }
+
+
+def main(argv=None):
+    from provider_store import DATA_PATH
+
+    parser = argparse.ArgumentParser(description="Validate and repair provider coordinates.")
+    parser.add_argument("csv", nargs="?", default=DATA_PATH, help="Provider CSV")
+    parser.add_argument("--out", default=None, help="Write the repaired providers here")
+    parser.add_argument("--report", default="location_report.csv", help="Flagged rows CSV")
+    parser.add_argument("--keep-unresolved", action="store_true", help="Keep rows with no usable coordinates")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    df = pd.read_csv(args.csv)
+    clean, report = validate_locations(df, Gazetteer(), GeocodeCache(), drop_unresolved=not args.keep_unresolved)
+    report.to_csv(args.report, index=False)
+    if args.out:
+        clean.to_csv(args.out, index=False)
+    summary = summarize(report)
+    print(f"{len(df):,} providers checked in {time.time() - started:.1f}s, {summary['flagged']:,} flagged",
+          file=sys.stderr)
+    for name in ("issues", "repairs"):
+        print(f"{name}: " + ", ".join(f"{k} {v:,}" for k, v in summary[name].items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import numpy as np
+
+from clustering import mercator_xy
+
+# Tile coordinate resolution and the margin of neighbouring-tile points kept, in tile units
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+LAYER_NAME = "providers"
+
+# MVT geometry type and command for a single point
+POINT_GEOMETRY = 1
+MOVE_TO_ONE = (1 & 0x7) | (1 << 3)
+
+
+def tile_bounds(z, x, y):
+    """
+    Map bounds of a slippy-map tile as [[south, west], [north, east]].
+    """
+    n = 2 ** z
+    west, east = x / n * 360 - 180, (x + 1) / n * 360 - 180
+    north = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / n))))
+    south = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + 1) / n))))
+    return [[float(south), float(west)], [float(north), float(east)]]
+
+
+def tile_points(lats, lons, z, x, y):
+    """
+    Integer tile coordinates of points for one tile, plus a mask of those
+    inside it (with the buffer). Points sharing a tile pixel are reduced to
+    the first, since they would draw on top of each other.
+    """
+    mx, my = mercator_xy(lats, lons)
+    n = 2 ** z
+    px = np.floor((mx * n - x) * TILE_EXTENT).astype(np.int64)
+    py = np.floor((my * n - y) * TILE_EXTENT).astype(np.int64)
+    keep = (px >= -TILE_BUFFER) & (px < TILE_EXTENT + TILE_BUFFER) & \
+           (py >= -TILE_BUFFER) & (py < TILE_EXTENT + TILE_BUFFER)
+    kept = np.flatnonzero(keep)
+    _, first = np.unique(py[kept] * (TILE_EXTENT + 2 * TILE_BUFFER) + px[kept], return_index=True)
+    keep[:] = False
+    keep[kept[np.sort(first)]] = True
+    return px, py, keep
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _field(number, payload):
+    # Length-delimited protobuf field (wire type 2)
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def _uint_field(number, value):
+    # Varint protobuf field (wire type 0)
+    return _varint(number << 3) + _varint(value)
+
+
+def encode_point_tile(px, py, ids, properties, layer_name=LAYER_NAME):
+    """
+    Encode points as a Mapbox Vector Tile (spec 2.1) with one layer.
+    - px, py: Integer tile coordinates in [0, TILE_EXTENT), buffer allowed
+    - ids: Unsigned feature ids
+    - properties: {key: array of str/bool/int values}, one value per point
+    Returns the tile as bytes.
+    """
+    keys = list(properties)
+    values = []
+    value_index = {}
+    # Index into the shared value table of each feature's value, per key
+    value_slots = []
+    for key in keys:
+        slots = []
+        for value in properties[key]:
+            value = value.item() if isinstance(value, np.generic) else value
+            slot = (type(value).__name__, value)
+            if slot not in value_index:
+                value_index[slot] = len(values)
+                values.append(value)
+            slots.append(value_index[slot])
+        value_slots.append(slots)
+
+    layer = bytearray()
+    layer += _uint_field(15, 2)
+    layer += _field(1, layer_name.encode("utf-8"))
+    for i, (x, y, feature_id) in enumerate(zip(px.tolist(), py.tolist(), ids.tolist())):
+        tags = b"".join(_varint(k) + _varint(slots[i]) for k, slots in enumerate(value_slots))
+        geometry = _varint(MOVE_TO_ONE) + _varint(_zigzag(x)) + _varint(_zigzag(y))
+        feature = _uint_field(1, feature_id) + _field(2, tags) + _uint_field(3, POINT_GEOMETRY) + _field(4, geometry)
+        layer += _field(2, feature)
+    for key in keys:
+        layer += _field(3, key.encode("utf-8"))
+    for value in values:
+        if isinstance(value, bool):
+            encoded = _uint_field(7, int(value))
+        elif isinstance(value, int):
+            encoded = _uint_field(6, _zigzag(value)) if value < 0 else _uint_field(5, value)
+        else:
+            encoded = _field(1, str(value).encode("utf-8"))
+        layer += _field(4, encoded)
+    layer += _uint_field(5, TILE_EXTENT)
+    return _field(3, bytes(layer))
+
+
+def encode_point_geojson(lats, lons, ids, pcp, counts=None):
+    """
+    Compact GeoJSON FeatureCollection for provider points, as UTF-8 bytes.
+    Each feature carries only its provider key ("id"), a PCP flag and the
+    number of providers it stands for ("count"); details are looked up by key
+    when a point is clicked. Points without finite coordinates are left out,
+    since JSON has no NaN.
+    """
+    counts = np.ones(len(ids), dtype=np.int64) if counts is None else counts
+    valid = np.isfinite(lats) & np.isfinite(lons)
+    lats, lons, ids, pcp, counts = (np.asarray(a)[valid] for a in (lats, lons, ids, pcp, counts))
+    features = [
+        '{"type":"Feature","geometry":{"type":"Point","coordinates":[%.6f,%.6f]},'
+        '"properties":{"id":%d,"pcp":%d,"count":%d}}'
+        % (lon, lat, feature_id, flag, count)
+        for lat, lon, feature_id, flag, count in zip(lats.tolist(), lons.tolist(), ids.tolist(), pcp.tolist(),
+                                                     counts.tolist())
+    ]
+    return ('{"type":"FeatureCollection","features":[' + ",".join(features) + "]}").encode("utf-8")